@@ -0,0 +1,122 @@
+import asyncio
+import json
+import logging
+from typing import Optional
+
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.database import async_session, release_connection
+from app.core.executor import compute
+from app.analysis_results import analysis_manifest
+from app.eda import render_plot
+from app.models.dataset import Analysis, AnalysisPlot, Dataset
+from app.plots import has_body, upgrade_plot
+from app.storage import fetch_dataframe
+
+logger = logging.getLogger("analytiq")
+
+# Manifest kind for plots rendered eagerly by older versions; their stored body is all there is
+STORED_KIND = "stored"
+
+# Rendered plots for this worker process, keyed by (result id, or analysis id for older analyses, plot name)
+plot_cache = LRUCache(
+    max_bytes=settings.PLOT_CACHE_MAX_BYTES,
+    sizeof=lambda plot: len(json.dumps(plot)),
+)
+
+
+def analysis_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """The rows an analysis looks at: all of them, or the same fixed sample of MAX_ROWS_ANALYSIS every time."""
+    if len(df) > settings.MAX_ROWS_ANALYSIS:
+        return df.sample(n=settings.MAX_ROWS_ANALYSIS, random_state=42)
+    return df
+
+
+async def save_plot(db: AsyncSession, analysis_id, plot: dict) -> None:
+    try:
+        async with db.begin_nested():
+            db.add(AnalysisPlot(analysis_id=analysis_id, name=plot["name"], plot=plot))
+    except IntegrityError:
+        # A concurrent request rendered the same plot first
+        logger.info(f"Plot {plot['name']} of analysis {analysis_id} already stored")
+
+
+async def store_inline_plots(db: AsyncSession, analysis: Analysis) -> bool:
+    """Move plot bodies saved inline on older analyses into analysis_plots, leaving a manifest.
+
+    Legacy base64 HTML plots are converted to specs on the way. Returns
+    whether anything changed.
+    """
+    if not analysis.plots or not any(has_body(p) for p in analysis.plots):
+        return False
+    manifest = []
+    for plot in analysis.plots:
+        if has_body(plot):
+            await save_plot(db, analysis.id, upgrade_plot(plot))
+            manifest.append({"name": plot.get("name"), "kind": STORED_KIND, "params": {}})
+        else:
+            manifest.append(plot)
+    analysis.plots = manifest
+    return True
+
+
+async def get_plot(db: AsyncSession, analysis: Analysis, name: str) -> Optional[dict]:
+    """Return one of an analysis' plots, rendering and storing it on first request."""
+    entry = next((p for p in analysis_manifest(analysis) or [] if p.get("name") == name), None)
+    if entry is None:
+        return None
+    key = (str(analysis.result_id or analysis.id), name)
+    plot = plot_cache.get(key)
+    if plot is not None:
+        return plot
+
+    query = select(AnalysisPlot.plot).where(AnalysisPlot.name == name)
+    if analysis.result_id is not None:
+        # Analyses sharing a result share its plots: whichever asked first stored them
+        query = query.join(Analysis, AnalysisPlot.analysis_id == Analysis.id).where(Analysis.result_id == analysis.result_id)
+    else:
+        query = query.where(AnalysisPlot.analysis_id == analysis.id)
+    plot = (await db.execute(query.limit(1))).scalar_one_or_none()
+    if plot is None:
+        if entry["kind"] == STORED_KIND:
+            return None
+        dataset = await db.get(Dataset, analysis.dataset_id)
+        df = await asyncio.to_thread(analysis_frame, await fetch_dataframe(db, dataset))
+        await release_connection(db)
+        plot = await compute.run(render_plot, df, entry)
+        await save_plot(db, analysis.id, plot)
+    plot_cache.put(key, plot)
+    return plot
+
+
+async def migrate_inline_plots(batch_size: int = 50) -> int:
+    """Move the plots of every stored analysis out of analyses.plots. Returns how many analyses changed."""
+    migrated = 0
+    last_id = None
+    async with async_session() as db:
+        while True:
+            query = select(Analysis).options(undefer(Analysis.plots)).order_by(Analysis.id).limit(batch_size)
+            if last_id is not None:
+                query = query.where(Analysis.id > last_id)
+            rows = (await db.execute(query)).scalars().all()
+            if not rows:
+                break
+            for analysis in rows:
+                migrated += await store_inline_plots(db, analysis)
+            last_id = rows[-1].id
+            await db.commit()
+            db.expunge_all()
+    return migrated
+
+
+if __name__ == "__main__":
+    # python -m app.analysis_plots: migrate all analyses saved with inline plots
+    logging.basicConfig(level=logging.INFO)
+    count = asyncio.run(migrate_inline_plots())
+    logger.info(f"Moved plots of {count} analyses to analysis_plots")
@@ -0,0 +1,81 @@
+import hashlib
+import json
+import logging
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload, undefer
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.eda import EDA_VERSION, PROFILE_VERSION
+from app.models.dataset import Analysis, AnalysisResult, Dataset
+from app.storage import dataset_digest
+
+logger = logging.getLogger("analytiq")
+
+# Settings that change what generate_eda, plot_manifest or render_plot produce
+EDA_OPTIONS = (
+    "MAX_ROWS_ANALYSIS", "MAX_PLOTS",
+    "EDA_OUTLIER_METHODS", "EDA_CORRELATION_METHOD", "EDA_CORR_TOP_K", "EDA_CORR_MATRIX_MAX_COLS",
+    "EDA_CORR_BLOCK_COLS", "EDA_ANOVA_TIME_BUDGET",
+    "EDA_SKETCH_HLL_PRECISION", "EDA_SKETCH_KLL_K", "EDA_SKETCH_HEAVY_HITTERS",
+    "PLOT_BINARY_ARRAYS", "PLOT_POINTS_PER_TRACE", "PLOT_HIST_MAX_BINS",
+)
+
+result_stats = {"hits": 0, "misses": 0}
+
+# Loader options for the deferred EDA and plot manifest of an analysis, inline or through its result
+WITH_EDA = (undefer(Analysis.eda), joinedload(Analysis.result).undefer(AnalysisResult.eda))
+WITH_MANIFEST = (undefer(Analysis.plots), joinedload(Analysis.result).undefer(AnalysisResult.plots))
+
+
+def result_key(dataset: Dataset) -> str:
+    """Digest of everything an analysis result depends on apart from the prompt."""
+    key = {
+        "content": dataset_digest(dataset),
+        "eda_version": EDA_VERSION,
+        "profile_version": PROFILE_VERSION,
+        "options": {name: getattr(settings, name) for name in EDA_OPTIONS},
+    }
+    return hashlib.blake2b(json.dumps(key, sort_keys=True).encode("utf-8"), digest_size=16).hexdigest()
+
+
+async def get_result(db: AsyncSession, dataset_id, cache_key: str, with_eda: bool = False) -> Optional[AnalysisResult]:
+    query = select(AnalysisResult).where(AnalysisResult.dataset_id == dataset_id, AnalysisResult.cache_key == cache_key)
+    if with_eda:
+        query = query.options(undefer(AnalysisResult.eda))
+    result = await db.execute(query)
+    row = result.scalar_one_or_none()
+    result_stats["hits" if row is not None else "misses"] += 1
+    return row
+
+
+async def save_result(db: AsyncSession, dataset_id, cache_key: str, eda: dict, plots: list) -> AnalysisResult:
+    row = AnalysisResult(dataset_id=dataset_id, cache_key=cache_key, eda=eda, plots=plots)
+    try:
+        async with db.begin_nested():
+            db.add(row)
+    except IntegrityError:
+        # A concurrent analysis of the same dataset stored it first; share that one
+        logger.info(f"Analysis result {cache_key} for dataset {dataset_id} already stored")
+        result = await db.execute(
+            select(AnalysisResult).options(undefer(AnalysisResult.eda), undefer(AnalysisResult.plots))
+            .where(AnalysisResult.dataset_id == dataset_id, AnalysisResult.cache_key == cache_key)
+        )
+        row = result.scalar_one()
+    return row
+
+
+def analysis_eda(analysis: Analysis) -> dict:
+    return analysis.result.eda if analysis.result is not None else analysis.eda
+
+
+def analysis_manifest(analysis: Analysis) -> list:
+    return analysis.result.plots if analysis.result is not None else analysis.plots
+
+
+def results_snapshot() -> dict:
+    lookups = result_stats["hits"] + result_stats["misses"]
+    return {**result_stats, "hit_rate": round(result_stats["hits"] / lookups, 4) if lookups else 0.0}
@@ -1,19 +1,27 @@
-import io
+import asyncio
 import logging
-import pandas as pd
-from fastapi import APIRouter, Depends, HTTPException, Request
+import uuid
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
-from app.core.database import get_db
-from app.core.auth import get_current_user
+from app.core.database import get_db, release_connection
+from app.core.auth import Principal, get_current_user
 from app.core.config import settings
-from app.models.user import User
+from app.core.executor import compute
+from app.core.pagination import Page, paginate, page_rows
+from app.storage import fetch_dataframe, load_content
+from app.profiles import ensure_profile
 from app.models.dataset import Dataset, Analysis
-from app.schemas import AnalyzeRequest, AnalysisResponse, AnalysisListItem
-from app.eda import generate_eda, generate_default_plots
+from app.models.job import Job
+from app.schemas import AnalyzeRequest, AnalysisResponse, AnalysisListItem, JobResponse
+from app.jobs import JobError, enqueue, job_handler, job_response
+from app.eda import generate_eda, plot_manifest
+from app.plots import plot_template
+from app.analysis_plots import analysis_frame, get_plot, store_inline_plots
+from app.analysis_results import WITH_EDA, WITH_MANIFEST, analysis_eda, analysis_manifest, get_result, result_key, save_result
 from typing import List
 
 router = APIRouter(prefix="/analyses", tags=["Analyses"])
@@ -21,77 +29,147 @@ limiter = Limiter(key_func=get_remote_address)
 logger = logging.getLogger("analytiq")
 
 
-@router.post("/", response_model=AnalysisResponse, status_code=201)
+@router.post("/", response_model=JobResponse, status_code=202)
 @limiter.limit(settings.RATE_LIMIT_ANALYSIS)
 async def run_analysis(
     request: Request,
     req: AnalyzeRequest,
-    user: User = Depends(get_current_user),
+    response: Response,
+    user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    result = await db.execute(select(Dataset).where(Dataset.id == req.dataset_id, Dataset.owner_id == user.id))
-    dataset = result.scalar_one_or_none()
-    if not dataset:
+    """Queue an analysis; poll GET /jobs/{id} and fetch result_url once it has succeeded."""
+    result = await db.execute(select(Dataset.id).where(Dataset.id == req.dataset_id, Dataset.owner_id == user.id))
+    dataset_id = result.scalar_one_or_none()
+    if not dataset_id:
         raise HTTPException(status_code=404, detail="Dataset not found")
+    job = await enqueue(db, user.id, "analysis", {"prompt": req.prompt}, dataset_id=dataset_id)
+    response.headers["Location"] = f"/api/v1/jobs/{job.id}"
+    return job_response(job)
 
-    try:
-        df = pd.read_csv(io.StringIO(dataset.file_content))
-    except Exception:
-        raise HTTPException(status_code=500, detail="Failed to load dataset")
 
-    if len(df) > settings.MAX_ROWS_ANALYSIS:
-        df = df.sample(n=settings.MAX_ROWS_ANALYSIS, random_state=42)
-        logger.info(f"Dataset sampled to {settings.MAX_ROWS_ANALYSIS} rows for analysis")
+@job_handler("analysis", result_path="/analyses/{id}")
+async def analysis_job(db: AsyncSession, job: Job, progress) -> uuid.UUID:
+    dataset = await db.get(Dataset, job.dataset_id)
+    if dataset is None or dataset.owner_id != job.owner_id:
+        raise JobError("Dataset not found")
+    prompt = job.params["prompt"]
+    if not dataset.content_hash:
+        # Legacy rows are keyed by their CSV text
+        await load_content(db, dataset)
 
-    eda = generate_eda(df)
-    plots = generate_default_plots(df, max_plots=settings.MAX_PLOTS)
+    # eda and plots depend only on the data and EDA settings, so repeat analyses reuse the stored result
+    cache_key = result_key(dataset)
+    cached = await get_result(db, dataset.id, cache_key, with_eda=bool(settings.OPENAI_API_KEY))
+    df = None
+    if cached is None or settings.OPENAI_API_KEY:
+        await progress(0.05, "Loading dataset")
+        try:
+            df = await fetch_dataframe(db, dataset)
+        except Exception:
+            raise JobError("Failed to load dataset")
+        if len(df) > settings.MAX_ROWS_ANALYSIS:
+            df = analysis_frame(df)
+            logger.info(f"Dataset sampled to {settings.MAX_ROWS_ANALYSIS} rows for analysis")
+
+    if cached is None:
+        await progress(0.2, "Profiling dataset")
+        # Dataset-level stats describe the full data, even when the analysis below runs on a sample
+        profile = await ensure_profile(db, dataset, df, timeout=settings.JOB_COMPUTE_TIMEOUT)
+        # The job's reads (and the stored profile) are done: commit so no connection sits idle through the compute
+        await release_connection(db)
+        await progress(0.5, "Running exploratory analysis")
+        eda = await compute.run(generate_eda, df, profile, timeout=settings.JOB_COMPUTE_TIMEOUT)
+        # Only the list of plots; each is rendered when GET /analyses/{id}/plots/{name} first asks for it
+        plots = await asyncio.to_thread(plot_manifest, df, settings.MAX_PLOTS)
+        cached = await save_result(db, dataset.id, cache_key, eda, plots)
+    else:
+        logger.info(f"Reusing analysis result {cached.id} for dataset {dataset.id}")
 
     insights = {"message": "Analysis complete."}
     if settings.OPENAI_API_KEY:
+        await progress(0.8, "Generating insights")
+        await release_connection(db)
         try:
             from app.openai_client import generate_insights_from_prompt
-            insights = generate_insights_from_prompt(df, req.prompt, eda)
+            insights = await asyncio.to_thread(generate_insights_from_prompt, df, prompt, cached.eda)
         except Exception as e:
             logger.warning(f"OpenAI insights failed: {e}")
             insights = {"message": "Analysis complete. AI insights unavailable."}
 
     analysis = Analysis(
-        owner_id=user.id,
+        owner_id=job.owner_id,
         dataset_id=dataset.id,
-        prompt=req.prompt,
-        eda=eda,
-        plots=plots,
+        prompt=prompt,
+        result_id=cached.id,
+        eda=None,
+        plots=None,
         insights=insights
     )
     db.add(analysis)
     await db.flush()
-    await db.refresh(analysis)
-
-    return AnalysisResponse(
-        id=str(analysis.id), dataset_id=str(analysis.dataset_id),
-        prompt=analysis.prompt, eda=analysis.eda, plots=analysis.plots,
-        insights=analysis.insights, created_at=analysis.created_at
-    )
+    return analysis.id
 
 
 @router.get("/", response_model=List[AnalysisListItem])
-async def list_analyses(user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    result = await db.execute(
-        select(Analysis).where(Analysis.owner_id == user.id).order_by(Analysis.created_at.desc()).limit(50)
-    )
+async def list_analyses(
+    response: Response,
+    page: Page = Depends(),
+    user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    query = select(Analysis.id, Analysis.dataset_id, Analysis.prompt, Analysis.created_at).where(Analysis.owner_id == user.id)
+    result = await db.execute(paginate(query, Analysis, page))
     return [
         AnalysisListItem(id=str(a.id), dataset_id=str(a.dataset_id), prompt=a.prompt, created_at=a.created_at)
-        for a in result.scalars().all()
+        for a in page_rows(result.all(), page, response)
     ]
 
 
+@router.get("/plot-templates/{name}")
+async def get_plot_template(name: str, response: Response):
+    """Plotly layout template shared by every plot spec that names it."""
+    template = plot_template(name)
+    if template is None:
+        raise HTTPException(status_code=404, detail="Plot template not found")
+    response.headers["Cache-Control"] = "public, max-age=86400"
+    return template
+
+
 @router.get("/{analysis_id}", response_model=AnalysisResponse)
-async def get_analysis(analysis_id: str, user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Analysis).where(Analysis.id == analysis_id, Analysis.owner_id == user.id))
+async def get_analysis(analysis_id: str, user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    result = await db.execute(
+        select(Analysis).options(*WITH_EDA, *WITH_MANIFEST).where(Analysis.id == analysis_id, Analysis.owner_id == user.id)
+    )
     a = result.scalar_one_or_none()
     if not a:
         raise HTTPException(status_code=404, detail="Analysis not found")
+    # Analyses saved before plots were lazy carry plot bodies inline; move them out on first read
+    await store_inline_plots(db, a)
     return AnalysisResponse(
         id=str(a.id), dataset_id=str(a.dataset_id), prompt=a.prompt,
-        eda=a.eda, plots=a.plots, insights=a.insights, created_at=a.created_at
+        eda=analysis_eda(a), plots=analysis_manifest(a), insights=a.insights, created_at=a.created_at
     )
+
+
+# Plot names embed column names, which may contain "/": match the rest of the path
+@router.get("/{analysis_id}/plots/{name:path}")
+async def get_analysis_plot(
+    analysis_id: str,
+    name: str,
+    response: Response,
+    user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    result = await db.execute(
+        select(Analysis).options(*WITH_MANIFEST).where(Analysis.id == analysis_id, Analysis.owner_id == user.id)
+    )
+    a = result.scalar_one_or_none()
+    if not a:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    await store_inline_plots(db, a)
+    plot = await get_plot(db, a, name)
+    if plot is None:
+        raise HTTPException(status_code=404, detail="Plot not found")
+    response.headers["Cache-Control"] = "private, max-age=3600"
+    return plot
@@ -8,7 +8,7 @@ from slowapi import Limiter
 from slowapi.util import get_remote_address
 
 from app.core.database import get_db
-from app.core.auth import hash_password, verify_password, create_access_token, get_current_user
+from app.core.auth import Principal, hash_password, verify_password, create_access_token, get_current_user, invalidate_user
 from app.core.config import settings
 from app.models.user import User
 from app.schemas import SignupRequest, LoginRequest, TokenResponse, UserResponse, UserUpdate
@@ -35,7 +35,7 @@ async def signup(request: Request, req: SignupRequest, db: AsyncSession = Depend
     user = User(
         email=req.email.lower().strip(),
         name=name,
-        hashed_password=hash_password(req.password),
+        hashed_password=await hash_password(req.password),
         company=sanitize(req.company) if req.company else ""
     )
     db.add(user)
@@ -57,11 +57,17 @@ async def signup(request: Request, req: SignupRequest, db: AsyncSession = Depend
 async def login(request: Request, req: LoginRequest, db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(User).where(User.email == req.email.lower().strip()))
     user = result.scalar_one_or_none()
-    if not user or not verify_password(req.password, user.hashed_password):
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid email or password")
+    valid, new_hash = await verify_password(req.password, user.hashed_password)
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid email or password")
     if not user.is_active:
         raise HTTPException(status_code=403, detail="Account deactivated")
 
+    if new_hash:
+        # Stored with an older cost factor: upgrade it now that the plain password is at hand
+        user.hashed_password = new_hash
     user.last_login = datetime.now(timezone.utc)
     await db.flush()
 
@@ -76,7 +82,7 @@ async def login(request: Request, req: LoginRequest, db: AsyncSession = Depends(
 
 
 @router.get("/me", response_model=UserResponse)
-async def get_me(user: User = Depends(get_current_user)):
+async def get_me(user: Principal = Depends(get_current_user)):
     return UserResponse(
         id=str(user.id), email=user.email, name=user.name,
         company=user.company, plan=user.plan, created_at=user.created_at
@@ -84,7 +90,10 @@ async def get_me(user: User = Depends(get_current_user)):
 
 
 @router.patch("/me", response_model=UserResponse)
-async def update_me(req: UserUpdate, user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+async def update_me(req: UserUpdate, principal: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    user = await db.get(User, principal.id)
+    if user is None:
+        raise HTTPException(status_code=401, detail="User not found")
     if req.name is not None:
         name = sanitize(req.name)
         if not re.match(r'^[a-zA-Z0-9\s\-\.]+$', name):
@@ -92,8 +101,10 @@ async def update_me(req: UserUpdate, user: User = Depends(get_current_user), db:
         user.name = name
     if req.company is not None:
         user.company = sanitize(req.company)
-    await db.flush()
-    await db.refresh(user)
+    # Committed before the cache is dropped, so reads that start after it see the new row; reads already
+    # in flight don't cache what they got (see get_current_user)
+    await db.commit()
+    invalidate_user(user.id)
     return UserResponse(
         id=str(user.id), email=user.email, name=user.name,
         company=user.company, plan=user.plan, created_at=user.created_at
@@ -1,22 +1,33 @@
-import io
+import asyncio
+import os
 import re
-import pandas as pd
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Request
+import logging
+import tempfile
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, File, UploadFile, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
-from app.core.database import get_db
-from app.core.auth import get_current_user
+from app.core.database import get_db, release_connection
+from app.core.auth import Principal, get_current_user
 from app.core.config import settings
-from app.models.user import User
+from app.core.executor import compute, ComputeBusyError, ComputeTimeoutError
+from app.core.pagination import Page, paginate, page_rows
 from app.models.dataset import Dataset
 from app.schemas import UploadResponse, DatasetResponse
+from app.storage import ingest_file, evict_dataset, ARROW_FORMAT
+from app.profiles import profile_dataset
 from typing import List
 
 router = APIRouter(prefix="/datasets", tags=["Datasets"])
 limiter = Limiter(key_func=get_remote_address)
+logger = logging.getLogger("analytiq")
+
+# What DatasetResponse shows; list and detail reads select only these, never the stored file
+DATASET_FIELDS = (
+    Dataset.id, Dataset.filename, Dataset.rows, Dataset.cols, Dataset.columns, Dataset.file_size_bytes, Dataset.created_at,
+)
 
 FILENAME_RE = re.compile(r'[^\w\s\-\.]', re.UNICODE)
 
@@ -25,53 +36,78 @@ def sanitize_filename(name: str) -> str:
     return FILENAME_RE.sub('_', name.strip())[:255]
 
 
+async def spool_upload(file: UploadFile, path: str, max_bytes: int = settings.MAX_FILE_SIZE) -> int:
+    """Copy the upload to ``path`` chunk by chunk, enforcing ``max_bytes`` as it goes."""
+    size = 0
+    with open(path, "wb") as out:
+        while chunk := await file.read(settings.INGEST_CHUNK_BYTES):
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(status_code=413, detail=f"File too large. Max {max_bytes // (1024 * 1024)}MB")
+            # Chunks are large; a blocking write here would stall every other request on the loop
+            await asyncio.to_thread(out.write, chunk)
+    return size
+
+
 @router.post("/upload", response_model=UploadResponse, status_code=201)
 @limiter.limit(settings.RATE_LIMIT_UPLOAD)
 async def upload_dataset(
     request: Request,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    import os
     file_ext = os.path.splitext(file.filename or "")[1].lower()
     if file_ext not in settings.SUPPORTED_FILE_TYPES:
         raise HTTPException(status_code=400, detail=f"Unsupported file type. Supported: {', '.join(settings.SUPPORTED_FILE_TYPES)}")
 
-    contents = await file.read()
-    if len(contents) > settings.MAX_FILE_SIZE:
-        raise HTTPException(status_code=413, detail=f"File too large. Max {settings.MAX_FILE_SIZE // (1024 * 1024)}MB")
-    if len(contents) == 0:
-        raise HTTPException(status_code=400, detail="File is empty")
-
+    # Spooling and parsing can take a while; don't hold the connection get_current_user may have used
+    await release_connection(db)
+    fd, tmp_path = tempfile.mkstemp(suffix=file_ext)
+    os.close(fd)
     try:
-        if file_ext == ".csv":
-            df = pd.read_csv(io.BytesIO(contents))
-            file_content = contents.decode("utf-8")
-        else:
-            df = pd.read_excel(io.BytesIO(contents))
-            file_content = df.to_csv(index=False)
-    except Exception:
-        raise HTTPException(status_code=400, detail="Could not parse file. Ensure it is a valid CSV or Excel file.")
-
-    if df.empty:
+        file_size = await spool_upload(file, tmp_path)
+        if file_size == 0:
+            raise HTTPException(status_code=400, detail="File is empty")
+        try:
+            ingested = await compute.run(ingest_file, tmp_path, file_ext)
+        except (ComputeBusyError, ComputeTimeoutError):
+            raise
+        except Exception:
+            raise HTTPException(status_code=400, detail="Could not parse file. Ensure it is a valid CSV or Excel file.")
+    finally:
+        os.remove(tmp_path)
+
+    if ingested["rows"] == 0:
         raise HTTPException(status_code=400, detail="File contains no data")
 
     safe_filename = sanitize_filename(file.filename or "dataset")
+    logger.info(
+        f"Ingested {safe_filename}: {ingested['rows']}x{ingested['cols']}, "
+        f"{file_size / 1e6:.1f}MB upload -> {len(ingested['payload']) / 1e6:.1f}MB stored, "
+        f"peak memory +{ingested['peak_memory_bytes'] / 1e6:.1f}MB"
+    )
 
     dataset = Dataset(
         owner_id=user.id,
         filename=safe_filename,
-        rows=len(df),
-        cols=len(df.columns),
-        columns=list(df.columns),
-        file_size_bytes=len(contents),
-        file_content=file_content,
+        rows=ingested["rows"],
+        cols=ingested["cols"],
+        columns=ingested["columns"],
+        file_size_bytes=file_size,
+        file_data=ingested["payload"],
+        storage_format=ARROW_FORMAT,
+        column_schema=ingested["schema"],
+        content_hash=ingested["digest"],
         file_type=file_ext
     )
     db.add(dataset)
     await db.flush()
     await db.refresh(dataset)
+    # Commit now so the profiling task (which runs after the response) can see the row
+    await db.commit()
+    background_tasks.add_task(profile_dataset, dataset.id)
 
     return UploadResponse(
         dataset_id=str(dataset.id),
@@ -85,22 +121,25 @@ async def upload_dataset(
 
 
 @router.get("/", response_model=List[DatasetResponse])
-async def list_datasets(user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    result = await db.execute(
-        select(Dataset).where(Dataset.owner_id == user.id).order_by(Dataset.created_at.desc()).limit(50)
-    )
+async def list_datasets(
+    response: Response,
+    page: Page = Depends(),
+    user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    result = await db.execute(paginate(select(*DATASET_FIELDS).where(Dataset.owner_id == user.id), Dataset, page))
     return [
         DatasetResponse(
             id=str(d.id), filename=d.filename, rows=d.rows, cols=d.cols,
             columns=d.columns, file_size_bytes=d.file_size_bytes, created_at=d.created_at
-        ) for d in result.scalars().all()
+        ) for d in page_rows(result.all(), page, response)
     ]
 
 
 @router.get("/{dataset_id}", response_model=DatasetResponse)
-async def get_dataset(dataset_id: str, user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Dataset).where(Dataset.id == dataset_id, Dataset.owner_id == user.id))
-    dataset = result.scalar_one_or_none()
+async def get_dataset(dataset_id: str, user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    result = await db.execute(select(*DATASET_FIELDS).where(Dataset.id == dataset_id, Dataset.owner_id == user.id))
+    dataset = result.one_or_none()
     if not dataset:
         raise HTTPException(status_code=404, detail="Dataset not found")
     return DatasetResponse(
@@ -110,9 +149,10 @@ async def get_dataset(dataset_id: str, user: User = Depends(get_current_user), d
 
 
 @router.delete("/{dataset_id}", status_code=204)
-async def delete_dataset(dataset_id: str, user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+async def delete_dataset(dataset_id: str, user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(Dataset).where(Dataset.id == dataset_id, Dataset.owner_id == user.id))
     dataset = result.scalar_one_or_none()
     if not dataset:
         raise HTTPException(status_code=404, detail="Dataset not found")
     await db.delete(dataset)
+    evict_dataset(dataset.id)
@@ -0,0 +1,52 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from typing import List, Optional
+
+from app.core.database import get_db
+from app.core.auth import Principal, get_current_user
+from app.models.job import Job
+from app.schemas import JobResponse
+from app.jobs import cancel_job, retry_job, job_response
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+
+async def _get_job(db: AsyncSession, job_id: str, user: Principal) -> Job:
+    result = await db.execute(select(Job).where(Job.id == job_id, Job.owner_id == user.id))
+    job = result.scalar_one_or_none()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/", response_model=List[JobResponse])
+async def list_jobs(status: Optional[str] = None, user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    query = select(Job).where(Job.owner_id == user.id)
+    if status:
+        query = query.where(Job.status == status)
+    result = await db.execute(query.order_by(Job.created_at.desc()).limit(50))
+    return [job_response(j) for j in result.scalars().all()]
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str, user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    """Status and progress of a job; result_url points at the created analysis or prediction once it succeeded."""
+    return job_response(await _get_job(db, job_id, user))
+
+
+@router.post("/{job_id}/cancel", response_model=JobResponse, status_code=202)
+async def cancel(job_id: str, user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    """Cancel a job. Queued jobs stop at once; running ones within a heartbeat interval."""
+    job = await _get_job(db, job_id, user)
+    if not await cancel_job(db, job):
+        raise HTTPException(status_code=409, detail=f"Job already {job.status}")
+    return job_response(job)
+
+
+@router.post("/{job_id}/retry", response_model=JobResponse, status_code=202)
+async def retry(job_id: str, user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    job = await _get_job(db, job_id, user)
+    if not await retry_job(db, job):
+        raise HTTPException(status_code=409, detail=f"Only failed or cancelled jobs can be retried (job is {job.status})")
+    return job_response(job)
@@ -1,19 +1,32 @@
-import io
+import asyncio
+import json
 import logging
-import pandas as pd
-from fastapi import APIRouter, Depends, HTTPException, Request
+import os
+import tempfile
+import uuid
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, File, UploadFile
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.orm import undefer
+import pandas as pd
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
-from app.core.database import get_db
-from app.core.auth import get_current_user
+from app.core.database import get_db, release_connection
+from app.core.auth import Principal, get_current_user
 from app.core.config import settings
-from app.models.user import User
-from app.models.dataset import Dataset, Prediction
-from app.schemas import PredictRequest, PredictResponse
-from app.ml import run_prediction
+from app.core.executor import compute
+from app.core.pagination import Page, paginate, page_rows
+from app.storage import fetch_dataframe, dataset_digest
+from app.models.dataset import Dataset, Prediction, ModelArtifact
+from app.models.job import Job
+from app.schemas import PredictRequest, JobResponse, OnlinePredictRequest, OnlinePredictResponse
+from app.jobs import JobError, enqueue, job_handler, job_response
+from app.ml import run_prediction, LIBRARY_VERSIONS
+from app.scoring import load_pipeline, open_scoring_csv, stream_scores
+from app.inference import inference
+from app.api.datasets import spool_upload, sanitize_filename
 from typing import List
 
 router = APIRouter(prefix="/predictions", tags=["Predictions"])
@@ -21,31 +34,51 @@ limiter = Limiter(key_func=get_remote_address)
 logger = logging.getLogger("analytiq")
 
 
-@router.post("/", response_model=PredictResponse, status_code=201)
+@router.post("/", response_model=JobResponse, status_code=202)
 @limiter.limit("3/minute")
 async def create_prediction(
     request: Request,
     req: PredictRequest,
-    user: User = Depends(get_current_user),
+    response: Response,
+    user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
+    """Queue model training; poll GET /jobs/{id} and fetch result_url once it has succeeded."""
     result = await db.execute(select(Dataset).where(Dataset.id == req.dataset_id, Dataset.owner_id == user.id))
     dataset = result.scalar_one_or_none()
     if not dataset:
         raise HTTPException(status_code=404, detail="Dataset not found")
+    if req.target_column and dataset.columns and req.target_column not in dataset.columns:
+        raise HTTPException(status_code=400, detail=f"Column '{req.target_column}' not found")
+
+    job = await enqueue(db, user.id, "prediction", {"target_column": req.target_column}, dataset_id=dataset.id)
+    response.headers["Location"] = f"/api/v1/jobs/{job.id}"
+    return job_response(job)
+
 
+@job_handler("prediction", result_path="/predictions/{id}")
+async def prediction_job(db: AsyncSession, job: Job, progress) -> uuid.UUID:
+    dataset = await db.get(Dataset, job.dataset_id)
+    if dataset is None or dataset.owner_id != job.owner_id:
+        raise JobError("Dataset not found")
+
+    await progress(0.05, "Loading dataset")
     try:
-        df = pd.read_csv(io.StringIO(dataset.file_content))
+        df = await fetch_dataframe(db, dataset)
     except Exception:
-        raise HTTPException(status_code=500, detail="Failed to load dataset")
+        raise JobError("Failed to load dataset")
 
-    ml_result = run_prediction(df, req.target_column)
+    # Training can take minutes; the prediction is written in a fresh transaction afterwards
+    await release_connection(db)
+    await progress(0.2, "Training models")
+    ml_result = await compute.run(run_prediction, df, job.params.get("target_column"), dataset_digest(dataset), timeout=settings.JOB_COMPUTE_TIMEOUT)
 
+    artifact = ml_result.pop("artifact", None)
     if "error" in ml_result:
-        raise HTTPException(status_code=400, detail=ml_result["error"])
+        raise JobError(ml_result["error"])
 
     prediction = Prediction(
-        owner_id=user.id,
+        owner_id=job.owner_id,
         dataset_id=dataset.id,
         target_column=ml_result["target_column"],
         task=ml_result["task"],
@@ -53,38 +86,43 @@ async def create_prediction(
     )
     db.add(prediction)
     await db.flush()
-    await db.refresh(prediction)
-
-    return PredictResponse(
-        id=str(prediction.id),
-        dataset_id=str(prediction.dataset_id),
-        created_at=prediction.created_at,
-        **ml_result,
-    )
+    if artifact is not None:
+        db.add(ModelArtifact(prediction_id=prediction.id, library_versions=LIBRARY_VERSIONS, size_bytes=len(artifact), payload=artifact))
+    return prediction.id
 
 
 @router.get("/", response_model=List[dict])
-async def list_predictions(user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    result = await db.execute(
-        select(Prediction).where(Prediction.owner_id == user.id).order_by(Prediction.created_at.desc()).limit(50)
-    )
+async def list_predictions(
+    response: Response,
+    page: Page = Depends(),
+    user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    # Only the two fields of results the list shows, extracted by the database
+    query = select(
+        Prediction.id, Prediction.dataset_id, Prediction.target_column, Prediction.task, Prediction.created_at,
+        Prediction.results["best_model"].label("best_model"), Prediction.results["best_score"].label("best_score"),
+    ).where(Prediction.owner_id == user.id)
+    result = await db.execute(paginate(query, Prediction, page))
     return [
         {
             "id": str(p.id),
             "dataset_id": str(p.dataset_id),
             "target_column": p.target_column,
             "task": p.task,
-            "best_model": p.results.get("best_model"),
-            "best_score": p.results.get("best_score"),
+            "best_model": p.best_model,
+            "best_score": p.best_score,
             "created_at": p.created_at.isoformat(),
         }
-        for p in result.scalars().all()
+        for p in page_rows(result.all(), page, response)
     ]
 
 
 @router.get("/{prediction_id}")
-async def get_prediction(prediction_id: str, user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Prediction).where(Prediction.id == prediction_id, Prediction.owner_id == user.id))
+async def get_prediction(prediction_id: str, user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    result = await db.execute(
+        select(Prediction).options(undefer(Prediction.results)).where(Prediction.id == prediction_id, Prediction.owner_id == user.id)
+    )
     p = result.scalar_one_or_none()
     if not p:
         raise HTTPException(status_code=404, detail="Prediction not found")
@@ -96,3 +134,74 @@ async def get_prediction(prediction_id: str, user: User = Depends(get_current_us
         "results": p.results,
         "created_at": p.created_at.isoformat(),
     }
+
+
+@router.post("/{prediction_id}/score")
+@limiter.limit(settings.RATE_LIMIT_UPLOAD)
+async def score_prediction(
+    request: Request,
+    prediction_id: str,
+    file: UploadFile = File(...),
+    user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Score a CSV with the prediction's best model; streams back a CSV of row, prediction (and probability)."""
+    result = await db.execute(select(Prediction.id).where(Prediction.id == prediction_id, Prediction.owner_id == user.id))
+    pid = result.scalar_one_or_none()
+    if not pid:
+        raise HTTPException(status_code=404, detail="Prediction not found")
+    if os.path.splitext(file.filename or "")[1].lower() != ".csv":
+        raise HTTPException(status_code=400, detail="Upload a CSV file to score")
+    pipeline = await load_pipeline(db, pid)
+    if pipeline is None:
+        raise HTTPException(status_code=409, detail="This prediction has no stored model. Train it again to score new data.")
+    # The response streams for as long as scoring takes and needs nothing more from the database
+    await release_connection(db)
+
+    fd, tmp_path = tempfile.mkstemp(suffix=".csv")
+    os.close(fd)
+    try:
+        await spool_upload(file, tmp_path, max_bytes=settings.SCORE_MAX_FILE_SIZE)
+        reader = await asyncio.to_thread(open_scoring_csv, pipeline, tmp_path, settings.SCORE_BATCH_ROWS)
+    except HTTPException:
+        os.remove(tmp_path)
+        raise
+    except ValueError as e:
+        # Missing feature columns, or not parseable as CSV (pandas' errors are ValueErrors)
+        os.remove(tmp_path)
+        raise HTTPException(status_code=400, detail=str(e) if str(e).startswith("Missing columns") else "Could not parse CSV file")
+
+    name = sanitize_filename(os.path.splitext(os.path.basename(file.filename))[0])[:100] or "scores"
+    return StreamingResponse(
+        stream_scores(pipeline, reader, tmp_path),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{name}_scored.csv"'},
+    )
+
+
+@router.post("/{prediction_id}/predict", response_model=OnlinePredictResponse)
+async def predict_rows(
+    prediction_id: str,
+    req: OnlinePredictRequest,
+    user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Predict a few records with the prediction's best model, kept loaded in memory between calls."""
+    result = await db.execute(select(Prediction.id).where(Prediction.id == prediction_id, Prediction.owner_id == user.id))
+    pid = result.scalar_one_or_none()
+    if not pid:
+        raise HTTPException(status_code=404, detail="Prediction not found")
+    await release_connection(db)
+    pipeline = await inference.get_pipeline(pid)
+    if pipeline is None:
+        raise HTTPException(status_code=409, detail="This prediction has no stored model. Train it again to score new data.")
+    frame = pd.DataFrame.from_records(req.rows)
+    missing = pipeline.missing_columns(frame.columns)
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Missing columns: {', '.join(missing)}")
+    try:
+        scored = await inference.predict(pid, pipeline, frame[pipeline.features])
+    except (ValueError, TypeError) as e:
+        logger.info(f"Online prediction for {pid} rejected: {e}")
+        raise HTTPException(status_code=400, detail="Could not score these rows; check the column values")
+    return OnlinePredictResponse(prediction_id=str(pid), predictions=json.loads(scored.to_json(orient="records")))
@@ -1,24 +1,42 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt, ExpiredSignatureError
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from app.core.cache import LRUCache
 from app.core.config import settings
-from app.core.database import get_db
+from app.core.database import db_url, engine, get_db
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = logging.getLogger("analytiq")
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
 security = HTTPBearer()
 
+# bcrypt takes tens to hundreds of milliseconds of CPU per call and releases the GIL while it works, so
+# it runs on these threads: off the event loop, and at most PASSWORD_HASH_THREADS at a time per worker
+_hash_pool = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_THREADS, thread_name_prefix="bcrypt")
+
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+async def hash_password(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(_hash_pool, pwd_context.hash, password)
 
 
-def verify_password(plain: str, hashed: str) -> bool:
-    return pwd_context.verify(plain, hashed)
+async def verify_password(plain: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """Check a password against its stored hash.
+
+    Returns (valid, new_hash). new_hash is set when the password is valid
+    but ``hashed`` was made with other parameters than BCRYPT_ROUNDS, and
+    should replace it.
+    """
+    return await asyncio.get_running_loop().run_in_executor(_hash_pool, pwd_context.verify_and_update, plain, hashed)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -40,19 +58,139 @@ def decode_token(token: str) -> dict:
         raise HTTPException(status_code=401, detail="Invalid token")
 
 
+class Principal:
+    """The signed-in user as requests see it: a plain copy of the users row, not attached to any session."""
+    __slots__ = ("id", "email", "name", "company", "plan", "is_active", "created_at")
+
+    def __init__(self, user):
+        for name in self.__slots__:
+            setattr(self, name, getattr(user, name))
+
+
+# Principals by user id for this worker. Entries live at most USER_CACHE_TTL seconds, which bounds how
+# long a change made elsewhere (say is_active, by hand) goes unseen when no notification arrives
+user_cache = LRUCache(max_bytes=settings.USER_CACHE_SIZE, sizeof=lambda _: 1, ttl=settings.USER_CACHE_TTL)
+# Bumped by every invalidation. A cache miss only stores the row it read if this didn't move meanwhile:
+# otherwise a read that began before a change committed could re-cache the old row after its invalidation
+_invalidations = 0
+
+
+def invalidate_user(user_id) -> None:
+    """Drop a user from this worker's cache; other workers hear of it through UserChangeListener."""
+    global _invalidations
+    _invalidations += 1
+    user_id = str(user_id)
+    user_cache.discard(lambda key: key == user_id)
+
+
+def invalidate_all_users() -> None:
+    global _invalidations
+    _invalidations += 1
+    user_cache.discard(lambda key: True)
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: AsyncSession = Depends(get_db)
-):
+) -> Principal:
     from app.models.user import User
     payload = decode_token(credentials.credentials)
     user_id = payload.get("sub")
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid token")
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
+    user = user_cache.get(user_id)
+    if user is None:
+        seen = _invalidations
+        result = await db.execute(select(User).where(User.id == user_id))
+        row = result.scalar_one_or_none()
+        if not row:
+            raise HTTPException(status_code=401, detail="User not found")
+        user = Principal(row)
+        if _invalidations == seen:
+            user_cache.put(user_id, user)
     if not user.is_active:
         raise HTTPException(status_code=403, detail="Account deactivated")
     return user
+
+
+USER_CHANNEL = "analytiq_user_changed"
+
+# Notifies USER_CHANNEL with the user id whenever a users row changes in a way requests can see,
+# whoever makes the change: another worker, an admin script or plain SQL
+_USER_TRIGGER_DDL = (
+    f"""CREATE OR REPLACE FUNCTION analytiq_notify_user_changed() RETURNS trigger AS $$
+    BEGIN
+        PERFORM pg_notify('{USER_CHANNEL}', OLD.id::text);
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE TRIGGER users_changed
+    AFTER UPDATE OF email, name, company, plan, is_active OR DELETE ON users
+    FOR EACH ROW EXECUTE FUNCTION analytiq_notify_user_changed()""",
+)
+
+
+class UserChangeListener:
+    """Keeps user_cache coherent across workers with Postgres LISTEN/NOTIFY.
+
+    Listens on its own connection, outside the request pool. While it is
+    disconnected notifications may be missed, so the whole cache is dropped
+    on every (re)connect. On other databases only the TTL applies.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self.notifications = 0
+
+    async def start(self) -> None:
+        if not settings.USER_CACHE_NOTIFY or engine.dialect.name != "postgresql":
+            return
+        try:
+            async with engine.begin() as conn:
+                for ddl in _USER_TRIGGER_DDL:
+                    await conn.execute(text(ddl))
+        except Exception as e:
+            # Another worker may be replacing the trigger at the same moment; one copy is enough
+            logger.warning(f"Installing the users change trigger failed: {e}")
+        self._task = asyncio.create_task(self._listen())
+
+    async def shutdown(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        self.notifications += 1
+        invalidate_user(payload)
+
+    async def _listen(self) -> None:
+        listen_engine = create_async_engine(db_url, poolclass=NullPool)
+        try:
+            while True:
+                try:
+                    async with listen_engine.connect() as conn:
+                        raw = (await conn.get_raw_connection()).driver_connection
+                        lost = asyncio.Event()
+                        raw.add_termination_listener(lambda _: lost.set())
+                        await raw.add_listener(USER_CHANNEL, self._on_notify)
+                        invalidate_all_users()
+                        logger.info(f"Listening for user changes on {USER_CHANNEL}")
+                        while not lost.is_set():
+                            try:
+                                await asyncio.wait_for(lost.wait(), timeout=30)
+                            except asyncio.TimeoutError:
+                                # A connection dropped without a FIN never terminates; probe it
+                                await raw.fetchval("SELECT 1")
+                    logger.warning("User change listener disconnected")
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"User change listener failed: {e}")
+                await asyncio.sleep(5)
+        finally:
+            await listen_engine.dispose()
+
+    def snapshot(self) -> dict:
+        return {**user_cache.snapshot(), "notifications": self.notifications, "listening": self._task is not None}
+
+
+user_listener = UserChangeListener()
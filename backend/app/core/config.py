@@ -1,3 +1,5 @@
+import os
+import tempfile
 from pydantic_settings import BaseSettings
 from typing import List
 
@@ -17,6 +19,12 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "change-this-to-a-random-secret-key-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 8  # 8 hours
+    BCRYPT_ROUNDS: int = 12  # cost factor; stored hashes with another one are rehashed at next login
+    PASSWORD_HASH_THREADS: int = 4  # concurrent bcrypt calls per worker
+    # Signed-in users cached per worker, so authenticating a request needs no query
+    USER_CACHE_SIZE: int = 10_000
+    USER_CACHE_TTL: float = 60.0  # longest a user change can go unseen by a worker that missed the notification
+    USER_CACHE_NOTIFY: bool = True  # invalidate across workers via LISTEN/NOTIFY (Postgres only)
 
     # CORS
     ALLOWED_ORIGINS: List[str] = ["http://localhost:3000", "http://localhost:5173"]
@@ -24,13 +32,71 @@ class Settings(BaseSettings):
     # File handling
     MAX_FILE_SIZE: int = 50 * 1024 * 1024
     SUPPORTED_FILE_TYPES: List[str] = [".csv", ".xlsx", ".xls"]
+    # Datasets are stored as Arrow IPC; leave compression empty for zero-copy loads ("lz4"/"zstd" to shrink)
+    DATASET_IPC_COMPRESSION: str = ""
+    DATASET_IPC_BATCH_ROWS: int = 64_000
+    INGEST_CHUNK_BYTES: int = 1024 * 1024
+    INGEST_CSV_BLOCK_BYTES: int = 4 * 1024 * 1024
+    FRAME_CACHE_MAX_BYTES: int = 512 * 1024 * 1024  # parsed DataFrames kept per worker
 
     # OpenAI
     OPENAI_API_KEY: str = ""
 
     # Analysis
     MAX_PLOTS: int = 6
+    PLOT_BINARY_ARRAYS: bool = True  # base64 typed arrays in plot specs (needs plotly.js >= 2.28)
+    PLOT_POINTS_PER_TRACE: int = 2000  # cap on sampled/downsampled points in any one trace
+    PLOT_HIST_MAX_BINS: int = 50
+    PLOT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # rendered plots kept per worker
     MAX_ROWS_ANALYSIS: int = 100_000
+    EDA_OUTLIER_METHODS: List[str] = ["iqr"]  # add "mad" for modified z-score outliers
+    EDA_CORRELATION_METHOD: str = "pearson"  # or "spearman"
+    EDA_CORR_TOP_K: int = 50
+    EDA_CORR_MATRIX_MAX_COLS: int = 60
+    EDA_CORR_BLOCK_COLS: int = 1000  # at this width, correlate blockwise in float32
+    EDA_ANOVA_TIME_BUDGET: float = 2.0  # seconds spent on categorical x numeric ANOVA
+    # Datasets over MAX_ROWS_ANALYSIS are profiled by streaming sketches instead of one in-memory pass
+    EDA_SKETCH_HLL_PRECISION: int = 14  # 2**14 registers per column, ~0.8% distinct-count error
+    EDA_SKETCH_KLL_K: int = 200  # ~1.3% quantile rank error
+    EDA_SKETCH_HEAVY_HITTERS: int = 1024  # counters per categorical column
+
+    # Compute pool (EDA, plots, model training). 0 workers = run in a thread instead
+    COMPUTE_WORKERS: int = 2
+    COMPUTE_MAX_QUEUE: int = 8
+    COMPUTE_TASK_TIMEOUT: float = 110.0
+
+    # Background jobs (analyses, predictions). Runners in every web process claim jobs from the
+    # jobs table; set JOB_CONCURRENCY=0 there and run `python -m app.jobs` for dedicated workers
+    JOB_CONCURRENCY: int = 2  # jobs run at once per process
+    JOB_POLL_INTERVAL: float = 1.0
+    JOB_HEARTBEAT_INTERVAL: float = 5.0
+    JOB_STALE_AFTER: float = 60.0  # a running job with no heartbeat this long is requeued
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_BACKOFF: float = 10.0  # seconds before the first retry, doubled after each
+    JOB_COMPUTE_TIMEOUT: float = 1800.0  # per compute task inside a job; jobs hold no HTTP request
+
+    # Model training: candidate models fit concurrently; those still training at the budget are skipped
+    ML_TIME_BUDGET: float = 120.0  # seconds of wall-clock time per prediction
+    ML_TRAIN_THREADS: int = 0  # 0 = one per CPU core
+    ML_MAX_ROWS: int = 500_000  # rows sampled for training
+    ML_SELECTION: str = "halving"  # "halving": screen candidates on growing subsamples; "full": train all on everything
+    ML_HALVING_MIN_ROWS: int = 5_000  # first rung; halving only applies to training sets of at least min_rows * factor
+    ML_HALVING_FACTOR: int = 3  # each rung keeps 1/factor of the candidates on factor times the rows
+    ML_HALVING_BUDGET_SHARE: float = 0.5  # of ML_TIME_BUDGET, for screening; the rest is kept for the final full-data fit
+    # Encoded float32 feature matrices, memory-mapped by every worker on the host; empty to disable.
+    # Must be a directory only this user can write to (created 0700 if missing), or caching is skipped
+    FEATURE_CACHE_DIR: str = os.path.join(tempfile.gettempdir(), f"analytiq-features-{os.getuid() if hasattr(os, 'getuid') else 0}")
+    FEATURE_CACHE_MAX_BYTES: int = 2 * 1024 * 1024 * 1024
+
+    # Batch scoring (POST /predictions/{id}/score): the upload is spooled to disk and scored in batches
+    SCORE_MAX_FILE_SIZE: int = 2 * 1024 * 1024 * 1024
+    SCORE_BATCH_ROWS: int = 50_000
+
+    # Online inference (POST /predictions/{id}/predict)
+    PREDICT_MODEL_CACHE_MAX_BYTES: int = 512 * 1024 * 1024  # loaded models kept per worker
+    PREDICT_MODEL_TTL: float = 900.0  # seconds a loaded model stays cached
+    PREDICT_BATCH_WINDOW_MS: float = 2.0  # concurrent requests for one model within this window share a predict call
+    PREDICT_BATCH_MAX_ROWS: int = 1024
 
     # Rate limiting
     RATE_LIMIT_AUTH: str = "5/minute"
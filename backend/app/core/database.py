@@ -1,12 +1,73 @@
+import logging
+import time
+from collections import deque
+from sqlalchemy import event, exc, inspect
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.core.config import settings
 
+logger = logging.getLogger("analytiq")
+
 db_url = settings.DATABASE_URL.replace("sslmode=", "ssl=")
 
+
+class PoolStats:
+    """How long checkouts waited for a pooled connection, and how long they held it.
+
+    A long hold with little query time in it means a session kept its
+    transaction open across slow work; long waits mean the pool is exhausted.
+    """
+
+    def __init__(self, sample_window: int = 10_000):
+        self.waits = deque(maxlen=sample_window)  # seconds, most recent checkouts
+        self.holds = deque(maxlen=sample_window)
+        self.checkouts = 0
+        self.timeouts = 0
+
+    def snapshot(self, pool) -> dict:
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(0, pool.overflow()),
+            "wait_ms": _percentiles(self.waits),
+            "hold_ms": _percentiles(self.holds),
+        }
+
+
+def _percentiles(samples) -> dict:
+    ordered = sorted(samples)
+    if not ordered:
+        return {"p50": None, "p99": None, "max": None, "samples": 0}
+
+    def at(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+    return {"p50": at(0.5), "p99": at(0.99), "max": round(ordered[-1] * 1000, 3), "samples": len(ordered)}
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """The default async pool, timing how long each checkout waits for a connection (including pre-ping)."""
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            pool_stats.timeouts += 1
+            raise
+        finally:
+            pool_stats.waits.append(time.perf_counter() - start)
+
+
 engine = create_async_engine(
     db_url,
     echo=settings.APP_DEBUG,
+    poolclass=InstrumentedPool,
     pool_pre_ping=True,
     pool_size=settings.DB_POOL_SIZE,
     max_overflow=settings.DB_MAX_OVERFLOW,
@@ -17,6 +78,23 @@ engine = create_async_engine(
 async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
+@event.listens_for(engine.sync_engine, "checkout")
+def _on_checkout(dbapi_connection, record, proxy):
+    pool_stats.checkouts += 1
+    record.info["checked_out_at"] = time.perf_counter()
+
+
+@event.listens_for(engine.sync_engine, "checkin")
+def _on_checkin(dbapi_connection, record):
+    started = record.info.pop("checked_out_at", None)
+    if started is not None:
+        pool_stats.holds.append(time.perf_counter() - started)
+
+
+def pool_snapshot() -> dict:
+    return pool_stats.snapshot(engine.sync_engine.pool)
+
+
 class Base(DeclarativeBase):
     pass
 
@@ -33,11 +111,43 @@ async def get_db():
             await session.close()
 
 
+async def release_connection(db: AsyncSession) -> None:
+    """Commit the session's transaction so its connection goes back to the pool.
+
+    Call before slow work that needs no database (compute, outside APIs). The
+    session stays usable: loaded objects keep their state and the next query
+    checks a connection out again, in a new transaction.
+    """
+    await db.commit()
+
+
 async def init_db():
     import app.models.user  # noqa: F401
     import app.models.dataset  # noqa: F401
+    import app.models.job  # noqa: F401
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_sync_schema)
+
+
+def _sync_schema(conn):
+    """Bring existing tables up to date: add missing nullable columns and indexes.
+
+    create_all() only creates tables that don't exist yet, so columns and
+    indexes added to a model later would otherwise never reach the database.
+    """
+    inspector = inspect(conn)
+    preparer = conn.dialect.identifier_preparer
+    for table in Base.metadata.sorted_tables:
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            col_type = column.type.compile(dialect=conn.dialect)
+            conn.exec_driver_sql(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} {col_type}")
+            logger.info(f"Added column {table.name}.{column.name}")
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
 
 
 async def dispose_db():
@@ -0,0 +1,205 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger("analytiq")
+
+PRELOAD_MODULES = ("numpy", "pandas", "scipy.stats", "sklearn.ensemble", "sklearn.linear_model", "plotly.graph_objects", "app.eda", "app.ml")
+
+
+class ComputeBusyError(Exception):
+    pass
+
+
+class ComputeTimeoutError(Exception):
+    pass
+
+
+class ComputeWorkerError(Exception):
+    pass
+
+
+def _preload():
+    import importlib
+    for name in PRELOAD_MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            logger.warning(f"Compute worker could not preload {name}: {e}")
+
+
+def _worker_main(conn):
+    """Child process loop: receive (fn, args, kwargs), send back (ok, value)."""
+    _preload()
+    conn.send(("ready", None))
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            break
+        if task is None:
+            break
+        fn, args, kwargs = task
+        try:
+            reply = (True, fn(*args, **kwargs))
+        except BaseException as e:
+            reply = (False, e)
+        try:
+            conn.send(reply)
+        except Exception as e:
+            conn.send((False, ComputeWorkerError(f"Unpicklable task result: {e!r}")))
+
+
+class _Worker:
+    def __init__(self, ctx):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+
+class ComputeExecutor:
+    """Runs CPU-bound callables in a pool of warm worker processes.
+
+    Each worker handles one task at a time, so a task that overruns its
+    timeout (or whose caller is cancelled) is stopped by killing only its own
+    worker, which is then replaced. With ``workers=0`` tasks run in a thread
+    instead, for platforms that cannot spawn processes (e.g. serverless).
+    """
+
+    def __init__(self, workers: int, max_queue: int, timeout: float):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle: Optional[asyncio.Queue] = None
+        self._all: List[_Worker] = []
+        self._io: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "timed_out": 0, "cancelled": 0, "rejected": 0, "restarts": 0}
+
+    async def start(self):
+        if self.workers <= 0:
+            return
+        self._idle = asyncio.Queue()
+        # One thread per worker waits on its pipe so the event loop never blocks on recv()
+        self._io = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="compute-io")
+        await asyncio.gather(*(self._spawn() for _ in range(self.workers)))
+        logger.info(f"Compute executor started with {self.workers} workers")
+
+    async def shutdown(self):
+        for w in self._all:
+            try:
+                w.conn.send(None)
+            except Exception:
+                pass
+        for w in self._all:
+            w.kill()
+        self._all.clear()
+        if self._io:
+            self._io.shutdown(wait=False, cancel_futures=True)
+
+    async def _spawn(self):
+        w = _Worker(self._ctx)
+        self._all.append(w)
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self._io, w.conn.recv)
+            self._idle.put_nowait(w)
+        except Exception as e:
+            logger.error(f"Compute worker failed to start: {e}")
+            self._all.remove(w)
+            w.kill()
+
+    async def _replace(self, w: _Worker):
+        self.stats["restarts"] += 1
+        if w in self._all:
+            self._all.remove(w)
+        await asyncio.get_running_loop().run_in_executor(None, w.kill)
+        await self._spawn()
+
+    async def run(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Run ``fn(*args, **kwargs)`` in the pool and return its result.
+
+        Raises ComputeBusyError when the queue is full and ComputeTimeoutError
+        when the task does not finish within ``timeout`` seconds (queue wait
+        included). Exceptions raised by ``fn`` propagate unchanged.
+        """
+        if self._pending >= self.max_queue + max(self.workers, 1):
+            self.stats["rejected"] += 1
+            raise ComputeBusyError("Compute queue is full")
+        timeout = timeout or self.timeout
+        self._pending += 1
+        self.stats["submitted"] += 1
+        try:
+            if self.workers <= 0:
+                result = await asyncio.wait_for(asyncio.to_thread(fn, *args, **kwargs), timeout)
+            else:
+                result = await self._run_in_worker(fn, args, kwargs, timeout)
+            self.stats["completed"] += 1
+            return result
+        except asyncio.TimeoutError:
+            self.stats["timed_out"] += 1
+            raise ComputeTimeoutError(f"{getattr(fn, '__name__', 'task')} exceeded {timeout}s")
+        except asyncio.CancelledError:
+            self.stats["cancelled"] += 1
+            raise
+        except Exception:
+            self.stats["failed"] += 1
+            raise
+        finally:
+            self._pending -= 1
+
+    async def _run_in_worker(self, fn, args, kwargs, timeout):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        if not self._all:
+            raise ComputeWorkerError("No compute workers are running")
+        w = await asyncio.wait_for(self._idle.get(), timeout)
+        finished = False
+        try:
+            # Pickling a large DataFrame into the pipe takes a while; keep it off the loop too
+            await loop.run_in_executor(self._io, w.conn.send, (fn, args, kwargs))
+            remaining = max(deadline - loop.time(), 0.001)
+            ok, value = await asyncio.wait_for(loop.run_in_executor(self._io, w.conn.recv), remaining)
+            finished = True
+        except asyncio.TimeoutError:
+            raise
+        except (EOFError, OSError) as e:
+            raise ComputeWorkerError(f"Compute worker died: {e!r}")
+        finally:
+            if finished:
+                self._idle.put_nowait(w)
+            else:
+                # Timed out, cancelled or crashed: the worker may still be busy, so replace it
+                asyncio.ensure_future(self._replace(w))
+        if not ok:
+            raise value
+        return value
+
+    def snapshot(self) -> dict:
+        return {
+            "workers": self.workers,
+            "alive": sum(1 for w in self._all if w.process.is_alive()),
+            "idle": self._idle.qsize() if self._idle else 0,
+            "pending": self._pending,
+            "max_queue": self.max_queue,
+            **self.stats,
+        }
+
+
+compute = ComputeExecutor(
+    workers=settings.COMPUTE_WORKERS,
+    max_queue=settings.COMPUTE_MAX_QUEUE,
+    timeout=settings.COMPUTE_TASK_TIMEOUT,
+)
@@ -16,7 +16,9 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
         response.headers["X-XSS-Protection"] = "1; mode=block"
         response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
         response.headers["Permissions-Policy"] = "camera=(), microphone=(), geolocation=()"
-        response.headers["Cache-Control"] = "no-store" if "/api/" in str(request.url) else "public, max-age=3600"
+        if "cache-control" not in response.headers:
+            # Routes serving immutable content (plots, plot templates) set their own policy
+            response.headers["Cache-Control"] = "no-store" if "/api/" in str(request.url) else "public, max-age=3600"
         return response
 
 
@@ -0,0 +1,59 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import Select, tuple_
+
+# Listings return newest first, a page at a time. The position after the last row is handed back as an
+# opaque cursor in this header; passing it as ?cursor= continues from there
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class Page:
+    """``cursor`` and ``limit`` query parameters of a paginated listing."""
+
+    def __init__(
+        self,
+        cursor: Optional[str] = Query(None, description=f"Value of {NEXT_CURSOR_HEADER} from the previous page"),
+        limit: int = Query(50, ge=1, le=200),
+    ):
+        self.cursor = cursor
+        self.limit = limit
+
+
+def encode_cursor(created_at: datetime, id_) -> str:
+    raw = json.dumps([created_at.isoformat(), str(id_)]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        created_at, id_ = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(created_at), uuid.UUID(id_)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def paginate(query: Select, model, page: Page) -> Select:
+    """Order ``query`` newest first and restrict it to the page after ``page.cursor``.
+
+    Seeks on (created_at, id) rather than using OFFSET, so every page costs the
+    same on the (owner_id, created_at, id) index however deep it is. One row
+    more than the limit is fetched to tell whether another page follows; pass
+    the rows to ``page_rows``.
+    """
+    if page.cursor:
+        query = query.where(tuple_(model.created_at, model.id) < tuple_(*decode_cursor(page.cursor)))
+    return query.order_by(model.created_at.desc(), model.id.desc()).limit(page.limit + 1)
+
+
+def page_rows(rows, page: Page, response: Response) -> list:
+    """Trim the look-ahead row and set the next-page cursor header if there is one."""
+    rows = list(rows)
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows
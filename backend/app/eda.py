@@ -3,22 +3,20 @@ import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import base64
 import io
-from scipy import stats
+import math
+import time
+import pyarrow.types as pa_types
 from scipy.stats import shapiro, normaltest, anderson, chi2_contingency
+from app.core.config import settings
+from app.stats import QUANTILES, column_stats, iqr_outliers, mad_outliers, correlation_matrix, top_correlated_pairs, grouped_anova
+from app.sketches import DatasetSketch
+from app.storage import payload_layout, iter_frame_batches
+from app.plots import make_plot
+from app.plotdata import histogram_bins, box_stats, qq_points, stratified_sample, lttb
 import warnings
 warnings.filterwarnings('ignore')
 
-def df_to_base64_png(fig):
-    """Convert plotly figure to base64 encoded HTML"""
-    html_str = fig.to_html(include_plotlyjs='cdn', full_html=True)
-    return {'b64': base64.b64encode(html_str.encode('utf-8')).decode('utf-8'), 'mime': 'text/html'}
-
-def make_plot(name, fig):
-    result = df_to_base64_png(fig)
-    return {'name': name, 'mime': result['mime'], 'b64': result['b64']}
-
 def convert_np(obj):
     if isinstance(obj, (np.integer, np.int64, np.int32)):
         return int(obj)
@@ -28,57 +26,306 @@ def convert_np(obj):
         return obj.tolist()
     return obj
 
-def generate_eda(df: pd.DataFrame):
-    """Generate comprehensive EDA suitable for LLM consumption"""
-    # Basic information
-    eda = {
+PROFILE_VERSION = 4
+# Bump when generate_eda or plot_manifest change, so memoized analysis results are recomputed
+EDA_VERSION = 1
+
+
+def _num(v):
+    """Plain float for JSON, with NaN/inf mapped to None (Postgres JSON rejects NaN)."""
+    v = float(v)
+    return v if np.isfinite(v) else None
+
+
+EXACT = {'kind': 'exact'}
+
+
+def _exact_accuracy(n_rows):
+    statistics = ('rows', 'memory_bytes', 'missing_values', 'duplicate_rows', 'nunique', 'numeric_moments',
+                  'numeric_quantiles', 'categorical_counts', 'categorical_entropy', 'correlation')
+    return {'mode': 'exact', 'rows_scanned': int(n_rows), 'statistics': {name: EXACT for name in statistics}}
+
+
+def _stat_vector(summary_stats, cols, label):
+    return np.array([np.nan if summary_stats[c][label] is None else summary_stats[c][label] for c in cols], dtype=np.float64)
+
+
+def build_profile(df: pd.DataFrame):
+    """Dataset-level statistics that don't depend on the prompt.
+
+    Computed once per dataset (at upload) and stored in dataset_profiles, so
+    each analysis only assembles these facts instead of recomputing them.
+    """
+    cs = column_stats(df, top_k=10)
+    n_rows = cs['rows']
+    null_counts = cs['nulls']
+    duplicates = cs['duplicates']
+    numeric_cols = cs['numeric_columns']
+    categorical_cols = cs['categorical_columns']
+
+    profile = {
+        'version': PROFILE_VERSION,
         'dataset_info': {
-            'rows': int(len(df)),
+            'rows': int(n_rows),
             'columns': int(len(df.columns)),
-            'total_memory_bytes': int(df.memory_usage(deep=True).sum()),
-            'duplicate_rows': int(df.duplicated().sum()),
-            'duplicate_percentage': float(round((df.duplicated().sum() / len(df)) * 100, 2))
+            'total_memory_bytes': cs['memory_bytes'],
+            'duplicate_rows': duplicates,
+            'duplicate_percentage': float(round((duplicates / n_rows) * 100, 2))
         },
         'columns': list(df.columns),
         'dtypes': df.dtypes.astype(str).to_dict(),
         'missing_values': {
-            'count': {k: int(v) for k, v in df.isnull().sum().to_dict().items()},
-            'percentage': {col: float(round((df[col].isnull().sum() / len(df)) * 100, 2)) 
-                          for col in df.columns},
-            'total_missing': int(df.isnull().sum().sum()),
-            'total_missing_percentage': float(round((df.isnull().sum().sum() / (len(df) * len(df.columns))) * 100, 2))
+            'count': {k: int(v) for k, v in null_counts.to_dict().items()},
+            'percentage': {col: float(round((null_counts[col] / n_rows) * 100, 2)) for col in df.columns},
+            'total_missing': int(null_counts.sum()),
+            'total_missing_percentage': float(round((null_counts.sum() / (n_rows * len(df.columns))) * 100, 2))
+        },
+        'nunique': cs['nunique'],
+        'numeric_columns': list(numeric_cols),
+        'categorical_columns': list(categorical_cols),
+    }
+
+    if len(numeric_cols) > 0:
+        ns = cs['numeric']
+        describe_keys = [('count', 'count'), ('mean', 'mean'), ('std', 'std'), ('min', 'min'),
+                         ('25%', 'q25'), ('50%', 'q50'), ('75%', 'q75'), ('max', 'max')]
+        profile['numeric'] = {
+            'summary_stats': {col: {label: _num(ns[key][i]) for label, key in describe_keys} for i, col in enumerate(numeric_cols)},
+            'skewness': {col: _num(ns['skew'][i]) for i, col in enumerate(numeric_cols)},
+            'kurtosis': {col: _num(ns['kurtosis'][i]) for i, col in enumerate(numeric_cols)},
+            'zeros_count': {col: int(ns['zeros'][i]) for i, col in enumerate(numeric_cols)},
+        }
+
+    if len(categorical_cols) > 0:
+        cats = cs['categorical']
+        profile['categorical'] = {
+            'value_counts': {col: {str(k): int(v) for k, v in cats[col]['top'].items()} for col in categorical_cols},
+            'unique_values': {col: cats[col]['nunique'] for col in categorical_cols},
+            'mode': {col: cats[col]['mode'] for col in categorical_cols},
+            'entropy': {col: cats[col]['entropy'] for col in categorical_cols}
+        }
+
+    if len(numeric_cols) > 1:
+        X = df[numeric_cols].to_numpy(dtype=np.float64, na_value=np.nan)
+        r, n = correlation_matrix(X, method=settings.EDA_CORRELATION_METHOD, block_cols=settings.EDA_CORR_BLOCK_COLS)
+        del X
+        cols = list(numeric_cols)
+        profile['correlation'] = {
+            'method': settings.EDA_CORRELATION_METHOD,
+            # The full matrix is O(columns^2); wide datasets only keep the strongest pairs
+            'matrix': ({a: {b: _num(r[j, i]) for j, b in enumerate(cols)} for i, a in enumerate(cols)}
+                       if len(cols) <= settings.EDA_CORR_MATRIX_MAX_COLS else None),
+            'highly_correlated_pairs': top_correlated_pairs(r, n, cols, threshold=0.8, top_k=settings.EDA_CORR_TOP_K),
         }
+
+    profile['accuracy'] = _exact_accuracy(n_rows)
+    return profile
+
+
+def _sketch_dtypes(schema, nulls):
+    """The dtypes pandas would give the whole table: ints with nulls become float64, bools with nulls object."""
+    frame = schema.empty_table().to_pandas()
+    for field in schema:
+        if nulls[field.name]:
+            if pa_types.is_integer(field.type):
+                frame[field.name] = frame[field.name].astype(np.float64)
+            elif pa_types.is_boolean(field.type):
+                frame[field.name] = frame[field.name].astype(object)
+    return frame
+
+
+def build_sketch_profile(payload: bytes):
+    """build_profile for datasets too large to hold as one DataFrame.
+
+    Streams the stored Arrow batches through a DatasetSketch, so memory stays
+    bounded however many rows there are. The profile has the same shape as
+    build_profile's; its 'accuracy' section says which statistics are exact
+    and gives the error bounds of the approximate ones.
+    """
+    schema, nulls, total_rows = payload_layout(payload)
+    frame = _sketch_dtypes(schema, nulls)
+    columns = list(frame.columns)
+    numeric_cols = list(frame.select_dtypes(include=['number']).columns)
+    categorical_cols = list(frame.select_dtypes(include=['object', 'category']).columns)
+    method = settings.EDA_CORRELATION_METHOD
+
+    sketch = DatasetSketch(
+        columns, numeric_cols, categorical_cols,
+        hll_precision=settings.EDA_SKETCH_HLL_PRECISION,
+        kll_k=settings.EDA_SKETCH_KLL_K,
+        heavy_hitters=settings.EDA_SKETCH_HEAVY_HITTERS,
+        correlation=method == 'pearson',
+        wide_cols=settings.EDA_CORR_BLOCK_COLS,
+    )
+    # Rank correlation can't be streamed; it uses a uniform sample of about MAX_ROWS_ANALYSIS rows
+    rng = np.random.default_rng(42)
+    keep_rate = min(settings.MAX_ROWS_ANALYSIS / max(total_rows, 1), 1.0)
+    sample = []
+    for chunk in iter_frame_batches(payload):
+        sketch.update(chunk)
+        if method != 'pearson' and len(numeric_cols) > 1:
+            sample.append(chunk.loc[rng.random(len(chunk)) < keep_rate, numeric_cols].to_numpy(dtype=np.float64, na_value=np.nan))
+        del chunk
+
+    n_rows = sketch.rows
+    distinct_rows = sketch.distinct_rows()
+    duplicates = n_rows - distinct_rows
+    null_counts = sketch.nulls
+    nunique = {col: sketch.nunique(col) for col in columns}
+
+    profile = {
+        'version': PROFILE_VERSION,
+        'dataset_info': {
+            'rows': int(n_rows),
+            'columns': len(columns),
+            'total_memory_bytes': sketch.memory_bytes,
+            'duplicate_rows': int(duplicates),
+            'duplicate_percentage': float(round((duplicates / max(n_rows, 1)) * 100, 2))
+        },
+        'columns': columns,
+        'dtypes': frame.dtypes.astype(str).to_dict(),
+        'missing_values': {
+            'count': {col: int(null_counts[col]) for col in columns},
+            'percentage': {col: float(round((null_counts[col] / max(n_rows, 1)) * 100, 2)) for col in columns},
+            'total_missing': int(null_counts.sum()),
+            'total_missing_percentage': float(round((null_counts.sum() / max(n_rows * len(columns), 1)) * 100, 2))
+        },
+        'nunique': nunique,
+        'numeric_columns': numeric_cols,
+        'categorical_columns': categorical_cols,
+    }
+
+    hll_error = 2 * sketch.row_hll.relative_error  # ~95% bound on the distinct-row estimate
+    statistics = {
+        'rows': EXACT,
+        'memory_bytes': EXACT,
+        'missing_values': EXACT,
+        'duplicate_rows': {'kind': 'approximate', 'method': 'hyperloglog', 'confidence': 0.95,
+                           'error_bound': int(math.ceil(hll_error * distinct_rows))},
+        'numeric_moments': EXACT,  # count, mean, std, min, max, skewness, kurtosis, zeros
+        'correlation': EXACT,
     }
+    exact_nunique = [col for col in categorical_cols if sketch.heavy[col].exact]
+    statistics['nunique'] = (EXACT if len(exact_nunique) == len(columns) else
+                             {'kind': 'approximate', 'method': 'hyperloglog', 'confidence': 0.95,
+                              'relative_error': round(2 * sketch.distinct[columns[0]].relative_error, 4),
+                              'exact_columns': exact_nunique})
+
+    if len(numeric_cols) > 0:
+        m = sketch.moments.result()
+        q = np.array([kll.quantiles(QUANTILES) for kll in sketch.quantiles])
+        stats_by_key = {'count': m['count'], 'mean': m['mean'], 'std': m['std'], 'min': m['min'],
+                        '25%': q[:, 0], '50%': q[:, 1], '75%': q[:, 2], 'max': m['max']}
+        profile['numeric'] = {
+            'summary_stats': {col: {label: _num(v[i]) for label, v in stats_by_key.items()} for i, col in enumerate(numeric_cols)},
+            'skewness': {col: _num(m['skew'][i]) for i, col in enumerate(numeric_cols)},
+            'kurtosis': {col: _num(m['kurtosis'][i]) for i, col in enumerate(numeric_cols)},
+            'zeros_count': {col: int(m['zeros'][i]) for i, col in enumerate(numeric_cols)},
+        }
+        rank_error = max(kll.rank_error for kll in sketch.quantiles)
+        statistics['numeric_quantiles'] = (EXACT if rank_error == 0 else
+                                           {'kind': 'approximate', 'method': 'kll', 'confidence': 0.99,
+                                            'normalized_rank_error': round(rank_error, 4)})
+
+    if len(categorical_cols) > 0:
+        heavy = sketch.heavy
+        profile['categorical'] = {
+            'value_counts': {col: {str(k): int(v) for k, v in heavy[col].top(10).items()} for col in categorical_cols},
+            'unique_values': {col: nunique[col] for col in categorical_cols},
+            'mode': {col: heavy[col].mode() for col in categorical_cols},
+            'entropy': {col: _num(heavy[col].entropy(nunique[col])) for col in categorical_cols}
+        }
+        # Misra-Gries counts are never too high and at most error_bound too low
+        inexact = {col: int(heavy[col].error) for col in categorical_cols if not heavy[col].exact}
+        statistics['categorical_counts'] = (EXACT if not inexact else
+                                            {'kind': 'approximate', 'method': 'misra_gries', 'confidence': 1.0,
+                                             'count_error_bound': inexact})
+        statistics['categorical_entropy'] = (EXACT if not inexact else
+                                             {'kind': 'approximate', 'method': 'misra_gries', 'error_bound': None,
+                                              'columns': sorted(inexact)})
+
+    if len(numeric_cols) > 1:
+        if sketch.comoments is not None:
+            r, n = sketch.comoments.result()
+        else:
+            X = np.concatenate(sample) if sample else np.empty((0, len(numeric_cols)))
+            r, n = correlation_matrix(X, method=method, block_cols=settings.EDA_CORR_BLOCK_COLS)
+            statistics['correlation'] = {'kind': 'approximate', 'method': 'uniform_sample', 'sample_rows': len(X),
+                                         'standard_error': round(1 / math.sqrt(max(len(X) - 3, 1)), 4)}
+            del X, sample
+        profile['correlation'] = {
+            'method': method,
+            'matrix': ({a: {b: _num(r[j, i]) for j, b in enumerate(numeric_cols)} for i, a in enumerate(numeric_cols)}
+                       if len(numeric_cols) <= settings.EDA_CORR_MATRIX_MAX_COLS else None),
+            'highly_correlated_pairs': top_correlated_pairs(r, n, numeric_cols, threshold=0.8, top_k=settings.EDA_CORR_TOP_K),
+        }
+
+    profile['accuracy'] = {'mode': 'sketch', 'rows_scanned': int(n_rows), 'statistics': statistics}
+    return profile
+
+
+def generate_eda(df: pd.DataFrame, profile=None):
+    """Generate comprehensive EDA suitable for LLM consumption.
+
+    Dataset-level facts come from ``profile`` (see build_profile); only the
+    tests that need the rows themselves are computed here.
+    """
+    if profile is None:
+        profile = build_profile(df)
+
+    # Basic information
+    eda = {
+        'dataset_info': profile['dataset_info'],
+        'columns': profile['columns'],
+        'dtypes': profile['dtypes'],
+        'missing_values': profile['missing_values'],
+    }
+
+    # Which statistics are exact; row-level tests below only see the rows passed in
+    eda['statistics_accuracy'] = {**profile['accuracy'], 'analysis_rows': len(df)}
+    if len(df) < profile['dataset_info']['rows']:
+        eda['statistics_accuracy']['sampled_sections'] = [
+            'outliers', 'normality_tests', 'datetime_analysis', 'categorical_numeric_relationships', 'multivariate_analysis']
     
     # Numeric analysis
-    numeric_cols = df.select_dtypes(include=['number']).columns
+    numeric_cols = pd.Index([c for c in profile['numeric_columns'] if c in df.columns])
     if len(numeric_cols) > 0:
         numeric_df = df[numeric_cols]
         eda['numeric_analysis'] = {
-            'summary_stats': {k: {kk: convert_np(vv) for kk, vv in v.items()} for k, v in numeric_df.describe().to_dict().items()},
-            'skewness': {k: float(v) for k, v in numeric_df.skew().to_dict().items()},
-            'kurtosis': {k: float(v) for k, v in numeric_df.kurtosis().to_dict().items()},
-            'zeros_count': {col: int((numeric_df[col] == 0).sum()) for col in numeric_cols},
+            **profile['numeric'],
             'outliers_iqr': {},
             'normality_tests': {},
             'variance_inflation_factors': {}
         }
         
-        # Outlier detection using IQR method
-        for col in numeric_cols:
-            Q1 = numeric_df[col].quantile(0.25)
-            Q3 = numeric_df[col].quantile(0.75)
-            IQR = Q3 - Q1
-            lower_bound = Q1 - 1.5 * IQR
-            upper_bound = Q3 + 1.5 * IQR
-            outliers = numeric_df[(numeric_df[col] < lower_bound) | (numeric_df[col] > upper_bound)]
+        # Outlier detection: one pass over the numeric matrix per method, quartiles from the profile
+        X = numeric_df.to_numpy(dtype=np.float64, na_value=np.nan)
+        n_rows = max(len(numeric_df), 1)
+        summary = profile['numeric']['summary_stats']
+        iqr = iqr_outliers(X, _stat_vector(summary, numeric_cols, '25%'), _stat_vector(summary, numeric_cols, '75%'))
+        for i, col in enumerate(numeric_cols):
+            if np.isnan(iqr['lower'][i]) or np.isnan(iqr['upper'][i]):
+                continue
             eda['numeric_analysis']['outliers_iqr'][col] = {
-                'count': int(len(outliers)),
-                'percentage': float(round((len(outliers) / len(numeric_df)) * 100, 2)),
-                'lower_bound': float(lower_bound),
-                'upper_bound': float(upper_bound)
+                'count': int(iqr['count'][i]),
+                'percentage': float(round((iqr['count'][i] / n_rows) * 100, 2)),
+                'lower_bound': float(iqr['lower'][i]),
+                'upper_bound': float(iqr['upper'][i])
             }
-            
+        if 'mad' in settings.EDA_OUTLIER_METHODS:
+            mad = mad_outliers(X, _stat_vector(summary, numeric_cols, '50%'))
+            eda['numeric_analysis']['outliers_mad'] = {
+                col: {
+                    'count': int(mad['count'][i]),
+                    'percentage': float(round((mad['count'][i] / n_rows) * 100, 2)),
+                    'median': _num(mad['median'][i]),
+                    'mad': _num(mad['mad'][i]),
+                    'threshold': mad['threshold'],
+                } for i, col in enumerate(numeric_cols) if not np.isnan(mad['median'][i])
+            }
+        del X
+
+        for col in numeric_cols:
             # Normality tests
             data = numeric_df[col].dropna()
             if len(data) > 3:
@@ -101,15 +348,9 @@ def generate_eda(df: pd.DataFrame):
                     pass
     
     # Categorical analysis
-    categorical_cols = df.select_dtypes(include=['object', 'category']).columns
+    categorical_cols = pd.Index([c for c in profile['categorical_columns'] if c in df.columns])
     if len(categorical_cols) > 0:
-        categorical_df = df[categorical_cols]
-        eda['categorical_analysis'] = {
-            'value_counts': {col: {k: int(v) for k, v in df[col].value_counts().head(10).to_dict().items()} for col in categorical_cols},
-            'unique_values': {col: int(df[col].nunique()) for col in categorical_cols},
-            'mode': {col: df[col].mode().iloc[0] if not df[col].mode().empty else None for col in categorical_cols},
-            'entropy': {col: float(stats.entropy(df[col].value_counts(normalize=True))) for col in categorical_cols}
-        }
+        eda['categorical_analysis'] = profile['categorical']
     
     # DateTime analysis (if any datetime columns)
     datetime_cols = df.select_dtypes(include=['datetime64']).columns
@@ -136,55 +377,61 @@ def generate_eda(df: pd.DataFrame):
                     }
     
     # Correlation analysis
-    if len(numeric_cols) > 1:
-        correlation_matrix = df[numeric_cols].corr()
+    if len(numeric_cols) > 1 and 'correlation' in profile:
+        # Pairs (|r| > 0.8) and their p-values come from the profile's pairwise-complete r and n
         eda['correlation_analysis'] = {
-            'matrix': {k: {kk: float(vv) for kk, vv in v.items()} for k, v in correlation_matrix.to_dict().items()},
-            'highly_correlated_pairs': [],
+            'method': profile['correlation']['method'],
+            'matrix': profile['correlation']['matrix'],
+            'highly_correlated_pairs': profile['correlation']['highly_correlated_pairs'],
             'correlation_with_pvalues': {}
         }
-        
-        # Find highly correlated pairs (|r| > 0.8)
-        for i in range(len(correlation_matrix.columns)):
-            for j in range(i):
-                corr_value = correlation_matrix.iloc[i, j]
-                if abs(corr_value) > 0.8:
-                    # Calculate p-value for correlation
-                    p_value = stats.pearsonr(df[numeric_cols[i]].dropna(), df[numeric_cols[j]].dropna())[1]
-                    
-                    eda['correlation_analysis']['highly_correlated_pairs'].append({
-                        'feature1': correlation_matrix.columns[i],
-                        'feature2': correlation_matrix.columns[j],
-                        'correlation': float(round(corr_value, 3)),
-                        'p_value': float(p_value)
-                    })
     
     # Cardinality analysis
+    n_rows = profile['dataset_info']['rows']
     eda['cardinality'] = {
-        'high_cardinality_features': {col: int(df[col].nunique()) for col in df.columns 
-                                     if df[col].nunique() > 50 and df[col].nunique() < len(df) / 2}
+        'high_cardinality_features': {col: n for col, n in profile['nunique'].items()
+                                     if n > 50 and n < n_rows / 2}
     }
     
     # Relationship analysis between categorical and numeric variables
     if len(categorical_cols) > 0 and len(numeric_cols) > 0:
         eda['categorical_numeric_relationships'] = {}
         
-        # For each categorical variable, analyze relationship with numeric variables
-        for cat_col in categorical_cols[:3]:  # Limit to first 3 to avoid combinatorial explosion
-            if df[cat_col].nunique() <= 10:  # Only for categorical with reasonable number of categories
-                eda['categorical_numeric_relationships'][cat_col] = {}
-                
-                for num_col in numeric_cols[:3]:  # Limit to first 3 numeric
-                    # ANOVA test for difference in means across categories
-                    groups = [df[df[cat_col] == category][num_col].dropna() for category in df[cat_col].unique()]
-                    if all(len(group) > 1 for group in groups):  # Ensure we have at least 2 samples per group
-                        f_stat, p_value = stats.f_oneway(*groups)
-                        eda['categorical_numeric_relationships'][cat_col][num_col] = {
-                            'anova_f_stat': float(f_stat),
-                            'anova_p_value': float(p_value),
-                            'mean_by_category': {str(cat): float(df[df[cat_col] == cat][num_col].mean()) 
-                                               for cat in df[cat_col].unique()}
-                        }
+        # ANOVA of every numeric column across each low-cardinality categorical, one grouped pass
+        # per categorical, until the time budget runs out
+        eligible = [c for c in categorical_cols if profile['nunique'][c] <= 10]
+        X = numeric_df.to_numpy(dtype=np.float64, na_value=np.nan)
+        deadline = time.perf_counter() + settings.EDA_ANOVA_TIME_BUDGET
+        tested = 0
+        budget_exhausted = False
+        for cat_col in eligible:
+            if time.perf_counter() > deadline:
+                budget_exhausted = True
+                break
+            codes, categories = pd.factorize(df[cat_col])
+            if len(categories) < 2:
+                continue
+            anova = grouped_anova(codes, len(categories), X)
+            tested += 1
+            results = {}
+            for j, num_col in enumerate(numeric_cols):
+                counts = anova['counts'][:, j]
+                if not (counts > 1).all():  # Ensure we have at least 2 samples per group
+                    continue
+                results[num_col] = {
+                    'anova_f_stat': _num(anova['f'][j]),
+                    'anova_p_value': _num(anova['p'][j]),
+                    'mean_by_category': {str(cat): _num(anova['means'][g, j]) for g, cat in enumerate(categories)}
+                }
+            if results:
+                eda['categorical_numeric_relationships'][cat_col] = results
+        del X
+        eda['anova_coverage'] = {
+            'categorical_columns_eligible': len(eligible),
+            'categorical_columns_tested': tested,
+            'numeric_columns': len(numeric_cols),
+            'time_budget_exhausted': budget_exhausted,
+        }
     
     # Multivariate analysis - PCA readiness check
     if len(numeric_cols) > 1:
@@ -203,225 +450,315 @@ def generate_eda(df: pd.DataFrame):
     
     return eda
 
-def generate_default_plots(df: pd.DataFrame, max_plots=10):
-    """Generate comprehensive visualizations for EDA"""
-    plots = []
+def _hist_trace(values, name):
+    h = histogram_bins(values, max_bins=settings.PLOT_HIST_MAX_BINS)
+    return go.Bar(x=h['centers'], y=h['counts'], width=h['widths'], name=name, marker_line_width=0)
+
+def _box_traces(values, name, x=None):
+    """A box drawn from precomputed stats plus its (capped) outlier points."""
+    b = box_stats(values, max_outliers=settings.PLOT_POINTS_PER_TRACE)
+    if b is None:
+        return []
+    box = go.Box(
+        x=[x] if x is not None else None, name=name if x is None else str(x),
+        q1=[b['q1']], median=[b['median']], q3=[b['q3']], mean=[b['mean']],
+        lowerfence=[b['lowerfence']], upperfence=[b['upperfence']], boxpoints=False,
+        marker_color='#636efa'
+    )
+    points = go.Scatter(
+        x=[x if x is not None else name] * len(b['outliers']), y=b['outliers'], mode='markers',
+        marker=dict(size=4, color='#636efa'), name=f'{name} outliers', showlegend=False
+    )
+    return [box, points]
+
+def _sample_note(sample, df):
+    return f" (stratified sample of {len(sample):,} of {len(df):,} rows)" if len(sample) < len(df) else ""
+
+def _numeric_columns(df):
+    return df.select_dtypes(include=['number']).columns
+
+def plot_correlation_matrix(df):
+    corr_matrix = df[_numeric_columns(df)].corr()
+    return px.imshow(
+        corr_matrix, 
+        title='Feature Correlation Matrix',
+        color_continuous_scale='RdBu_r',
+        aspect="auto",
+        zmin=-1, 
+        zmax=1
+    )
+
+def plot_missing_values(df):
+    missing_data = df.isnull().sum()
+    missing_df = pd.DataFrame({
+        'column': missing_data.index,
+        'missing_count': missing_data.values,
+        'missing_percentage': (missing_data.values / len(df)) * 100
+    }).sort_values('missing_percentage', ascending=False)
     
-    # 1) Correlation heatmap for numeric features
-    numeric_cols = df.select_dtypes(include=['number']).columns
-    if len(numeric_cols) >= 2:
-        corr_matrix = df[numeric_cols].corr()
-        fig = px.imshow(
-            corr_matrix, 
-            title='Feature Correlation Matrix',
-            color_continuous_scale='RdBu_r',
-            aspect="auto",
-            zmin=-1, 
-            zmax=1
-        )
-        plots.append(make_plot('correlation_matrix', fig))
+    fig = px.bar(
+        missing_df[missing_df['missing_count'] > 0],
+        x='column',
+        y='missing_percentage',
+        title='Missing Values by Column (%)',
+        labels={'column': 'Column', 'missing_percentage': 'Missing Values (%)'}
+    )
+    fig.update_layout(xaxis_tickangle=-45)
+    return fig
+
+def plot_numeric_distributions(df):
+    numeric_cols = _numeric_columns(df)
+    n_cols = min(3, len(numeric_cols))
+    n_rows = int(np.ceil(len(numeric_cols) / n_cols))
     
-    # 2) Missing values visualization
-    missing_data = df.isnull().sum()
-    if missing_data.sum() > 0:
-        missing_df = pd.DataFrame({
-            'column': missing_data.index,
-            'missing_count': missing_data.values,
-            'missing_percentage': (missing_data.values / len(df)) * 100
-        }).sort_values('missing_percentage', ascending=False)
+    fig = make_subplots(
+        rows=n_rows, 
+        cols=n_cols,
+        subplot_titles=numeric_cols
+    )
+    
+    for i, col in enumerate(numeric_cols):
+        row = (i // n_cols) + 1
+        col_num = (i % n_cols) + 1
         
-        fig = px.bar(
-            missing_df[missing_df['missing_count'] > 0],
-            x='column',
-            y='missing_percentage',
-            title='Missing Values by Column (%)',
-            labels={'column': 'Column', 'missing_percentage': 'Missing Values (%)'}
+        # Pre-binned on the server: one bar per bin instead of every row
+        fig.add_trace(
+            _hist_trace(df[col], col),
+            row=row, 
+            col=col_num
         )
-        fig.update_layout(xaxis_tickangle=-45)
-        plots.append(make_plot('missing_values', fig))
     
-    # 3) Distribution of numeric features with Q-Q plots
-    if len(numeric_cols) > 0:
-        # Create subplots for distributions
-        n_cols = min(3, len(numeric_cols))
-        n_rows = int(np.ceil(len(numeric_cols) / n_cols))
+    fig.update_layout(
+        title_text="Distribution of Numeric Features",
+        height=300 * n_rows,
+        showlegend=False,
+        bargap=0
+    )
+    return fig
+
+def plot_qq(df):
+    numeric_cols = _numeric_columns(df)
+    n_cols = min(2, len(numeric_cols))
+    n_rows = int(np.ceil(len(numeric_cols) / n_cols))
+    
+    fig = make_subplots(
+        rows=n_rows, 
+        cols=n_cols,
+        subplot_titles=[f"Q-Q Plot: {col}" for col in numeric_cols],
+        vertical_spacing=0.1
+    )
+    
+    for i, col in enumerate(numeric_cols):
+        row = (i // n_cols) + 1
+        col_num = (i % n_cols) + 1
         
-        fig = make_subplots(
-            rows=n_rows, 
-            cols=n_cols,
-            subplot_titles=numeric_cols
-        )
+        # Q-Q points at evenly spaced ranks; the fit line still uses every value
+        qq = qq_points(df[col], max_points=settings.PLOT_POINTS_PER_TRACE)
+        if qq is None:
+            continue
         
-        for i, col in enumerate(numeric_cols):
-            row = (i // n_cols) + 1
-            col_num = (i % n_cols) + 1
-            
-            fig.add_trace(
-                go.Histogram(x=df[col], name=col),
-                row=row, 
-                col=col_num
-            )
-        
-        fig.update_layout(
-            title_text="Distribution of Numeric Features",
-            height=300 * n_rows,
-            showlegend=False
+        fig.add_trace(
+            go.Scatter(x=qq['theoretical'], y=qq['sample'], mode='markers', name=col),
+            row=row, 
+            col=col_num
         )
-        plots.append(make_plot('numeric_distributions', fig))
-        
-        # Q-Q plots for normality check
-        if len(numeric_cols) > 0:
-            n_cols = min(2, len(numeric_cols))
-            n_rows = int(np.ceil(len(numeric_cols) / n_cols))
-            
-            fig = make_subplots(
-                rows=n_rows, 
-                cols=n_cols,
-                subplot_titles=[f"Q-Q Plot: {col}" for col in numeric_cols],
-                vertical_spacing=0.1
-            )
-            
-            for i, col in enumerate(numeric_cols):
-                row = (i // n_cols) + 1
-                col_num = (i % n_cols) + 1
-                
-                # Create Q-Q plot
-                qq_data = stats.probplot(df[col].dropna(), dist="norm")
-                x = qq_data[0][0]
-                y = qq_data[0][1]
-                
-                fig.add_trace(
-                    go.Scatter(x=x, y=y, mode='markers', name=col),
-                    row=row, 
-                    col=col_num
-                )
-                
-                # Add theoretical line
-                fig.add_trace(
-                    go.Scatter(x=x, y=qq_data[1][0] * x + qq_data[1][1], 
-                              mode='lines', name='Normal', line=dict(color='red')),
-                    row=row, 
-                    col=col_num
-                )
-            
-            fig.update_layout(
-                title_text="Q-Q Plots for Normality Check",
-                height=400 * n_rows,
-                showlegend=False
-            )
-            plots.append(make_plot('qq_plots', fig))
-    
-    # 4) Box plots for outlier detection
-    if len(numeric_cols) > 0:
-        n_cols = min(3, len(numeric_cols))
-        n_rows = int(np.ceil(len(numeric_cols) / n_cols))
         
-        fig = make_subplots(
-            rows=n_rows, 
-            cols=n_cols,
-            subplot_titles=numeric_cols,
-            vertical_spacing=0.1
+        # Add theoretical line
+        fig.add_trace(
+            go.Scatter(x=qq['line_x'], y=qq['line_y'], 
+                      mode='lines', name='Normal', line=dict(color='red')),
+            row=row, 
+            col=col_num
         )
+    
+    fig.update_layout(
+        title_text="Q-Q Plots for Normality Check",
+        height=400 * n_rows,
+        showlegend=False
+    )
+    return fig
+
+def plot_outlier_detection(df):
+    numeric_cols = _numeric_columns(df)
+    n_cols = min(3, len(numeric_cols))
+    n_rows = int(np.ceil(len(numeric_cols) / n_cols))
+    
+    fig = make_subplots(
+        rows=n_rows, 
+        cols=n_cols,
+        subplot_titles=numeric_cols,
+        vertical_spacing=0.1
+    )
+    
+    for i, col in enumerate(numeric_cols):
+        row = (i // n_cols) + 1
+        col_num = (i % n_cols) + 1
         
-        for i, col in enumerate(numeric_cols):
-            row = (i // n_cols) + 1
-            col_num = (i % n_cols) + 1
-            
+        for trace in _box_traces(df[col], col):
             fig.add_trace(
-                go.Box(y=df[col], name=col),
+                trace,
                 row=row, 
                 col=col_num
             )
-        
-        fig.update_layout(
-            title_text="Box Plots for Outlier Detection",
-            height=300 * n_rows,
-            showlegend=False
-        )
-        plots.append(make_plot('outlier_detection', fig))
+    
+    fig.update_layout(
+        title_text="Box Plots for Outlier Detection",
+        height=300 * n_rows,
+        showlegend=False
+    )
+    return fig
+
+def plot_categorical_bar(df, column):
+    value_counts = df[column].value_counts().nlargest(15)  # Top 15 categories
+    fig = px.bar(
+        x=value_counts.index.astype(str),
+        y=value_counts.values,
+        title=f'Top Categories: {column}',
+        labels={'x': column, 'y': 'Count'}
+    )
+    fig.update_layout(xaxis_tickangle=-45)
+    return fig
+
+def plot_categorical_pie(df, column):
+    value_counts = df[column].value_counts().nlargest(15)
+    return px.pie(
+        values=value_counts.values,
+        names=value_counts.index.astype(str),
+        title=f'Distribution: {column}'
+    )
+
+def plot_box_by_category(df, numeric, category):
+    fig = go.Figure()
+    for value, values in df.groupby(category, sort=False)[numeric]:
+        for trace in _box_traces(values, numeric, x=str(value)):
+            fig.add_trace(trace)
+    fig.update_layout(
+        title=f'{numeric} by {category}', showlegend=False,
+        xaxis_title=category, yaxis_title=numeric
+    )
+    return fig
+
+def plot_pairplot(df, columns, strata, title):
+    # A sample stratified on a low-cardinality categorical (or on the first feature's deciles)
+    # keeps rare groups and the tails in view
+    sample = stratified_sample(df, settings.PLOT_POINTS_PER_TRACE, by=strata or columns[0])
+    return px.scatter_matrix(
+        sample[columns],
+        title=title + _sample_note(sample, df),
+        height=800
+    )
+
+def plot_timeseries(df, time_column, numeric, rolling=False):
+    budget = settings.PLOT_POINTS_PER_TRACE
+    series = df[[time_column, numeric]].dropna().sort_values(time_column)
+    x = series[time_column].to_numpy()
+    y = series[numeric].to_numpy(dtype=np.float64)
+    # LTTB keeps the peaks and troughs a plain stride would drop
+    keep = lttb(x.astype('datetime64[ns]').astype(np.int64), y, budget)
+    fig = go.Figure(go.Scatter(x=x[keep], y=y[keep], mode='lines', name=numeric))
+    fig.update_layout(title=f'{numeric} over Time', xaxis_title=time_column, yaxis_title=numeric)
+    
+    if rolling:
+        # Add rolling average, computed on every row before downsampling
+        rolling_mean = series[numeric].rolling(window=30).mean().to_numpy()
+        present = ~np.isnan(rolling_mean)
+        xr, yr = x[present], rolling_mean[present]
+        keep = lttb(xr.astype('datetime64[ns]').astype(np.int64), yr, budget)
+        fig.add_trace(go.Scatter(
+            x=xr[keep], 
+            y=yr[keep],
+            mode='lines',
+            name='30-day Rolling Avg',
+            line=dict(color='red', dash='dash')
+        ))
+    return fig
+
+PLOT_BUILDERS = {
+    'correlation_matrix': plot_correlation_matrix,
+    'missing_values': plot_missing_values,
+    'numeric_distributions': plot_numeric_distributions,
+    'qq_plots': plot_qq,
+    'outlier_detection': plot_outlier_detection,
+    'categorical_bar': plot_categorical_bar,
+    'categorical_pie': plot_categorical_pie,
+    'box_by_category': plot_box_by_category,
+    'pairplot': plot_pairplot,
+    'timeseries': plot_timeseries,
+}
+
+def plot_manifest(df: pd.DataFrame, max_plots=10):
+    """The default plots for ``df``, as {name, kind, params} entries; nothing is rendered.
+
+    Deciding which plots apply only needs dtypes and a few counts, so the
+    analysis can list its plots up front and render_plot builds each one
+    when (and if) it is requested.
+    """
+    plots = []
+    add = lambda name, kind, **params: plots.append({'name': name, 'kind': kind, 'params': params})
+    
+    # 1) Correlation heatmap for numeric features
+    numeric_cols = _numeric_columns(df)
+    if len(numeric_cols) >= 2:
+        add('correlation_matrix', 'correlation_matrix')
+    
+    # 2) Missing values visualization
+    if df.isnull().values.any():
+        add('missing_values', 'missing_values')
+    
+    # 3) Distribution of numeric features with Q-Q plots, 4) box plots for outlier detection
+    if len(numeric_cols) > 0:
+        add('numeric_distributions', 'numeric_distributions')
+        add('qq_plots', 'qq_plots')
+        add('outlier_detection', 'outlier_detection')
     
     # 5) Categorical features analysis
     categorical_cols = df.select_dtypes(include=['object', 'category']).columns
-    if len(categorical_cols) > 0:
-        for col in categorical_cols[:3]:  # Limit to first 3 categorical features
-            value_counts = df[col].value_counts().nlargest(15)  # Top 15 categories
-            
-            fig = px.bar(
-                x=value_counts.index.astype(str),
-                y=value_counts.values,
-                title=f'Top Categories: {col}',
-                labels={'x': col, 'y': 'Count'}
-            )
-            fig.update_layout(xaxis_tickangle=-45)
-            plots.append(make_plot(f'categorical_{col}', fig))
-            
-            # Pie chart for top categories if not too many
-            if df[col].nunique() <= 10:
-                fig = px.pie(
-                    values=value_counts.values,
-                    names=value_counts.index.astype(str),
-                    title=f'Distribution: {col}'
-                )
-                plots.append(make_plot(f'pie_{col}', fig))
+    nunique = {col: df[col].nunique() for col in categorical_cols[:3]}
+    for col in categorical_cols[:3]:  # Limit to first 3 categorical features
+        add(f'categorical_{col}', 'categorical_bar', column=col)
+        # Pie chart for top categories if not too many
+        if nunique[col] <= 10:
+            add(f'pie_{col}', 'categorical_pie', column=col)
     
     # 6) Relationship between categorical and numeric variables
-    if len(categorical_cols) > 0 and len(numeric_cols) > 0:
-        # For each categorical variable with few categories, show box plots for numeric variables
+    if len(numeric_cols) > 0:
         for cat_col in categorical_cols[:2]:  # Limit to first 2 categorical
-            if df[cat_col].nunique() <= 8:  # Only for categorical with reasonable number of categories
+            if nunique[cat_col] <= 8:  # Only for categorical with reasonable number of categories
                 for num_col in numeric_cols[:2]:  # Limit to first 2 numeric
-                    fig = px.box(
-                        df, 
-                        x=cat_col, 
-                        y=num_col,
-                        title=f'{num_col} by {cat_col}'
-                    )
-                    plots.append(make_plot(f'box_{num_col}_by_{cat_col}', fig))
+                    add(f'box_{num_col}_by_{cat_col}', 'box_by_category', numeric=num_col, category=cat_col)
     
     # 7) Pairplot for top numeric features (if not too many)
-    if len(numeric_cols) >= 2 and len(numeric_cols) <= 5:
-        fig = px.scatter_matrix(
-            df[numeric_cols],
-            title="Pairwise Relationships Between Numeric Features",
-            height=800
-        )
-        plots.append(make_plot('pairplot', fig))
-    elif len(numeric_cols) > 5:
-        # Select top 5 numeric features by variance
-        numeric_variance = df[numeric_cols].var().sort_values(ascending=False)
-        top_numeric = numeric_variance.head(5).index.tolist()
-        
-        fig = px.scatter_matrix(
-            df[top_numeric],
-            title="Pairwise Relationships Between Top 5 Numeric Features (by Variance)",
-            height=800
-        )
-        plots.append(make_plot('pairplot_top5', fig))
+    if len(plots) < max_plots and len(numeric_cols) >= 2:
+        strata = next((c for c in categorical_cols if df[c].nunique() <= 10), None)
+        if len(numeric_cols) <= 5:
+            add('pairplot', 'pairplot', columns=list(numeric_cols), strata=strata,
+                title="Pairwise Relationships Between Numeric Features")
+        else:
+            # Select top 5 numeric features by variance
+            top_numeric = df[numeric_cols].var().sort_values(ascending=False).head(5).index.tolist()
+            add('pairplot_top5', 'pairplot', columns=top_numeric, strata=strata,
+                title="Pairwise Relationships Between Top 5 Numeric Features (by Variance)")
     
     # 8) Time series plots if datetime columns exist
     datetime_cols = df.select_dtypes(include=['datetime64']).columns
-    if len(datetime_cols) > 0:
+    if len(df) > 100:  # Only for larger datasets
         for dt_col in datetime_cols[:1]:  # Only first datetime column
             for num_col in numeric_cols[:2]:  # First two numeric columns
-                if len(df) > 100:  # Only for larger datasets
-                    time_df = df.sort_values(dt_col)
-                    fig = px.line(
-                        time_df, 
-                        x=dt_col, 
-                        y=num_col,
-                        title=f'{num_col} over Time'
-                    )
-                    plots.append(make_plot(f'timeseries_{num_col}', fig))
-                    
-                    # Add rolling average
-                    rolling_df = time_df.set_index(dt_col)[num_col].rolling(window=30).mean().reset_index()
-                    fig.add_trace(go.Scatter(
-                        x=rolling_df[dt_col], 
-                        y=rolling_df[num_col],
-                        mode='lines',
-                        name='30-day Rolling Avg',
-                        line=dict(color='red', dash='dash')
-                    ))
-                    plots.append(make_plot(f'timeseries_rolling_{num_col}', fig))
+                add(f'timeseries_{num_col}', 'timeseries', time_column=dt_col, numeric=num_col)
+                add(f'timeseries_rolling_{num_col}', 'timeseries', time_column=dt_col, numeric=num_col, rolling=True)
     
-    return plots[:max_plots]
\ No newline at end of file
+    return plots[:max_plots]
+
+def render_plot(df: pd.DataFrame, entry):
+    """Build one plot_manifest entry into a plot spec."""
+    fig = PLOT_BUILDERS[entry['kind']](df, **entry['params'])
+    return make_plot(entry['name'], fig)
+
+def generate_default_plots(df: pd.DataFrame, max_plots=10):
+    """Generate comprehensive visualizations for EDA
+
+    Every trace is built from aggregates (see app.plotdata), so no figure
+    embeds more than PLOT_POINTS_PER_TRACE points per trace, however many
+    rows ``df`` has.
+    """
+    return [render_plot(df, entry) for entry in plot_manifest(df, max_plots)]
\ No newline at end of file
@@ -0,0 +1,160 @@
+"""Online inference: single-record predictions served from models kept in memory.
+
+Each worker keeps recently used scoring pipelines in an LRU (bounded in bytes,
+entries expire after PREDICT_MODEL_TTL). Requests for the same model that
+arrive within PREDICT_BATCH_WINDOW_MS are coalesced into one vectorized
+``predict`` call.
+"""
+import asyncio
+import logging
+import pickle
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.database import async_session
+from app.ml import ScoringPipeline
+from app.scoring import load_pipeline
+
+logger = logging.getLogger("analytiq")
+
+
+def _pipeline_size(pipeline: ScoringPipeline) -> int:
+    # The pickled size tracks the in-memory size of fitted sklearn models (mostly numpy arrays) closely
+    return len(pickle.dumps(pipeline, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+class _PendingBatch:
+    def __init__(self, pipeline: ScoringPipeline):
+        self.pipeline = pipeline
+        self.frames: List[pd.DataFrame] = []
+        self.futures: List[asyncio.Future] = []
+        self.rows = 0
+        self.flushed = False
+
+
+class InferenceServer:
+    def __init__(self, cache: LRUCache, window: float, max_batch_rows: int, latency_window: int = 10_000):
+        self.cache = cache
+        self.window = window
+        self.max_batch_rows = max_batch_rows
+        self._loading: Dict[str, asyncio.Future] = {}
+        self._batches: Dict[str, _PendingBatch] = {}
+        self._latencies = deque(maxlen=latency_window)  # seconds, most recent requests
+        self.stats = {"requests": 0, "rows": 0, "batches": 0, "failed": 0}
+
+    async def get_pipeline(self, prediction_id) -> Optional[ScoringPipeline]:
+        """The prediction's pipeline from the cache, loading it once however many requests miss at the same time."""
+        key = str(prediction_id)
+        pipeline = self.cache.get(key)
+        if pipeline is not None:
+            return pipeline
+        loading = self._loading.get(key)
+        if loading is None:
+            loading = asyncio.ensure_future(self._load(prediction_id))
+            self._loading[key] = loading
+            loading.add_done_callback(lambda _: self._loading.pop(key, None))
+        return await asyncio.shield(loading)
+
+    async def _load(self, prediction_id) -> Optional[ScoringPipeline]:
+        async with async_session() as db:
+            pipeline = await load_pipeline(db, prediction_id)
+        if pipeline is None:
+            return None
+        # Spreading one small predict over a thread pool costs more than it saves
+        if "n_jobs" in pipeline.model.get_params():
+            pipeline.model.set_params(n_jobs=1)
+        # Measuring means pickling the model, so do it (inside put) off the event loop
+        await asyncio.to_thread(self.cache.put, str(prediction_id), pipeline)
+        logger.info(f"Loaded model of prediction {prediction_id}")
+        return pipeline
+
+    async def predict(self, prediction_id, pipeline: ScoringPipeline, frame: pd.DataFrame) -> pd.DataFrame:
+        """Score ``frame`` as part of the next batch for this model."""
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        key = str(prediction_id)
+        batch = self._batches.get(key)
+        if batch is not None and batch.rows + len(frame) > self.max_batch_rows:
+            self._flush(key, batch)
+            batch = None
+        if batch is None:
+            batch = self._batches[key] = _PendingBatch(pipeline)
+            loop.call_later(self.window, self._flush, key, batch)
+        future = loop.create_future()
+        batch.frames.append(frame.reset_index(drop=True))
+        batch.futures.append(future)
+        batch.rows += len(frame)
+        if batch.rows >= self.max_batch_rows:
+            self._flush(key, batch)
+        try:
+            return await future
+        finally:
+            self.stats["requests"] += 1
+            self.stats["rows"] += len(frame)
+            self._latencies.append(time.perf_counter() - start)
+
+    def _flush(self, key: str, batch: _PendingBatch):
+        if self._batches.get(key) is batch:
+            del self._batches[key]
+        if not batch.flushed:
+            batch.flushed = True
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: _PendingBatch):
+        # A request whose client went away is cancelled while it waits; its future is then already done
+        self.stats["batches"] += 1
+        try:
+            frame = batch.frames[0] if len(batch.frames) == 1 else pd.concat(batch.frames, ignore_index=True)
+            scored = await asyncio.to_thread(batch.pipeline.predict, frame)
+        except Exception as e:
+            if len(batch.frames) == 1:
+                self.stats["failed"] += 1
+                if not batch.futures[0].done():
+                    batch.futures[0].set_exception(e)
+                return
+            # One request's bad rows must not fail the others: score them one by one
+            for frame, future in zip(batch.frames, batch.futures):
+                if future.done():
+                    continue
+                try:
+                    result = await asyncio.to_thread(batch.pipeline.predict, frame)
+                except Exception as e:
+                    self.stats["failed"] += 1
+                    if not future.done():
+                        future.set_exception(e)
+                    continue
+                if not future.done():
+                    future.set_result(result)
+            return
+        offset = 0
+        for frame, future in zip(batch.frames, batch.futures):
+            if not future.done():
+                future.set_result(scored.iloc[offset:offset + len(frame)].reset_index(drop=True))
+            offset += len(frame)
+
+    def snapshot(self) -> dict:
+        latencies = np.fromiter(self._latencies, dtype=np.float64)
+        batches = self.stats["batches"]
+        return {
+            **self.stats,
+            "requests_per_batch": round(self.stats["requests"] / batches, 2) if batches else None,
+            "latency_ms": {
+                "p50": round(float(np.percentile(latencies, 50)) * 1000, 3) if len(latencies) else None,
+                "p99": round(float(np.percentile(latencies, 99)) * 1000, 3) if len(latencies) else None,
+                "samples": len(latencies),
+            },
+            "models": self.cache.snapshot(),
+        }
+
+
+inference = InferenceServer(
+    cache=LRUCache(max_bytes=settings.PREDICT_MODEL_CACHE_MAX_BYTES, sizeof=_pipeline_size, ttl=settings.PREDICT_MODEL_TTL),
+    window=settings.PREDICT_BATCH_WINDOW_MS / 1000,
+    max_batch_rows=settings.PREDICT_BATCH_MAX_ROWS,
+)
@@ -0,0 +1,335 @@
+"""Background jobs: analyses and predictions run here, not inside the HTTP request.
+
+Jobs are rows in the jobs table, so any process with database access can run
+them and no broker is needed. Each process runs a JobRunner that claims queued
+jobs (SELECT ... FOR UPDATE SKIP LOCKED on Postgres, then a conditional UPDATE,
+which is what makes the claim atomic on SQLite), heartbeats while they run and
+requeues jobs whose runner stopped heartbeating.
+"""
+import asyncio
+import logging
+import os
+import socket
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Optional
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import async_session
+from app.core.executor import ComputeBusyError, ComputeTimeoutError
+from app.models.job import Job
+from app.schemas import JobResponse
+
+logger = logging.getLogger("analytiq")
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+# Seconds a job waits when the compute pool is full; does not use up an attempt
+BUSY_RETRY_DELAY = 10.0
+
+
+class JobError(Exception):
+    """A job failure retrying cannot fix (missing dataset, bad target column). The message is shown to the user."""
+
+
+Progress = Callable[[float, str], Awaitable[None]]
+Handler = Callable[[AsyncSession, Job, Progress], Awaitable[object]]
+
+HANDLERS: Dict[str, Handler] = {}
+RESULT_PATHS: Dict[str, str] = {}
+
+
+def job_handler(kind: str, result_path: str):
+    """Register ``fn(db, job, progress) -> result id`` as the handler for jobs of ``kind``.
+
+    ``result_path`` is the API path of the created object, with ``{id}`` for its id.
+    """
+    def register(fn: Handler) -> Handler:
+        HANDLERS[kind] = fn
+        RESULT_PATHS[kind] = result_path
+        return fn
+    return register
+
+
+def result_url(job: Job) -> Optional[str]:
+    if job.result_id is None or job.kind not in RESULT_PATHS:
+        return None
+    return "/api/v1" + RESULT_PATHS[job.kind].format(id=job.result_id)
+
+
+def job_response(job: Job) -> JobResponse:
+    return JobResponse(
+        id=str(job.id), kind=job.kind, status=job.status, progress=job.progress or 0.0, stage=job.stage or "",
+        attempts=job.attempts or 0, max_attempts=job.max_attempts or 0, error=job.error,
+        dataset_id=str(job.dataset_id) if job.dataset_id else None,
+        result_id=str(job.result_id) if job.result_id else None, result_url=result_url(job),
+        created_at=job.created_at, started_at=job.started_at, finished_at=job.finished_at,
+    )
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+async def enqueue(db: AsyncSession, owner_id, kind: str, params: dict, dataset_id=None) -> Job:
+    """Queue a job and commit, so runners can see it as soon as this returns."""
+    job = Job(
+        owner_id=owner_id, dataset_id=dataset_id, kind=kind, params=params, status=QUEUED,
+        max_attempts=settings.JOB_MAX_ATTEMPTS, run_after=_now(),
+    )
+    db.add(job)
+    await db.commit()
+    runner.wake()
+    return job
+
+
+async def cancel_job(db: AsyncSession, job: Job) -> bool:
+    """Cancel a queued job now, or ask the runner of a running one to stop it. False if it already finished."""
+    result = await db.execute(
+        update(Job).where(Job.id == job.id, Job.status == QUEUED)
+        .values(status=CANCELLED, finished_at=_now(), stage="Cancelled")
+    )
+    if result.rowcount == 0:
+        result = await db.execute(update(Job).where(Job.id == job.id, Job.status == RUNNING).values(cancel_requested=True))
+    await db.commit()
+    await db.refresh(job)
+    return result.rowcount == 1
+
+
+async def retry_job(db: AsyncSession, job: Job) -> bool:
+    """Queue a failed or cancelled job again, with a fresh set of attempts."""
+    result = await db.execute(
+        update(Job).where(Job.id == job.id, Job.status.in_((FAILED, CANCELLED)))
+        .values(status=QUEUED, attempts=0, error=None, cancel_requested=False, progress=0.0, stage="",
+                run_after=_now(), started_at=None, finished_at=None, locked_by=None)
+    )
+    await db.commit()
+    await db.refresh(job)
+    if result.rowcount == 1:
+        runner.wake()
+    return result.rowcount == 1
+
+
+def _progress_reporter(job_id) -> Progress:
+    async def report(fraction: float, stage: str) -> None:
+        async with async_session() as db:
+            await db.execute(
+                update(Job).where(Job.id == job_id, Job.status == RUNNING)
+                .values(progress=round(min(max(fraction, 0.0), 1.0), 3), stage=stage, heartbeat_at=_now())
+            )
+            await db.commit()
+    return report
+
+
+class JobRunner:
+    """Claims jobs from the jobs table and runs up to ``concurrency`` of them at once."""
+
+    def __init__(self, concurrency: int, poll_interval: float):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._loops = []
+        self._running: Dict[object, asyncio.Task] = {}
+        self._cancelling = set()
+        self._wake: Optional[asyncio.Event] = None
+        self._stopping = False
+        self.stats = {"claimed": 0, "succeeded": 0, "failed": 0, "retried": 0, "cancelled": 0, "stale_requeued": 0}
+
+    async def start(self):
+        if self.concurrency <= 0:
+            return
+        self._stopping = False
+        self._wake = asyncio.Event()
+        self._loops = [asyncio.create_task(self._loop()) for _ in range(self.concurrency)]
+        logger.info(f"Job runner {self.worker_id} started with {self.concurrency} slots")
+
+    async def shutdown(self):
+        """Stop claiming; jobs still running are interrupted and put back in the queue."""
+        self._stopping = True
+        if self._wake:
+            self._wake.set()
+        for task in self._running.values():
+            task.cancel()
+        await asyncio.gather(*self._loops, return_exceptions=True)
+        self._loops = []
+
+    def wake(self):
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _loop(self):
+        while not self._stopping:
+            try:
+                job = await self._claim()
+            except Exception as e:
+                logger.warning(f"Claiming a job failed: {e}")
+                job = None
+            if job is not None:
+                await self._execute(job)
+                continue
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _claim(self) -> Optional[Job]:
+        now = _now()
+        claimable = or_(
+            and_(Job.status == QUEUED, Job.run_after <= now),
+            and_(Job.status == RUNNING, Job.heartbeat_at < now - timedelta(seconds=settings.JOB_STALE_AFTER)),
+        )
+        async with async_session() as db:
+            candidate = await db.execute(
+                select(Job.id, Job.status).where(claimable).order_by(Job.run_after).limit(1).with_for_update(skip_locked=True)
+            )
+            row = candidate.first()
+            if row is None:
+                return None
+            claimed = await db.execute(
+                update(Job).where(Job.id == row.id, claimable).values(
+                    status=RUNNING, attempts=Job.attempts + 1, locked_by=self.worker_id,
+                    started_at=now, heartbeat_at=now, progress=0.0, stage="Starting",
+                )
+            )
+            await db.commit()
+            if claimed.rowcount != 1:
+                return None  # another runner got there first
+            if row.status == RUNNING:
+                self.stats["stale_requeued"] += 1
+                logger.warning(f"Job {row.id} stopped heartbeating; running it again")
+            self.stats["claimed"] += 1
+            return await db.get(Job, row.id)
+
+    async def _finish(self, job_id, **values) -> bool:
+        """Update a job this runner holds; False if it lost the job (requeued as stale, deleted)."""
+        async with async_session() as db:
+            result = await db.execute(
+                update(Job).where(Job.id == job_id, Job.status == RUNNING, Job.locked_by == self.worker_id).values(**values)
+            )
+            await db.commit()
+            return result.rowcount == 1
+
+    async def _requeue(self, job: Job, delay: float, refund: bool, error: Optional[str] = None):
+        await self._finish(
+            job.id, status=QUEUED, run_after=_now() + timedelta(seconds=delay), locked_by=None, error=error,
+            stage="Waiting to retry" if error else "Queued", **({"attempts": Job.attempts - 1} if refund else {}),
+        )
+
+    async def _execute(self, job: Job):
+        handler = HANDLERS.get(job.kind)
+        if handler is None:
+            await self._finish(job.id, status=FAILED, error=f"Unknown job kind: {job.kind}", finished_at=_now())
+            self.stats["failed"] += 1
+            return
+        if job.attempts > job.max_attempts:
+            await self._finish(job.id, status=FAILED, error="The job was interrupted too many times.", finished_at=_now())
+            self.stats["failed"] += 1
+            return
+
+        work = asyncio.create_task(self._run_handler(job, handler))
+        self._running[job.id] = work
+        heartbeat = asyncio.create_task(self._heartbeat(job.id, work))
+        try:
+            await work
+            self.stats["succeeded"] += 1
+            logger.info(f"Job {job.id} ({job.kind}) succeeded")
+        except asyncio.CancelledError:
+            if job.id in self._cancelling:
+                await self._finish(job.id, status=CANCELLED, stage="Cancelled", finished_at=_now())
+                self.stats["cancelled"] += 1
+                logger.info(f"Job {job.id} cancelled")
+            else:
+                # Runner shutting down: hand the job straight back to the queue
+                await self._requeue(job, 0, refund=True)
+        except JobError as e:
+            await self._finish(job.id, status=FAILED, error=str(e), stage="Failed", finished_at=_now())
+            self.stats["failed"] += 1
+        except ComputeBusyError:
+            await self._requeue(job, BUSY_RETRY_DELAY, refund=True)
+        except ComputeTimeoutError as e:
+            logger.warning(f"Job {job.id} timed out: {e}")
+            await self._finish(job.id, status=FAILED, error="The job took too long and was stopped. Try a smaller dataset.",
+                               stage="Failed", finished_at=_now())
+            self.stats["failed"] += 1
+        except Exception:
+            logger.exception(f"Job {job.id} ({job.kind}) failed on attempt {job.attempts}")
+            if job.attempts < job.max_attempts:
+                await self._requeue(job, settings.JOB_RETRY_BACKOFF * 2 ** (job.attempts - 1), refund=False,
+                                    error="An unexpected error occurred; retrying.")
+                self.stats["retried"] += 1
+            else:
+                await self._finish(job.id, status=FAILED, error="An unexpected error occurred.", stage="Failed", finished_at=_now())
+                self.stats["failed"] += 1
+        finally:
+            heartbeat.cancel()
+            self._running.pop(job.id, None)
+            self._cancelling.discard(job.id)
+
+    async def _run_handler(self, job: Job, handler: Handler):
+        async with async_session() as db:
+            result_id = await handler(db, job, _progress_reporter(job.id))
+            # The job completes in the same transaction that stores its result
+            finished = await db.execute(
+                update(Job).where(Job.id == job.id, Job.status == RUNNING, Job.locked_by == self.worker_id).values(
+                    status=SUCCEEDED, result_id=result_id, progress=1.0, stage="Done", error=None, finished_at=_now(),
+                )
+            )
+            if finished.rowcount != 1:
+                await db.rollback()
+                logger.warning(f"Job {job.id} was taken over by another runner; discarding this result")
+                return
+            await db.commit()
+
+    async def _heartbeat(self, job_id, work: asyncio.Task):
+        """Keep the job's claim fresh and stop the work when a cancel is requested."""
+        while not work.done():
+            await asyncio.sleep(settings.JOB_HEARTBEAT_INTERVAL)
+            try:
+                async with async_session() as db:
+                    await db.execute(update(Job).where(Job.id == job_id, Job.status == RUNNING).values(heartbeat_at=_now()))
+                    cancel = await db.scalar(select(Job.cancel_requested).where(Job.id == job_id))
+                    await db.commit()
+            except Exception as e:
+                logger.warning(f"Heartbeat for job {job_id} failed: {e}")
+                continue
+            if cancel:
+                self._cancelling.add(job_id)
+                work.cancel()
+
+    def snapshot(self) -> dict:
+        return {"worker": self.worker_id, "slots": self.concurrency, "running": len(self._running), **self.stats}
+
+
+runner = JobRunner(concurrency=settings.JOB_CONCURRENCY, poll_interval=settings.JOB_POLL_INTERVAL)
+
+
+async def _run_forever():
+    from app.core.executor import compute
+    from app.core.database import init_db, dispose_db
+    import app.api.analyses  # noqa: F401  (registers the job handlers)
+    import app.api.predictions  # noqa: F401
+
+    await init_db()
+    await compute.start()
+    await runner.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.shutdown()
+        await compute.shutdown()
+        await dispose_db()
+
+
+if __name__ == "__main__":
+    # python -m app.jobs: a dedicated job worker (JOB_CONCURRENCY slots, COMPUTE_WORKERS processes)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if runner.concurrency <= 0:
+        runner.concurrency = 1
+    try:
+        asyncio.run(_run_forever())
+    except KeyboardInterrupt:
+        pass
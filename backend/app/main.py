@@ -10,12 +10,21 @@ from slowapi.errors import RateLimitExceeded
 from datetime import datetime, timezone
 
 from app.core.config import settings
-from app.core.database import init_db, dispose_db
+from app.core.database import init_db, dispose_db, pool_snapshot
+from app.core.auth import user_listener
+from app.core.executor import compute, ComputeBusyError, ComputeTimeoutError
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.storage import frame_cache
+from app.analysis_plots import plot_cache
+from app.analysis_results import results_snapshot
+from app.jobs import runner
+from app.inference import inference
 from app.core.middleware import SecurityHeadersMiddleware, RequestTrackingMiddleware
 from app.api.auth import router as auth_router
 from app.api.datasets import router as datasets_router
 from app.api.analyses import router as analyses_router
 from app.api.predictions import router as predictions_router
+from app.api.jobs import router as jobs_router
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 logger = logging.getLogger("analytiq")
@@ -30,7 +39,13 @@ async def lifespan(app: FastAPI):
         logger.info("Database initialized")
     except Exception as e:
         logger.error(f"Database init failed: {e}")
+    await compute.start()
+    await runner.start()
+    await user_listener.start()
     yield
+    await user_listener.shutdown()
+    await runner.shutdown()
+    await compute.shutdown()
     await dispose_db()
     logger.info("Database connections closed")
 
@@ -55,6 +70,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PATCH", "DELETE", "OPTIONS"],
     allow_headers=["Authorization", "Content-Type"],
+    expose_headers=["Location", NEXT_CURSOR_HEADER],
     max_age=600,
 )
 
@@ -64,6 +80,17 @@ async def rate_limit_handler(request: Request, exc: RateLimitExceeded):
     return JSONResponse(status_code=429, content={"detail": "Too many requests. Please try again later."})
 
 
+@app.exception_handler(ComputeBusyError)
+async def compute_busy_handler(request: Request, exc: ComputeBusyError):
+    return JSONResponse(status_code=503, content={"detail": "Server is busy with other analyses. Please try again shortly."}, headers={"Retry-After": "10"})
+
+
+@app.exception_handler(ComputeTimeoutError)
+async def compute_timeout_handler(request: Request, exc: ComputeTimeoutError):
+    logger.warning(f"Compute timeout on {request.method} {request.url.path}: {exc}")
+    return JSONResponse(status_code=504, content={"detail": "The analysis took too long and was stopped. Try a smaller dataset."})
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     logger.exception(f"Unhandled error on {request.method} {request.url.path}")
@@ -74,6 +101,7 @@ app.include_router(auth_router, prefix="/api/v1")
 app.include_router(datasets_router, prefix="/api/v1")
 app.include_router(analyses_router, prefix="/api/v1")
 app.include_router(predictions_router, prefix="/api/v1")
+app.include_router(jobs_router, prefix="/api/v1")
 
 
 @app.get("/")
@@ -90,4 +118,18 @@ async def health_check():
     }
 
 
+@app.get("/api/v1/metrics")
+async def metrics():
+    return {
+        "compute": compute.snapshot(),
+        "frame_cache": frame_cache.snapshot(),
+        "plot_cache": plot_cache.snapshot(),
+        "analysis_results": results_snapshot(),
+        "jobs": runner.snapshot(),
+        "inference": inference.snapshot(),
+        "user_cache": user_listener.snapshot(),
+        "db_pool": pool_snapshot(),
+    }
+
+
 handler = app
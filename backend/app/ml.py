@@ -1,23 +1,51 @@
+import hashlib
+import io
+import json
 import logging
+import math
+import os
+import stat
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+import joblib
 import numpy as np
 import pandas as pd
+import sklearn
 from typing import Dict, Any, Optional
+from sklearn.inspection import permutation_importance
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder, StandardScaler
 from sklearn.linear_model import LinearRegression, LogisticRegression, Ridge, Lasso
-from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor, GradientBoostingClassifier, GradientBoostingRegressor
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor, HistGradientBoostingClassifier, HistGradientBoostingRegressor
 from sklearn.tree import DecisionTreeClassifier, DecisionTreeRegressor
 from sklearn.metrics import (
     r2_score, mean_absolute_error, mean_squared_error,
     accuracy_score, precision_score, recall_score, f1_score, classification_report
 )
 import warnings
+from app.core.config import settings
 warnings.filterwarnings('ignore')
 
 logger = logging.getLogger("analytiq")
 
-MAX_ROWS = 50_000
 MAX_CATEGORIES = 20
+SCALED_MODELS = ("Linear Regression", "Ridge Regression", "Lasso Regression", "Logistic Regression")
+SLOW_MODELS = ("Random Forest", "Gradient Boosting")
+HALVING_VALIDATION_ROWS = 20_000  # cap on the held-out rows candidates are screened on
+PERMUTATION_ROWS = 2_000
+FEATURES_VERSION = 2  # bump when _encode_features changes, so cached feature matrices are rebuilt
+# Pickled pipelines only load reliably under the versions that wrote them
+LIBRARY_VERSIONS = {"sklearn": sklearn.__version__, "numpy": np.__version__, "pandas": pd.__version__}
+
+# Ensembles grown in chunks, so training can stop between them: {type: (size parameter, chunk)}
+_GROWABLE = {
+    RandomForestClassifier: ("n_estimators", 10),
+    RandomForestRegressor: ("n_estimators", 10),
+    HistGradientBoostingClassifier: ("max_iter", 20),
+    HistGradientBoostingRegressor: ("max_iter", 20),
+}
 
 
 def _detect_target(df: pd.DataFrame, target: Optional[str] = None) -> tuple:
@@ -40,29 +68,137 @@ def _detect_target(df: pd.DataFrame, target: Optional[str] = None) -> tuple:
     return target, task
 
 
-def _prepare_data(df: pd.DataFrame, target: str):
-    df = df.dropna(subset=[target]).copy()
-    if len(df) > MAX_ROWS:
-        df = df.sample(n=MAX_ROWS, random_state=42)
+def _encode_features(df: pd.DataFrame) -> tuple:
+    """Every usable column of ``df`` as one column-major float32 matrix (NaN kept), with the column names and label encoders.
 
-    y = df[target]
-    X = df.drop(columns=[target])
+    The matrix does not depend on the target, so one serves predictions of any column.
+    """
+    categorical = set(df.select_dtypes(include=['object', 'category']).columns)
+    numeric = set(df.select_dtypes(include=['number']).columns)
+    encoded, label_encoders = {}, {}
+    for col in df.columns:
+        if col in categorical and df[col].nunique() <= MAX_CATEGORIES:
+            le = LabelEncoder()
+            encoded[col] = le.fit_transform(df[col].astype(str))
+            label_encoders[col] = le
+        elif col in numeric:
+            encoded[col] = df[col].to_numpy(dtype=np.float32, na_value=np.nan)
+    matrix = np.empty((len(df), len(encoded)), dtype=np.float32, order="F")
+    for i, values in enumerate(encoded.values()):
+        matrix[:, i] = values
+    return matrix, list(encoded), label_encoders
 
-    # Encode categorical features
-    label_encoders = {}
-    for col in X.select_dtypes(include=['object', 'category']).columns:
-        if X[col].nunique() > MAX_CATEGORIES:
-            X = X.drop(columns=[col])
-            continue
+
+def _label_encoders(classes: Dict[str, list]) -> Dict[str, LabelEncoder]:
+    """Fitted LabelEncoders rebuilt from their ``classes_``."""
+    encoders = {}
+    for col, labels in classes.items():
         le = LabelEncoder()
-        X[col] = le.fit_transform(X[col].astype(str))
-        label_encoders[col] = le
+        le.classes_ = np.array(labels, dtype=object)
+        encoders[col] = le
+    return encoders
+
+
+def _feature_cache_dir() -> Optional[str]:
+    """FEATURE_CACHE_DIR, created private to this user; None (no caching) if it is not.
+
+    Cached matrices feed training, so a directory another user owns or can
+    write to is never read from.
+    """
+    path = settings.FEATURE_CACHE_DIR
+    if not path:
+        return None
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        st = os.lstat(path)
+    except OSError as e:
+        logger.warning(f"Feature cache disabled: {e}")
+        return None
+    foreign = hasattr(os, "getuid") and st.st_uid != os.getuid()
+    if not stat.S_ISDIR(st.st_mode) or foreign or st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        logger.warning(f"Feature cache disabled: {path} is not a directory private to this user")
+        return None
+    return path
+
+
+def _prune_feature_cache(cache_dir: str, keep: str):
+    entries, total = [], 0
+    for name in os.listdir(cache_dir):
+        if name.endswith(".npy"):
+            path = os.path.join(cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            total += st.st_size
+            if not name.startswith(keep):
+                entries.append((st.st_mtime, st.st_size, path))
+    for _, size, path in sorted(entries):
+        if total <= settings.FEATURE_CACHE_MAX_BYTES:
+            break
+        for victim in (path, path[:-len(".npy")] + ".json"):
+            try:
+                os.remove(victim)
+            except OSError:
+                pass
+        total -= size
+
+
+def _feature_matrix(df: pd.DataFrame, digest: Optional[str]) -> tuple:
+    """``_encode_features(df)``, memory-mapped from FEATURE_CACHE_DIR when a dataset with this content ``digest`` was encoded before.
+
+    Returns (matrix, columns, label_encoders, cache status). Mapped matrices are
+    read-only and shared through the page cache by every process on the host.
+    """
+    cache_dir = _feature_cache_dir() if digest else None
+    if cache_dir is None:
+        return (*_encode_features(df), None)
+    key = hashlib.blake2b(f"{digest}:{FEATURES_VERSION}:{MAX_CATEGORIES}".encode(), digest_size=16).hexdigest()
+    base = os.path.join(cache_dir, key)
+    try:
+        # Plain JSON and a pickle-free .npy: nothing read back from disk can run code
+        with open(base + ".json", encoding="utf-8") as f:
+            meta = json.load(f)
+        matrix = np.load(base + ".npy", mmap_mode="r", allow_pickle=False)
+        if matrix.shape == (len(df), len(meta["columns"])):
+            os.utime(base + ".npy")  # recency for pruning
+            return matrix, meta["columns"], _label_encoders(meta["classes"]), "hit"
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    matrix, columns, label_encoders = _encode_features(df)
+    try:
+        # Written under temporary names and renamed, so readers never see a partial file; .json goes first
+        tmp = f"{base}.{os.getpid()}.{threading.get_ident()}.tmp"
+        classes = {col: le.classes_.tolist() for col, le in label_encoders.items()}
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"columns": columns, "classes": classes}, f)
+        os.replace(tmp, base + ".json")
+        with open(tmp, "wb") as f:
+            np.save(f, matrix, allow_pickle=False)
+        os.replace(tmp, base + ".npy")
+        _prune_feature_cache(cache_dir, key)
+    except OSError as e:
+        logger.warning(f"Could not cache feature matrix: {e}")
+    return matrix, columns, label_encoders, "miss"
+
+
+def _prepare_data(df: pd.DataFrame, target: str, digest: Optional[str] = None):
+    matrix, columns, label_encoders, cache_status = _feature_matrix(df, digest)
 
-    # Drop remaining non-numeric
-    X = X.select_dtypes(include=['number'])
+    rows = np.flatnonzero(df[target].notna().to_numpy())
+    if len(rows) > settings.ML_MAX_ROWS:
+        # The same rows DataFrame.sample(n=ML_MAX_ROWS, random_state=42) picks
+        rows = rows[np.random.RandomState(42).choice(len(rows), size=settings.ML_MAX_ROWS, replace=False)]
+
+    y = df[target].iloc[rows]
+    keep = [i for i, col in enumerate(columns) if col != target]
+    values = matrix[:, keep] if len(rows) == len(df) else matrix[np.ix_(rows, keep)]
+    X = pd.DataFrame(values, columns=[columns[i] for i in keep], index=y.index)
+    label_encoders = {col: le for col, le in label_encoders.items() if col != target}
 
     # Fill NaN with median
-    X = X.fillna(X.median())
+    medians = X.median()
+    X = X.fillna(medians)
 
     # Encode target if classification
     target_encoder = None
@@ -70,14 +206,217 @@ def _prepare_data(df: pd.DataFrame, target: str):
         target_encoder = LabelEncoder()
         y = pd.Series(target_encoder.fit_transform(y.astype(str)), index=y.index)
 
-    return X, y, label_encoders, target_encoder
+    return X, y, label_encoders, target_encoder, medians, cache_status
+
+
+class ScoringPipeline:
+    """The fitted best model plus the preprocessing its training rows went through, for scoring new rows."""
+
+    def __init__(self, target, task, features, label_encoders, medians, scaler, model, target_encoder):
+        self.target = target
+        self.task = task
+        self.features = list(features)
+        # {column: {label: code}}; labels unseen in training score as -1
+        self.categories = {col: {label: code for code, label in enumerate(le.classes_)} for col, le in label_encoders.items()}
+        self.medians = {col: float(v) for col, v in medians.items() if pd.notna(v)}
+        self.scaler = scaler
+        self.model = model
+        self.classes = target_encoder.classes_.tolist() if target_encoder is not None else None
+        self.library_versions = LIBRARY_VERSIONS
+
+    def missing_columns(self, columns) -> list:
+        return [c for c in self.features if c not in set(columns)]
+
+    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        X = pd.DataFrame(index=df.index)
+        for col in self.features:
+            if col in self.categories:
+                X[col] = df[col].astype(str).map(self.categories[col]).fillna(-1).astype(np.int64)
+            else:
+                X[col] = pd.to_numeric(df[col], errors='coerce')
+        X = X.fillna(self.medians)
+        return self.scaler.transform(X) if self.scaler is not None else X
+
+    def predict(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Score ``df`` (it must have every feature column): prediction, plus probability for classifiers."""
+        X = self.transform(df)
+        preds = self.model.predict(X)
+        out = pd.DataFrame(index=df.index)
+        if self.classes is not None:
+            out["prediction"] = np.asarray(self.classes, dtype=object)[preds.astype(int)]
+        else:
+            out["prediction"] = preds
+        if self.task == "classification" and hasattr(self.model, "predict_proba"):
+            out["probability"] = self.model.predict_proba(X).max(axis=1).round(4)
+        return out
+
+    def dumps(self) -> bytes:
+        buf = io.BytesIO()
+        joblib.dump(self, buf, compress=3)
+        return buf.getvalue()
+
+    @staticmethod
+    def loads(payload: bytes) -> "ScoringPipeline":
+        return joblib.load(io.BytesIO(payload))
+
+
+def _fit(model, X, y, stop: threading.Event):
+    """Fit ``model``, giving up early once ``stop`` is set (the result is then discarded)."""
+    grow = _GROWABLE.get(type(model))
+    if grow is None:
+        model.fit(X, y)
+        return
+    # Grow the ensemble a chunk at a time; warm_start keeps the trees (and seeds) of earlier chunks
+    param, chunk = grow
+    total = model.get_params()[param]
+    model.set_params(warm_start=True)
+    for n in range(min(chunk, total), total + chunk, chunk):
+        if stop.is_set():
+            break
+        model.set_params(**{param: min(n, total)})
+        model.fit(X, y)
+        if getattr(model, "n_iter_", n) < min(n, total):
+            break  # boosting stopped early on its own validation split
+
 
+def _fit_and_predict(model, X_train, X_test, y_train, stop: threading.Event):
+    start = time.perf_counter()
+    _fit(model, X_train, y_train, stop)
+    if stop.is_set():
+        return None  # past the deadline: the (possibly partial) model is discarded, so don't score it
+    fitted = time.perf_counter()
+    preds = model.predict(X_test)
+    timings = {"fit_seconds": round(fitted - start, 4), "predict_seconds": round(time.perf_counter() - fitted, 4)}
+    return preds, timings
 
-def run_prediction(df: pd.DataFrame, target_col: Optional[str] = None) -> Dict[str, Any]:
+
+def _train_models(models: Dict[str, Any], data: Dict[bool, tuple], y_train, budget: float, threads: int) -> Dict[str, tuple]:
+    """Fit all models concurrently within ``budget`` seconds of wall-clock time.
+
+    Returns {name: (status, detail)}, in ``models`` order: ("ok", (preds, timings)),
+    ("error", exception) or ("skipped", None) for models still training at the
+    deadline. Training runs in threads (compute workers are daemon processes
+    and cannot start their own); scikit-learn's tree and linear solvers release
+    the GIL, so the fits do use separate cores. ``threads`` (0 = one per core)
+    bounds the cores used in all, including models' own ``n_jobs``.
+
+    Nothing outlives the call: at the deadline, ensembles stop after their
+    current chunk, and fits that cannot be interrupted are waited for.
+    """
+    cores = threads or os.cpu_count() or 1
+    workers = max(1, min(len(models), cores))
+    for model in models.values():
+        if "n_jobs" in model.get_params():
+            # Share the cores with the other fits instead of each taking all of them
+            model.set_params(n_jobs=max(1, cores // workers))
+    stop = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ml-train")
+    futures = {}
+    # Fast models first: with fewer threads than models they still finish, whatever the ensembles do
+    for name in sorted(models, key=lambda n: n in SLOW_MODELS):
+        X_train, X_test = data[name in SCALED_MODELS]
+        futures[name] = pool.submit(_fit_and_predict, models[name], X_train, X_test, y_train, stop)
+    done, _ = wait(futures.values(), timeout=budget)
+    stop.set()
+    pool.shutdown(wait=True, cancel_futures=True)
+
+    trained = {}
+    for name in models:
+        future = futures[name]
+        # Only fits that finished before the deadline count; later ones may have stopped part-grown
+        if future not in done:
+            trained[name] = ("skipped", None)
+        elif future.exception() is not None:
+            trained[name] = ("error", future.exception())
+        else:
+            trained[name] = ("ok", future.result())
+    skipped = [n for n, (status, _) in trained.items() if status == "skipped"]
+    if skipped:
+        logger.warning(f"ML: {', '.join(skipped)} skipped after the {budget:g}s training budget")
+    return trained
+
+
+def _evaluate(task: str, y_true, preds, n_classes: Optional[int]) -> tuple:
+    """(score used to rank models, rounded metrics): R² for regression, accuracy for classification."""
+    if task == "regression":
+        r2 = float(r2_score(y_true, preds))
+        mae = float(mean_absolute_error(y_true, preds))
+        rmse = float(np.sqrt(mean_squared_error(y_true, preds)))
+        return r2, {"r2": round(r2, 4), "mae": round(mae, 4), "rmse": round(rmse, 4)}
+    avg = 'binary' if n_classes == 2 else 'weighted'
+    acc = float(accuracy_score(y_true, preds))
+    prec = float(precision_score(y_true, preds, average=avg, zero_division=0))
+    rec = float(recall_score(y_true, preds, average=avg, zero_division=0))
+    f1 = float(f1_score(y_true, preds, average=avg, zero_division=0))
+    return acc, {"accuracy": round(acc, 4), "precision": round(prec, 4), "recall": round(rec, 4), "f1": round(f1, 4)}
+
+
+def _successive_halving(models: Dict[str, Any], X, X_s, y, task: str, n_classes: Optional[int], deadline: float) -> tuple:
+    """Screen candidates on growing subsamples of the training set, keeping the best 1/factor at each rung.
+
+    Rungs start at ML_HALVING_MIN_ROWS rows and grow by ML_HALVING_FACTOR
+    until one candidate is left, the next rung would be the full training
+    set, or the next rung would not finish by ``deadline``. Running out of
+    time never eliminates anyone: a rung the deadline cuts short keeps all its
+    candidates (bar failures) and ends the screening. Candidates are scored on
+    a validation split held out of the training set, so the test set stays
+    unseen until the final fit. Returns (surviving models, {name: result
+    entry} for the eliminated, rung log, screened fallback). The fallback is
+    (name, fitted model, validation score, rows) for the best candidate of the
+    last rung that scored any, or None.
+    """
+    factor = settings.ML_HALVING_FACTOR
+    val_size = min(0.2, HALVING_VALIDATION_ROWS / len(X))
+    X_fit, X_val, X_fit_s, X_val_s, y_fit, y_val = train_test_split(X, X_s, y, test_size=val_size, random_state=42)
+    survivors, eliminated, rungs, fallback = dict(models), {}, [], None
+    rows = settings.ML_HALVING_MIN_ROWS
+    last_rung_seconds = None
+    while len(survivors) > 1 and rows < len(X_fit):
+        remaining = deadline - time.perf_counter()
+        # A rung costs about factor times the one before (factor times the rows, fewer candidates)
+        if remaining <= 0 or (last_rung_seconds is not None and last_rung_seconds * factor > remaining):
+            logger.info(f"ML: screening stopped before the {rows}-row rung, {len(survivors)} candidates left")
+            break
+        # train_test_split shuffled the rows, so each prefix is a random subsample
+        data = {False: (X_fit.iloc[:rows], X_val), True: (X_fit_s[:rows], X_val_s)}
+        fitted = {n: clone(m) for n, m in survivors.items()}
+        rung_started = time.perf_counter()
+        trained = _train_models(fitted, data, y_fit.iloc[:rows], remaining, settings.ML_TRAIN_THREADS)
+        last_rung_seconds = time.perf_counter() - rung_started
+        scores, cut_short = {}, False
+        for name, (status, detail) in trained.items():
+            if status == "ok":
+                scores[name] = _evaluate(task, y_val, detail[0], n_classes)[0]
+            elif status == "skipped":
+                cut_short = True
+            else:
+                eliminated[name] = {"eliminated": True, "screened_rows": rows, "reason": str(detail)}
+        if scores:
+            best = max(scores, key=scores.get)
+            fallback = (best, fitted[best], scores[best], rows)
+        if cut_short:
+            # A candidate still training has not lost, so nobody is dropped on this rung's scores
+            survivors = {n: m for n, m in survivors.items() if n not in eliminated}
+            rungs.append({"rows": rows, "candidates": list(fitted), "kept": list(survivors), "cut_short": True})
+            break
+        ranked = sorted(scores, key=lambda n: -scores[n])
+        keep = set(ranked[:max(1, math.ceil(len(survivors) / factor))])
+        for name in ranked:
+            if name not in keep:
+                eliminated[name] = {"eliminated": True, "screened_rows": rows, "validation_score": round(scores[name], 4)}
+        rungs.append({"rows": rows, "candidates": list(survivors), "kept": [n for n in survivors if n in keep]})
+        survivors = {n: m for n, m in survivors.items() if n in keep}
+        rows *= factor
+    return survivors, eliminated, rungs, fallback
+
+
+def run_prediction(df: pd.DataFrame, target_col: Optional[str] = None, digest: Optional[str] = None) -> Dict[str, Any]:
+    """Train the candidate models on ``df`` and keep the best. Pass the dataset's content ``digest`` to reuse its encoded features."""
+    started = time.perf_counter()
     target, task = _detect_target(df, target_col)
     logger.info(f"ML: target={target}, task={task}, shape={df.shape}")
 
-    X, y, label_encoders, target_encoder = _prepare_data(df, target)
+    X, y, label_encoders, target_encoder, medians, feature_cache = _prepare_data(df, target, digest)
 
     if X.shape[1] == 0:
         return {"error": "No usable features found after preprocessing."}
@@ -98,49 +437,66 @@ def run_prediction(df: pd.DataFrame, target_col: Optional[str] = None) -> Dict[s
             "Lasso Regression": Lasso(alpha=0.1),
             "Decision Tree": DecisionTreeRegressor(max_depth=10, random_state=42),
             "Random Forest": RandomForestRegressor(n_estimators=100, max_depth=10, random_state=42, n_jobs=-1),
-            "Gradient Boosting": GradientBoostingRegressor(n_estimators=100, max_depth=5, random_state=42),
+            "Gradient Boosting": HistGradientBoostingRegressor(max_iter=100, random_state=42),
         }
     else:
-        n_classes = y.nunique()
         models = {
             "Logistic Regression": LogisticRegression(max_iter=500, random_state=42),
             "Decision Tree": DecisionTreeClassifier(max_depth=10, random_state=42),
             "Random Forest": RandomForestClassifier(n_estimators=100, max_depth=10, random_state=42, n_jobs=-1),
-            "Gradient Boosting": GradientBoostingClassifier(n_estimators=100, max_depth=5, random_state=42),
+            "Gradient Boosting": HistGradientBoostingClassifier(max_iter=100, random_state=42),
         }
 
+    candidates = list(models)
+    n_classes = y.nunique() if task == "classification" else None
+    deadline = started + settings.ML_TIME_BUDGET
+    rungs, eliminated, screened = [], {}, None
+    if settings.ML_SELECTION == "halving" and len(X_train) >= settings.ML_HALVING_MIN_ROWS * settings.ML_HALVING_FACTOR:
+        # Screening gets its share of the budget; the rest is kept for the final fit on all training rows
+        screen_deadline = started + settings.ML_TIME_BUDGET * settings.ML_HALVING_BUDGET_SHARE
+        models, eliminated, rungs, screened = _successive_halving(models, X_train, X_train_s, y_train, task, n_classes, screen_deadline)
+
+    data = {False: (X_train, X_test), True: (X_train_s, X_test_s)}
+    trained = _train_models(models, data, y_train, max(deadline - time.perf_counter(), 0.0), settings.ML_TRAIN_THREADS)
+
     results = {}
     best_name, best_score = None, -np.inf
 
-    for name, model in models.items():
+    for name in candidates:
+        if name in eliminated:
+            results[name] = eliminated[name]
+            continue
+        status, detail = trained[name]
+        if status == "skipped":
+            results[name] = {"skipped": True, "reason": f"Did not finish within the {settings.ML_TIME_BUDGET:g}s training budget"}
+            continue
+        if status == "error":
+            logger.warning(f"Model {name} failed: {detail}")
+            results[name] = {"error": str(detail)}
+            continue
+        preds, timings = detail
         try:
-            use_scaled = name in ("Linear Regression", "Ridge Regression", "Lasso Regression", "Logistic Regression")
-            model.fit(X_train_s if use_scaled else X_train, y_train)
-            preds = model.predict(X_test_s if use_scaled else X_test)
-
-            if task == "regression":
-                r2 = float(r2_score(y_test, preds))
-                mae = float(mean_absolute_error(y_test, preds))
-                rmse = float(np.sqrt(mean_squared_error(y_test, preds)))
-                results[name] = {"r2": round(r2, 4), "mae": round(mae, 4), "rmse": round(rmse, 4)}
-                score = r2
-            else:
-                avg = 'binary' if n_classes == 2 else 'weighted'
-                acc = float(accuracy_score(y_test, preds))
-                prec = float(precision_score(y_test, preds, average=avg, zero_division=0))
-                rec = float(recall_score(y_test, preds, average=avg, zero_division=0))
-                f1 = float(f1_score(y_test, preds, average=avg, zero_division=0))
-                results[name] = {"accuracy": round(acc, 4), "precision": round(prec, 4), "recall": round(rec, 4), "f1": round(f1, 4)}
-                score = acc
-
+            score, metrics = _evaluate(task, y_test, preds, n_classes)
+            results[name] = {**metrics, **timings}
             if score > best_score:
                 best_score, best_name = score, name
         except Exception as e:
             logger.warning(f"Model {name} failed: {e}")
             results[name] = {"error": str(e)}
 
+    best_model = models.get(best_name)
+    if best_name is None and screened is not None:
+        # The final fit ran out of time: fall back to the best screened candidate, as fitted on its subsample
+        best_name, best_model, _, screened_rows = screened
+        logger.warning(f"ML: final fit did not finish; using {best_name} as fitted on {screened_rows} screening rows")
+        preds = best_model.predict(X_test_s if best_name in SCALED_MODELS else X_test)
+        best_score, metrics = _evaluate(task, y_test, preds, n_classes)
+        results[best_name] = {**metrics, "screened_rows": screened_rows, "fallback": True}
+
+    if best_name is None:
+        return {"error": "No model finished training within the time budget.", "models": results}
+
     # Feature importance from best model
-    best_model = models[best_name]
     importance = {}
     if hasattr(best_model, 'feature_importances_'):
         imp = best_model.feature_importances_
@@ -148,11 +504,17 @@ def run_prediction(df: pd.DataFrame, target_col: Optional[str] = None) -> Dict[s
     elif hasattr(best_model, 'coef_'):
         coef = best_model.coef_ if best_model.coef_.ndim == 1 else best_model.coef_[0]
         importance = {col: round(float(abs(v)), 4) for col, v in sorted(zip(X.columns, coef), key=lambda x: -abs(x[1]))[:15]}
+    else:
+        # Histogram boosting exposes no importances; measure them on a slice of the test set
+        n_perm = min(len(X_test), PERMUTATION_ROWS)
+        perm = permutation_importance(best_model, X_test.iloc[:n_perm], y_test.iloc[:n_perm], n_repeats=3, random_state=42)
+        imp = np.clip(perm.importances_mean, 0, None)
+        importance = {col: round(float(v), 4) for col, v in sorted(zip(X.columns, imp), key=lambda x: -x[1])[:15]}
 
     # Sample predictions
     sample_size = min(10, len(X_test))
     sample_idx = X_test.index[:sample_size]
-    use_scaled = best_name in ("Linear Regression", "Ridge Regression", "Lasso Regression", "Logistic Regression")
+    use_scaled = best_name in SCALED_MODELS
     sample_preds = best_model.predict(X_test_s[:sample_size] if use_scaled else X_test.iloc[:sample_size])
 
     if target_encoder:
@@ -169,6 +531,8 @@ def run_prediction(df: pd.DataFrame, target_col: Optional[str] = None) -> Dict[s
         for a, p in zip(actual_labels, pred_labels)
     ]
 
+    pipeline = ScoringPipeline(target, task, X.columns, label_encoders, medians, scaler if use_scaled else None, best_model, target_encoder)
+
     return {
         "target_column": target,
         "task": task,
@@ -176,9 +540,19 @@ def run_prediction(df: pd.DataFrame, target_col: Optional[str] = None) -> Dict[s
         "train_size": len(X_train),
         "test_size": len(X_test),
         "models": results,
+        "training": {
+            "selection": "successive_halving" if rungs else "full",
+            "feature_cache": feature_cache,
+            "rungs": rungs,
+            "budget_seconds": settings.ML_TIME_BUDGET,
+            "wall_seconds": round(time.perf_counter() - started, 4),
+            "skipped": [n for n, r in results.items() if r.get("skipped")],
+        },
         "best_model": best_name,
         "best_score": round(float(best_score), 4),
         "feature_importance": importance,
         "sample_predictions": sample,
         **({"classes": classes} if classes else {}),
+        # Popped by the caller and stored in model_artifacts, not in the results JSON
+        "artifact": pipeline.dumps(),
     }
@@ -0,0 +1,2 @@
+# Import every model so string relationship targets ("Job", "Prediction", ...) always resolve
+from app.models import user, dataset, job  # noqa: F401
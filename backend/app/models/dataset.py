@@ -1,13 +1,14 @@
 import uuid
 from datetime import datetime, timezone
-from sqlalchemy import Column, String, Integer, DateTime, JSON, ForeignKey, BigInteger, Text
+from sqlalchemy import Column, String, Integer, DateTime, JSON, ForeignKey, BigInteger, Text, LargeBinary, UniqueConstraint, Index
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 from app.core.database import Base
 
 
 class Dataset(Base):
     __tablename__ = "datasets"
+    __table_args__ = (Index("ix_datasets_owner_created", "owner_id", "created_at", "id"),)  # keyset pagination, newest first
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     owner_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
@@ -16,41 +17,113 @@ class Dataset(Base):
     cols = Column(Integer, default=0)
     columns = Column(JSON, default=list)
     file_size_bytes = Column(BigInteger, default=0)
-    file_content = Column(Text, nullable=True)  # Store CSV content directly for serverless
+    # The stored file is deferred: only fetched where it is read (app.storage.fetch_dataframe)
+    file_content = deferred(Column(Text, nullable=True), raiseload=True)  # Legacy rows: raw CSV text
+    file_data = deferred(Column(LargeBinary, nullable=True), raiseload=True)  # Arrow IPC file
+    storage_format = Column(String, default="csv")  # "arrow" or legacy "csv"
+    column_schema = Column(JSON, default=dict)  # {column: pandas dtype}
+    content_hash = Column(String, nullable=True)  # digest of file_data, keys the DataFrame cache
     file_type = Column(String, default=".csv")
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
 
     owner = relationship("User", back_populates="datasets")
     analyses = relationship("Analysis", back_populates="dataset", cascade="all, delete-orphan")
     predictions = relationship("Prediction", back_populates="dataset", cascade="all, delete-orphan")
+    analysis_results = relationship("AnalysisResult", back_populates="dataset", cascade="all, delete-orphan")
+    jobs = relationship("Job", back_populates="dataset", cascade="all, delete-orphan")
+    profile = relationship("DatasetProfile", back_populates="dataset", cascade="all, delete-orphan", uselist=False)
+
+
+class DatasetProfile(Base):
+    __tablename__ = "dataset_profiles"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    dataset_id = Column(UUID(as_uuid=True), ForeignKey("datasets.id"), nullable=False, unique=True)
+    version = Column(Integer, nullable=False)  # eda.PROFILE_VERSION that produced it
+    profile = Column(JSON, default=dict)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+
+    dataset = relationship("Dataset", back_populates="profile")
 
 
 class Analysis(Base):
     __tablename__ = "analyses"
+    __table_args__ = (Index("ix_analyses_owner_created", "owner_id", "created_at", "id"),)  # keyset pagination, newest first
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     owner_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     dataset_id = Column(UUID(as_uuid=True), ForeignKey("datasets.id"), nullable=False)
     prompt = Column(Text, nullable=False)
-    eda = Column(JSON, default=dict)
-    plots = Column(JSON, default=list)
+    result_id = Column(UUID(as_uuid=True), ForeignKey("analysis_results.id"), nullable=True)
+    # Older analyses keep eda and plots inline; newer ones share them through result. Both are deferred
+    # (app.analysis_results.WITH_EDA / WITH_MANIFEST load them)
+    eda = deferred(Column(JSON, default=dict), raiseload=True)
+    plots = deferred(Column(JSON, default=list), raiseload=True)  # plot manifest: [{name, kind, params}]; bodies live in analysis_plots
     insights = Column(JSON, default=dict)
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
 
     owner = relationship("User", back_populates="analyses")
     dataset = relationship("Dataset", back_populates="analyses")
+    result = relationship("AnalysisResult", lazy="joined")
+    rendered_plots = relationship("AnalysisPlot", back_populates="analysis", cascade="all, delete-orphan")
+
+
+class AnalysisResult(Base):
+    """The prompt-independent part of an analysis (EDA and plot manifest), shared by every analysis with the same key."""
+    __tablename__ = "analysis_results"
+    __table_args__ = (UniqueConstraint("dataset_id", "cache_key"),)
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    dataset_id = Column(UUID(as_uuid=True), ForeignKey("datasets.id"), nullable=False)
+    cache_key = Column(String, nullable=False)  # digest of dataset content, EDA version and EDA options
+    eda = deferred(Column(JSON, default=dict), raiseload=True)
+    plots = deferred(Column(JSON, default=list), raiseload=True)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+
+    dataset = relationship("Dataset", back_populates="analysis_results")
+
+
+class AnalysisPlot(Base):
+    """A rendered plot, stored the first time it is requested."""
+    __tablename__ = "analysis_plots"
+    __table_args__ = (UniqueConstraint("analysis_id", "name"),)
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    analysis_id = Column(UUID(as_uuid=True), ForeignKey("analyses.id"), nullable=False)
+    name = Column(String, nullable=False)
+    plot = deferred(Column(JSON, default=dict), raiseload=True)  # {name, mime, template, spec}
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+
+    analysis = relationship("Analysis", back_populates="rendered_plots")
 
 
 class Prediction(Base):
     __tablename__ = "predictions"
+    __table_args__ = (Index("ix_predictions_owner_created", "owner_id", "created_at", "id"),)  # keyset pagination, newest first
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     owner_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     dataset_id = Column(UUID(as_uuid=True), ForeignKey("datasets.id"), nullable=False)
     target_column = Column(String, nullable=False)
     task = Column(String, nullable=False)
-    results = Column(JSON, default=dict)
+    results = deferred(Column(JSON, default=dict), raiseload=True)
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
 
     owner = relationship("User", back_populates="predictions")
     dataset = relationship("Dataset", back_populates="predictions")
+    artifact = relationship("ModelArtifact", back_populates="prediction", cascade="all, delete-orphan", uselist=False)
+
+
+class ModelArtifact(Base):
+    """The fitted scoring pipeline (ml.ScoringPipeline) of a prediction's best model."""
+    __tablename__ = "model_artifacts"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    prediction_id = Column(UUID(as_uuid=True), ForeignKey("predictions.id"), nullable=False, unique=True)
+    format = Column(String, default="joblib")
+    library_versions = Column(JSON, default=dict)  # versions it was pickled with; scoring needs compatible ones
+    size_bytes = Column(BigInteger, default=0)
+    payload = deferred(Column(LargeBinary, nullable=False), raiseload=True)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+
+    prediction = relationship("Prediction", back_populates="artifact")
@@ -0,0 +1,38 @@
+import uuid
+from datetime import datetime, timezone
+from sqlalchemy import Column, String, Integer, Float, DateTime, JSON, ForeignKey, Boolean, Text, Index
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import relationship
+from app.core.database import Base
+
+
+class Job(Base):
+    """A queued analysis or prediction; see app.jobs for how jobs are claimed and run."""
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_status_run_after", "status", "run_after"),
+        Index("ix_jobs_owner_created", "owner_id", "created_at"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    owner_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    dataset_id = Column(UUID(as_uuid=True), ForeignKey("datasets.id"), nullable=True)
+    kind = Column(String, nullable=False)  # "analysis" or "prediction"
+    params = Column(JSON, default=dict)
+    status = Column(String, nullable=False, default="queued")  # queued, running, succeeded, failed, cancelled
+    progress = Column(Float, default=0.0)  # 0..1
+    stage = Column(String, default="")
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=1)
+    cancel_requested = Column(Boolean, default=False)
+    error = Column(Text, nullable=True)
+    result_id = Column(UUID(as_uuid=True), nullable=True)  # the Analysis or Prediction it created
+    locked_by = Column(String, nullable=True)  # host:pid of the runner working on it
+    run_after = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    owner = relationship("User", back_populates="jobs")
+    dataset = relationship("Dataset", back_populates="jobs")
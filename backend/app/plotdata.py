@@ -0,0 +1,127 @@
+"""Aggregates behind the default plots.
+
+Every function here reduces a column (or frame) to at most a fixed number of
+points, so a figure's size depends on the plot settings, not on the number
+of rows being plotted.
+"""
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+
+def _finite(values) -> np.ndarray:
+    values = np.asarray(values, dtype=np.float64)
+    return values[np.isfinite(values)]
+
+
+def _spread_indices(n: int, budget: int) -> np.ndarray:
+    """``budget`` evenly spaced positions in range(n), always including both ends."""
+    if n <= budget:
+        return np.arange(n)
+    return np.unique(np.rint(np.linspace(0, n - 1, budget)).astype(np.int64))
+
+
+def histogram_bins(values, max_bins: int = 50) -> Dict[str, np.ndarray]:
+    """Pre-binned histogram: bin centers, widths and counts ('auto' bin rule, capped at ``max_bins``)."""
+    x = _finite(values)
+    if len(x) == 0:
+        return {'centers': np.empty(0), 'widths': np.empty(0), 'counts': np.empty(0, dtype=np.int64)}
+    edges = np.histogram_bin_edges(x, bins='auto')
+    if len(edges) - 1 > max_bins:
+        edges = np.histogram_bin_edges(x, bins=max_bins)
+    counts, edges = np.histogram(x, bins=edges)
+    return {'centers': (edges[:-1] + edges[1:]) / 2, 'widths': np.diff(edges), 'counts': counts}
+
+
+def box_stats(values, max_outliers: int = 500) -> Optional[Dict[str, object]]:
+    """Quartiles, Tukey whiskers, mean and (at most ``max_outliers``) outliers, as plotly draws a box."""
+    x = np.sort(_finite(values))
+    if len(x) == 0:
+        return None
+    q1, median, q3 = np.quantile(x, (0.25, 0.5, 0.75))
+    iqr = q3 - q1
+    beyond = (x < q1 - 1.5 * iqr) | (x > q3 + 1.5 * iqr)
+    inside, outliers = x[~beyond], x[beyond]
+    n_outliers = len(outliers)
+    # Sorted, so an even spread keeps the most extreme values on both sides
+    outliers = outliers[_spread_indices(n_outliers, max_outliers)]
+    return {
+        'q1': float(q1), 'median': float(median), 'q3': float(q3), 'mean': float(x.mean()),
+        'lowerfence': float(inside[0]), 'upperfence': float(inside[-1]),
+        'outliers': outliers, 'n_outliers': n_outliers,
+    }
+
+
+def qq_points(values, max_points: int = 2000) -> Optional[Dict[str, np.ndarray]]:
+    """Normal Q-Q points at up to ``max_points`` evenly spaced ranks, plus the full-data fit line."""
+    x = _finite(values)
+    if len(x) < 2:
+        return None
+    (osm, osr), (slope, intercept, _) = stats.probplot(x, dist='norm')
+    keep = _spread_indices(len(osm), max_points)
+    line_x = np.array([osm[0], osm[-1]])
+    return {'theoretical': osm[keep], 'sample': osr[keep], 'line_x': line_x, 'line_y': slope * line_x + intercept}
+
+
+def stratified_sample(df: pd.DataFrame, n: int, by: Optional[str] = None, seed: int = 42) -> pd.DataFrame:
+    """Up to ``n`` rows drawn proportionally from each stratum.
+
+    Strata are the values of ``by`` when it is categorical, otherwise its
+    deciles; every non-empty stratum keeps at least one row, so rare groups
+    and the tails stay visible. With more strata than ``n``, ``n`` of them are
+    drawn (weighted by size) and keep one row each.
+    """
+    if len(df) <= n:
+        return df
+    if by is None:
+        return df.sample(n=n, random_state=seed)
+    column = df[by]
+    if pd.api.types.is_numeric_dtype(column):
+        codes = pd.qcut(column, 10, labels=False, duplicates='drop')
+    else:
+        codes = pd.Series(pd.factorize(column)[0], index=df.index)
+    codes = codes.fillna(-1).to_numpy()
+    rng = np.random.default_rng(seed)
+    positions = np.arange(len(df))
+    picked = []
+    strata, sizes = np.unique(codes, return_counts=True)
+    if len(strata) >= n:
+        take = np.zeros(len(strata), dtype=np.int64)
+        take[rng.choice(len(strata), size=n, replace=False, p=sizes / sizes.sum())] = 1
+    else:
+        # One row per stratum, the rest apportioned by largest remainder so the total is exactly n
+        share = (n - len(strata)) * (sizes - 1) / (sizes.sum() - len(strata))
+        take = 1 + np.floor(share).astype(np.int64)
+        take[np.argsort(np.floor(share) - share, kind='stable')[:n - take.sum()]] += 1
+    for stratum, k in zip(strata, take):
+        if k:
+            picked.append(rng.choice(positions[codes == stratum], size=k, replace=False))
+    return df.iloc[np.sort(np.concatenate(picked))]
+
+
+def lttb(x, y, n_out: int) -> np.ndarray:
+    """Indices of the points Largest-Triangle-Three-Buckets keeps when reducing (x, y) to ``n_out`` points.
+
+    ``x`` must be sorted and numeric (datetimes as int64); NaN ``y`` values
+    should be dropped first.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    every = (n - 2) / (n_out - 2)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = int(i * every) + 1, int((i + 1) * every) + 1
+        next_start = end
+        next_end = min(max(int((i + 2) * every) + 1, next_start + 1), n)  # the last bucket looks ahead to the final point
+        avg_x, avg_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
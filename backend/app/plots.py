@@ -0,0 +1,150 @@
+import base64
+import json
+import logging
+import re
+from typing import Any, Dict, Optional
+
+import numpy as np
+import plotly.io as pio
+from plotly.utils import PlotlyJSONEncoder
+
+from app.core.config import settings
+
+logger = logging.getLogger("analytiq")
+
+PLOTLY_MIME = "application/vnd.plotly.v1+json"
+LEGACY_HTML_MIME = "text/html"
+
+# numpy dtypes plotly.js accepts as typed arrays ({"dtype", "bdata", "shape"}, plotly.js >= 2.28)
+_TYPED_ARRAYS = {
+    np.dtype("int8"): "i1", np.dtype("uint8"): "u1", np.dtype("int16"): "i2", np.dtype("uint16"): "u2",
+    np.dtype("int32"): "i4", np.dtype("uint32"): "u4", np.dtype("float32"): "f4", np.dtype("float64"): "f8",
+}
+
+
+_DTYPES = {code: dtype for dtype, code in _TYPED_ARRAYS.items()}
+
+
+def _plot_precision(arr: np.ndarray) -> np.ndarray:
+    """Downcast floats to float32 when that is invisible on a plot (error < 0.01% of the value range)."""
+    if arr.dtype != np.float64 or arr.size == 0:
+        return arr
+    finite = arr[np.isfinite(arr)]
+    if finite.size == 0:
+        return arr.astype(np.float32)
+    lo, hi = finite.min(), finite.max()
+    magnitude = max(abs(lo), abs(hi))
+    if magnitude > np.finfo(np.float32).max or (hi - lo) < magnitude * 1e-3:
+        return arr
+    return arr.astype(np.float32)
+
+
+def _typed_array(arr: np.ndarray) -> Optional[Dict[str, str]]:
+    if arr.dtype.kind in "iu" and arr.dtype not in _TYPED_ARRAYS:
+        # plotly.js has no 64-bit integer arrays
+        fits = arr.size == 0 or (arr.min() >= np.iinfo(np.int32).min and arr.max() <= np.iinfo(np.int32).max)
+        arr = arr.astype(np.int32 if fits else np.float64)
+    arr = _plot_precision(arr)
+    code = _TYPED_ARRAYS.get(arr.dtype)
+    if code is None:
+        return None
+    spec = {"dtype": code, "bdata": base64.b64encode(np.ascontiguousarray(arr).tobytes()).decode("ascii")}
+    if arr.ndim > 1:
+        spec["shape"] = ",".join(str(d) for d in arr.shape)
+    return spec
+
+
+def _decode_typed_array(value: dict) -> Optional[np.ndarray]:
+    # plotly >= 6 already keeps numpy data as typed-array dicts inside the figure
+    dtype = _DTYPES.get(value.get("dtype"))
+    if dtype is None or not isinstance(value.get("bdata"), str):
+        return None
+    arr = np.frombuffer(base64.b64decode(value["bdata"]), dtype=dtype)
+    if value.get("shape"):
+        arr = arr.reshape([int(d) for d in str(value["shape"]).split(",")])
+    return arr
+
+
+def _pack(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "bdata" in value and "dtype" in value:
+            arr = _decode_typed_array(value)
+            if arr is not None:
+                return _pack(arr)
+        return {k: _pack(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_pack(v) for v in value]
+    if isinstance(value, np.ndarray) and value.dtype.kind in "iuf":
+        if settings.PLOT_BINARY_ARRAYS and value.size >= 8:
+            packed = _typed_array(value)
+            if packed is not None:
+                return packed
+        return value.tolist()
+    return value
+
+
+def _compact(spec: dict) -> dict:
+    # The template is identical in every figure; clients fetch it once (see plot_template)
+    layout = spec.get("layout") or {}
+    layout.pop("template", None)
+    return {"data": spec.get("data") or [], "layout": layout}
+
+
+def figure_spec(fig) -> dict:
+    """Plotly figure JSON without the template.
+
+    Numeric arrays are base64 typed arrays (float32 where the loss is below
+    plot resolution) when PLOT_BINARY_ARRAYS is on, plain lists otherwise.
+    """
+    spec = _compact(_pack(fig.to_plotly_json()))
+    # The encoder handles dates and pandas scalars and writes NaN as null (JSON columns reject NaN)
+    return json.loads(json.dumps(spec, cls=PlotlyJSONEncoder))
+
+
+def make_plot(name: str, fig) -> dict:
+    return {"name": name, "mime": PLOTLY_MIME, "template": pio.templates.default, "spec": figure_spec(fig)}
+
+
+def plot_template(name: str) -> Optional[dict]:
+    if name not in pio.templates:
+        return None
+    return json.loads(json.dumps(pio.templates[name].to_plotly_json(), cls=PlotlyJSONEncoder))
+
+
+_NEW_PLOT = re.compile(r"Plotly\.newPlot\(\s*")
+_ARG_SEP = re.compile(r"\s*,\s*")
+
+
+def _spec_from_html(html: str) -> Optional[dict]:
+    """Recover the (data, layout) arguments of the Plotly.newPlot call in a fig.to_html() page."""
+    match = _NEW_PLOT.search(html)
+    if match is None:
+        return None
+    decoder = json.JSONDecoder()
+    pos = match.end()
+    args = []
+    for i in range(3):  # div id, data, layout
+        if i:
+            pos = _ARG_SEP.match(html, pos).end()
+        value, pos = decoder.raw_decode(html, pos)
+        args.append(value)
+    return _compact({"data": args[1], "layout": args[2]})
+
+
+def upgrade_plot(plot: dict) -> dict:
+    """Convert a legacy base64 HTML plot to the compact spec format; other plots pass through."""
+    if plot.get("mime") != LEGACY_HTML_MIME or "b64" not in plot:
+        return plot
+    try:
+        spec = _spec_from_html(base64.b64decode(plot["b64"]).decode("utf-8"))
+    except (ValueError, AttributeError, UnicodeDecodeError):
+        spec = None
+    if spec is None:
+        logger.warning(f"Could not upgrade legacy plot {plot.get('name')}")
+        return plot
+    return {"name": plot.get("name"), "mime": PLOTLY_MIME, "template": "plotly", "spec": spec}
+
+
+def has_body(plot: dict) -> bool:
+    """True for plots stored with their content inline (legacy HTML or spec), not as manifest entries."""
+    return "spec" in plot or "b64" in plot
@@ -0,0 +1,77 @@
+import logging
+from typing import Optional
+
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import async_session, release_connection
+from app.core.executor import compute
+from app.eda import build_profile, build_sketch_profile, PROFILE_VERSION
+from app.models.dataset import Dataset, DatasetProfile
+from app.storage import fetch_dataframe, load_content, ARROW_FORMAT
+
+logger = logging.getLogger("analytiq")
+
+
+async def get_profile(db: AsyncSession, dataset_id) -> Optional[dict]:
+    result = await db.execute(select(DatasetProfile).where(DatasetProfile.dataset_id == dataset_id))
+    row = result.scalar_one_or_none()
+    if row is None or row.version != PROFILE_VERSION:
+        return None
+    return row.profile
+
+
+async def save_profile(db: AsyncSession, dataset_id, profile: dict) -> None:
+    result = await db.execute(select(DatasetProfile).where(DatasetProfile.dataset_id == dataset_id))
+    row = result.scalar_one_or_none()
+    try:
+        async with db.begin_nested():
+            if row is None:
+                db.add(DatasetProfile(dataset_id=dataset_id, version=PROFILE_VERSION, profile=profile))
+            else:
+                row.version, row.profile = PROFILE_VERSION, profile
+    except IntegrityError:
+        # Another request profiled the same dataset first; its copy is just as good
+        logger.info(f"Profile for dataset {dataset_id} already stored")
+
+
+async def compute_profile(db: AsyncSession, dataset: Dataset, df: Optional[pd.DataFrame] = None,
+                          timeout: Optional[float] = None) -> dict:
+    """Build a dataset's profile: exactly from its DataFrame, or from sketches when it is large."""
+    if dataset.storage_format == ARROW_FORMAT and (dataset.rows or 0) > settings.MAX_ROWS_ANALYSIS:
+        await load_content(db, dataset)
+        if dataset.file_data is not None:
+            await release_connection(db)
+            return await compute.run(build_sketch_profile, dataset.file_data, timeout=timeout)
+    if df is None:
+        df = await fetch_dataframe(db, dataset)
+    await release_connection(db)
+    return await compute.run(build_profile, df, timeout=timeout)
+
+
+async def ensure_profile(db: AsyncSession, dataset: Dataset, df: Optional[pd.DataFrame] = None,
+                         timeout: Optional[float] = None) -> dict:
+    """Return the stored profile, building it if it is missing or stale."""
+    profile = await get_profile(db, dataset.id)
+    if profile is None:
+        profile = await compute_profile(db, dataset, df, timeout=timeout)
+        await save_profile(db, dataset.id, profile)
+    return profile
+
+
+async def profile_dataset(dataset_id) -> None:
+    """Background step after upload: build and store the dataset's profile."""
+    try:
+        async with async_session() as db:
+            dataset = await db.get(Dataset, dataset_id)
+            if dataset is None or await get_profile(db, dataset_id) is not None:
+                return
+            profile = await compute_profile(db, dataset)
+            await save_profile(db, dataset_id, profile)
+            await db.commit()
+            logger.info(f"Profiled dataset {dataset_id}")
+    except Exception as e:
+        logger.warning(f"Profiling dataset {dataset_id} failed: {e}")
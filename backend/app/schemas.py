@@ -112,6 +112,15 @@ class PredictRequest(BaseModel):
     target_column: Optional[str] = Field(default=None, max_length=200)
 
 
+class OnlinePredictRequest(BaseModel):
+    rows: List[Dict[str, Any]] = Field(min_length=1, max_length=1000)
+
+
+class OnlinePredictResponse(BaseModel):
+    prediction_id: str
+    predictions: List[Dict[str, Any]]
+
+
 class PredictResponse(BaseModel):
     id: str
     dataset_id: str
@@ -132,5 +141,23 @@ class PredictResponse(BaseModel):
         from_attributes = True
 
 
+# Jobs
+class JobResponse(BaseModel):
+    id: str
+    kind: str
+    status: str
+    progress: float
+    stage: str
+    attempts: int
+    max_attempts: int
+    error: Optional[str] = None
+    dataset_id: Optional[str] = None
+    result_id: Optional[str] = None
+    result_url: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
 class ErrorResponse(BaseModel):
     detail: str
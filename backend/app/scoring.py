@@ -0,0 +1,75 @@
+import asyncio
+import logging
+import os
+from typing import AsyncIterator, Optional, Tuple
+
+import pandas as pd
+import pyarrow.csv as pa_csv
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.ml import LIBRARY_VERSIONS, ScoringPipeline
+from app.models.dataset import ModelArtifact
+
+logger = logging.getLogger("analytiq")
+
+
+async def load_pipeline(db: AsyncSession, prediction_id) -> Optional[ScoringPipeline]:
+    """The stored scoring pipeline of a prediction, or None for predictions trained before models were kept."""
+    result = await db.execute(
+        select(ModelArtifact.payload, ModelArtifact.library_versions).where(ModelArtifact.prediction_id == prediction_id)
+    )
+    row = result.first()
+    if row is None:
+        return None
+    if row.library_versions and row.library_versions != LIBRARY_VERSIONS:
+        logger.warning(f"Model of prediction {prediction_id} was saved with {row.library_versions}, loading under {LIBRARY_VERSIONS}")
+    return await asyncio.to_thread(ScoringPipeline.loads, row.payload)
+
+
+def open_scoring_csv(pipeline: ScoringPipeline, path: str, batch_rows: int):
+    """A chunked reader over the feature columns of the CSV at ``path``.
+
+    Raises ValueError naming the feature columns the file lacks.
+    """
+    header = pd.read_csv(path, nrows=0).columns
+    missing = pipeline.missing_columns(header)
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    # Only the feature columns are parsed, the way ingest parsed the training data: categorical ones as
+    # literal text (blank cells and "NA" are labels, not missing), numeric ones with Arrow's null tokens
+    dtypes = {col: str for col in pipeline.categories}
+    null_values = pa_csv.ConvertOptions().null_values
+    na_values = {col: null_values for col in pipeline.features if col not in pipeline.categories}
+    return pd.read_csv(path, usecols=pipeline.features, dtype=dtypes, keep_default_na=False, na_values=na_values,
+                       chunksize=batch_rows)
+
+
+def _score_next(reader, pipeline: ScoringPipeline, first_row: int) -> Optional[Tuple[str, int]]:
+    batch = next(reader, None)
+    if batch is None:
+        return None
+    scored = pipeline.predict(batch)
+    scored.insert(0, "row", range(first_row, first_row + len(batch)))
+    return scored.to_csv(index=False, header=first_row == 0), len(batch)
+
+
+async def stream_scores(pipeline: ScoringPipeline, reader, path: str) -> AsyncIterator[bytes]:
+    """Yield the scored CSV one batch at a time, so memory stays flat however long the file; removes ``path`` at the end."""
+    rows = 0
+    try:
+        while True:
+            scored = await asyncio.to_thread(_score_next, reader, pipeline, rows)
+            if scored is None:
+                break
+            text, n = scored
+            rows += n
+            yield text.encode("utf-8")
+        logger.info(f"Scored {rows} rows")
+    except Exception as e:
+        # The status line has already been sent; all that is left is to stop the stream
+        logger.warning(f"Scoring stopped after {rows} rows: {e}")
+        raise
+    finally:
+        reader.close()
+        os.remove(path)
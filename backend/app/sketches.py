@@ -0,0 +1,379 @@
+import math
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from app.stats import moment_stats
+
+
+def kll_rank_error(k: int) -> float:
+    """99% normalized rank error of a KLL sketch with parameter k (Apache DataSketches' fit)."""
+    return 2.296 / k ** 0.9723
+
+
+def _hash_values(values) -> np.ndarray:
+    """64-bit hashes that agree across chunks whatever dtype pandas gave each chunk."""
+    if isinstance(values, np.ndarray):
+        return pd.util.hash_array(values + 0.0)  # + 0.0 folds -0.0 into 0.0
+    return pd.util.hash_pandas_object(values, index=False).to_numpy()
+
+
+class HyperLogLog:
+    """Distinct-count sketch with 2**p one-byte registers (relative std. error 1.04 / sqrt(2**p))."""
+
+    def __init__(self, p: int = 14):
+        if not 11 <= p <= 18:
+            raise ValueError("HyperLogLog precision must be between 11 and 18")
+        self.p = p
+        self.registers = np.zeros(1 << p, dtype=np.uint8)
+
+    @property
+    def relative_error(self) -> float:
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def add_hashes(self, hashes: np.ndarray) -> None:
+        if len(hashes) == 0:
+            return
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        bits = 64 - self.p
+        idx = (hashes >> np.uint64(bits)).astype(np.intp)
+        rest = hashes & np.uint64((1 << bits) - 1)
+        # At most 53 bits remain, so the float conversion (and frexp's bit length) is exact
+        rank = (bits + 1 - np.frexp(rest.astype(np.float64))[1]).astype(np.uint8)
+        np.maximum.at(self.registers, idx, rank)
+
+    def merge(self, other: "HyperLogLog") -> None:
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> float:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            return m * math.log(m / zeros)  # linear counting is far more accurate at small cardinalities
+        return float(raw)
+
+
+class KLLSketch:
+    """Mergeable quantile sketch (Karnin, Lang & Liberty) over float values.
+
+    Level ``h`` holds items of weight 2**h; a level over capacity is sorted
+    and every other item (random offset) is promoted. Until the first
+    compaction every value is kept and quantiles are exact.
+    """
+
+    def __init__(self, k: int = 200, seed: int = 0):
+        self.k = k
+        self.n = 0
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self.compacted = False
+        self._rng = np.random.default_rng(seed)
+
+    @property
+    def rank_error(self) -> float:
+        return kll_rank_error(self.k) if self.compacted else 0.0
+
+    def _capacity(self, h: int) -> int:
+        return max(int(math.ceil(self.k * (2 / 3) ** (len(self.levels) - 1 - h))), 2)
+
+    def update(self, values: np.ndarray) -> None:
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        self.n += len(values)
+        self.levels[0] = np.concatenate((self.levels[0], values))
+        self._compress()
+
+    def merge(self, other: "KLLSketch") -> None:
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, items in enumerate(other.levels):
+            self.levels[h] = np.concatenate((self.levels[h], items))
+        self.n += other.n
+        self.compacted |= other.compacted
+        self._compress()
+
+    def _compress(self) -> None:
+        h = 0
+        while h < len(self.levels):
+            if len(self.levels[h]) > self._capacity(h):
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(self.levels[h])
+                odd = len(items) % 2
+                pairs = items[:len(items) - odd]
+                self.levels[h + 1] = np.concatenate((self.levels[h + 1], pairs[self._rng.integers(2)::2]))
+                self.levels[h] = items[len(items) - odd:]
+                self.compacted = True
+            h += 1
+
+    def quantiles(self, qs: Sequence[float]) -> np.ndarray:
+        if self.n == 0:
+            return np.full(len(qs), np.nan)
+        if not self.compacted:
+            return np.quantile(self.levels[0], qs)  # linear interpolation, as pandas
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(lvl), 1 << h, dtype=np.int64) for h, lvl in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        items, cum = items[order], np.cumsum(weights[order])
+        idx = np.searchsorted(cum, np.asarray(qs) * cum[-1], side='left')
+        return items[np.minimum(idx, len(items) - 1)]
+
+
+class HeavyHitters:
+    """Misra-Gries frequent items over pre-aggregated value counts.
+
+    Keeps at most ``capacity`` counters; each reported count is low by at most
+    ``error`` (<= n / (capacity + 1)). While ``error`` is 0 nothing has been
+    dropped, so counts, distinct count and mode are exact.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype=np.int64)
+        self.n = 0
+        self.error = 0
+
+    @property
+    def exact(self) -> bool:
+        return self.error == 0
+
+    def update(self, value_counts: pd.Series) -> None:
+        self.n += int(value_counts.sum())
+        self._absorb(value_counts)
+
+    def merge(self, other: "HeavyHitters") -> None:
+        self.n += other.n
+        self.error += other.error
+        self._absorb(other.counts)
+
+    def _absorb(self, counts: pd.Series) -> None:
+        merged = self.counts.add(counts, fill_value=0).astype(np.int64) if len(self.counts) else counts.astype(np.int64)
+        if len(merged) > self.capacity:
+            cut = int(merged.nlargest(self.capacity + 1).iloc[-1])
+            merged = merged[merged > cut] - cut
+            self.error += cut
+        self.counts = merged
+
+    def top(self, k: int) -> pd.Series:
+        return self.counts.sort_values(ascending=False, kind='stable').head(k)
+
+    def mode(self):
+        if len(self.counts) == 0:
+            return None
+        # Same tie-break as pandas' mode(): the smallest of the most frequent values
+        tied = self.counts.index[self.counts == self.counts.max()]
+        try:
+            return sorted(tied)[0]
+        except TypeError:
+            return tied[0]
+
+    def entropy(self, distinct: float) -> float:
+        if self.n == 0:
+            return 0.0
+        p = self.counts.to_numpy() / self.n
+        h = float(-(p * np.log(p)).sum())
+        rest = 1.0 - p.sum()
+        untracked = max(distinct - len(self.counts), 1.0)
+        if rest > 0:
+            # Mass outside the counters, assumed spread evenly over the remaining distinct values
+            h -= rest * math.log(rest / untracked)
+        return h
+
+
+class StreamingMoments:
+    """Exact count/mean/central moments, min, max and zero counts per column, merged chunk by chunk (Pébay)."""
+
+    def __init__(self, n_cols: int):
+        self.count = np.zeros(n_cols)
+        self.mean = np.zeros(n_cols)
+        self.m2 = np.zeros(n_cols)
+        self.m3 = np.zeros(n_cols)
+        self.m4 = np.zeros(n_cols)
+        self.min = np.full(n_cols, np.inf)
+        self.max = np.full(n_cols, -np.inf)
+        self.zeros = np.zeros(n_cols, dtype=np.int64)
+
+    def update(self, X: np.ndarray) -> None:
+        present = ~np.isnan(X)
+        nb = present.sum(axis=0).astype(np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mb = np.where(nb > 0, np.nansum(X, axis=0) / np.maximum(nb, 1), 0.0)
+        C = np.where(present, X - mb, 0.0)
+        C2 = C * C
+        other = (nb, mb, C2.sum(axis=0), (C2 * C).sum(axis=0), (C2 * C2).sum(axis=0))
+        del C, C2
+        self._combine(*other)
+        if X.shape[0]:
+            self.min = np.fmin(self.min, np.nanmin(np.where(present, X, np.inf), axis=0))
+            self.max = np.fmax(self.max, np.nanmax(np.where(present, X, -np.inf), axis=0))
+        self.zeros += (X == 0).sum(axis=0)
+
+    def merge(self, other: "StreamingMoments") -> None:
+        self._combine(other.count, other.mean, other.m2, other.m3, other.m4)
+        self.min = np.fmin(self.min, other.min)
+        self.max = np.fmax(self.max, other.max)
+        self.zeros += other.zeros
+
+    def _combine(self, nb, mb, m2b, m3b, m4b) -> None:
+        na, ma, m2a, m3a, m4a = self.count, self.mean, self.m2, self.m3, self.m4
+        n = na + nb
+        safe = np.maximum(n, 1)
+        d = mb - ma
+        self.mean = np.where(n > 0, ma + d * nb / safe, 0.0)
+        self.m2 = m2a + m2b + d ** 2 * na * nb / safe
+        self.m3 = (m3a + m3b + d ** 3 * na * nb * (na - nb) / safe ** 2
+                   + 3 * d * (na * m2b - nb * m2a) / safe)
+        self.m4 = (m4a + m4b + d ** 4 * na * nb * (na * na - na * nb + nb * nb) / safe ** 3
+                   + 6 * d ** 2 * (na * na * m2b + nb * nb * m2a) / safe ** 2
+                   + 4 * d * (na * m3b - nb * m3a) / safe)
+        self.count = n
+
+    def result(self) -> Dict[str, np.ndarray]:
+        count = self.count.astype(np.int64)
+        var, skew, kurt = moment_stats(count, self.m2, self.m3, self.m4)
+        empty = count == 0
+        return {
+            'count': count, 'mean': np.where(empty, np.nan, self.mean), 'std': np.sqrt(var),
+            'min': np.where(empty, np.nan, self.min), 'max': np.where(empty, np.nan, self.max),
+            'skew': skew, 'kurtosis': kurt, 'zeros': self.zeros,
+        }
+
+
+class CoMoments:
+    """Exact pairwise-complete Pearson correlation accumulated chunk by chunk.
+
+    Keeps the same per-pair sums as stats.correlation_matrix, shifted by the
+    first chunk's means for numerical stability, so memory is O(columns^2)
+    however many rows stream through. Sums around different shifts are
+    re-centered when merged.
+    """
+
+    def __init__(self, n_cols: int, dtype=np.float64):
+        self.shift: Optional[np.ndarray] = None
+        self.dtype = dtype
+        shape = (n_cols, n_cols)
+        self.nb, self.sx, self.sxx, self.sxy = (np.zeros(shape, dtype=dtype) for _ in range(4))
+
+    def update(self, X: np.ndarray) -> None:
+        present = ~np.isnan(X)
+        if self.shift is None:
+            with np.errstate(invalid='ignore'):
+                self.shift = np.nan_to_num(np.nanmean(X, axis=0)) if X.shape[0] else np.zeros(X.shape[1])
+        X0 = np.where(present, X - self.shift, 0.0).astype(self.dtype)
+        M = present.astype(self.dtype)
+        self.nb += M.T @ M
+        self.sx += X0.T @ M   # sum of x_i over rows where x_j is present
+        self.sxx += (X0 * X0).T @ M
+        self.sxy += X0.T @ X0
+
+    def merge(self, other: "CoMoments") -> None:
+        if other.shift is None:
+            return
+        if self.shift is None:
+            self.shift = other.shift
+        # Re-center the other sums on this shift: sum(x - b) = sum(x - a) - (b - a) * n
+        d = (self.shift - other.shift).astype(self.dtype)
+        di, dj = d[:, None], d[None, :]
+        self.nb += other.nb
+        self.sx += other.sx - di * other.nb
+        self.sxx += other.sxx - 2 * di * other.sx + di * di * other.nb
+        self.sxy += other.sxy - dj * other.sx - di * other.sx.T + di * dj * other.nb
+
+    def result(self):
+        sy, syy = self.sx.T, self.sxx.T
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = self.sxy - self.sx * sy / self.nb
+            var_x = self.sxx - self.sx * self.sx / self.nb
+            var_y = syy - sy * sy / self.nb
+            r = np.clip(cov / np.sqrt(var_x * var_y), -1.0, 1.0).astype(np.float64)
+        n = np.rint(self.nb).astype(np.int64)
+        np.fill_diagonal(r, np.where(np.isnan(np.diag(r)), np.nan, 1.0))
+        r[n < 2] = np.nan
+        return r, n
+
+
+class DatasetSketch:
+    """Bounded-memory summaries of a dataset fed one DataFrame chunk at a time.
+
+    Row counts, missing values, moments, min/max and (Pearson) correlations
+    are exact; distinct counts, duplicate rows, quantiles and top categories
+    come from HyperLogLog, KLL and Misra-Gries sketches. Memory depends on the
+    number of columns and the sketch sizes, never on the number of rows.
+    """
+
+    def __init__(self, columns, numeric_columns, categorical_columns, hll_precision: int = 14,
+                 kll_k: int = 200, heavy_hitters: int = 1024, correlation: bool = True, wide_cols: int = 1000):
+        self.columns = list(columns)
+        self.numeric_columns = list(numeric_columns)
+        self.categorical_columns = list(categorical_columns)
+        self.rows = 0
+        self.memory_bytes = 0
+        self.nulls = pd.Series(0, index=self.columns, dtype=np.int64)
+        # Duplicates are rows minus distinct rows, so the row sketch gets 4x the registers
+        self.row_hll = HyperLogLog(min(hll_precision + 2, 18))
+        self.distinct = {col: HyperLogLog(hll_precision) for col in self.columns}
+        self.moments = StreamingMoments(len(self.numeric_columns))
+        self.quantiles = [KLLSketch(kll_k, seed=i) for i in range(len(self.numeric_columns))]
+        self.heavy = {col: HeavyHitters(heavy_hitters) for col in self.categorical_columns}
+        wide = len(self.numeric_columns) >= wide_cols
+        self.comoments = (CoMoments(len(self.numeric_columns), np.float32 if wide else np.float64)
+                          if correlation and len(self.numeric_columns) > 1 else None)
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        chunk = chunk[self.columns]
+        self.rows += len(chunk)
+        self.memory_bytes += int(chunk.memory_usage(deep=True, index=False).sum())
+        self.nulls += chunk.isna().sum().astype(np.int64)
+
+        X = None
+        canonical = {}
+        if self.numeric_columns:
+            X = chunk[self.numeric_columns].to_numpy(dtype=np.float64, na_value=np.nan)
+            self.moments.update(X)
+            if self.comoments is not None:
+                self.comoments.update(X)
+            for i, col in enumerate(self.numeric_columns):
+                values = X[:, i]
+                canonical[col] = values + 0.0
+                values = values[~np.isnan(values)]
+                self.quantiles[i].update(values)
+                self.distinct[col].add_hashes(_hash_values(values))
+        for col in self.columns:
+            if col in canonical:
+                continue
+            s = chunk[col]
+            # An int or bool column with nulls in one chunk is float/object there; object hashes match either way
+            canonical[col] = s.astype(object)
+            present = s.dropna()
+            self.distinct[col].add_hashes(_hash_values(present.astype(object)))
+            if col in self.heavy:
+                self.heavy[col].update(present.value_counts())
+        if len(chunk):
+            self.row_hll.add_hashes(_hash_values(pd.DataFrame(canonical, columns=self.columns)))
+
+    def merge(self, other: "DatasetSketch") -> None:
+        self.rows += other.rows
+        self.memory_bytes += other.memory_bytes
+        self.nulls += other.nulls
+        self.row_hll.merge(other.row_hll)
+        for col, hll in other.distinct.items():
+            self.distinct[col].merge(hll)
+        self.moments.merge(other.moments)
+        for mine, theirs in zip(self.quantiles, other.quantiles):
+            mine.merge(theirs)
+        for col, hh in other.heavy.items():
+            self.heavy[col].merge(hh)
+        if self.comoments is not None and other.comoments is not None:
+            self.comoments.merge(other.comoments)
+
+    def nunique(self, col) -> int:
+        hh = self.heavy.get(col)
+        if hh is not None and hh.exact:
+            return int(len(hh.counts))
+        return int(round(self.distinct[col].estimate()))
+
+    def distinct_rows(self) -> int:
+        return min(int(round(self.row_hll.estimate())), self.rows)
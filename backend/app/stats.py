@@ -0,0 +1,286 @@
+import numpy as np
+import pandas as pd
+from scipy import stats
+from typing import Dict, Any, List, Tuple
+
+QUANTILES = (0.25, 0.5, 0.75)
+
+
+def _sorted_quantiles(S: np.ndarray, count: np.ndarray, qs) -> np.ndarray:
+    """Linear-interpolated quantiles (pandas' default) of each column of a NaN-last sorted matrix."""
+    cols = np.arange(S.shape[1])
+    out = np.full((len(qs), S.shape[1]), np.nan)
+    valid = count > 0
+    for i, q in enumerate(qs):
+        pos = q * np.maximum(count - 1, 0)
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.ceil(pos).astype(np.int64)
+        v_lo, v_hi = S[lo, cols], S[hi, cols]
+        out[i] = np.where(valid, v_lo + (v_hi - v_lo) * (pos - lo), np.nan)
+    return out
+
+
+def moment_stats(count: np.ndarray, m2: np.ndarray, m3: np.ndarray, m4: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Variance, skew and kurtosis from central moment sums, with pandas' bias corrections."""
+    # Sums at floating-point noise level count as zero, as in pandas' nanops
+    m2 = np.where(np.abs(m2) < 1e-14, 0.0, m2)
+    m3 = np.where(np.abs(m3) < 1e-14, 0.0, m3)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        n = count.astype(float)
+        var = np.where(count > 1, m2 / (n - 1), np.nan)
+        skew = (n * np.sqrt(n - 1) / (n - 2)) * m3 / m2 ** 1.5
+        skew = np.where(count < 3, np.nan, np.where(m2 == 0, 0.0, skew))
+        numerator = n * (n + 1) * (n - 1) * m4
+        denominator = (n - 2) * (n - 3) * m2 ** 2
+        denominator = np.where(np.abs(denominator) < 1e-14, 0.0, denominator)
+        kurt = numerator / denominator - 3 * (n - 1) ** 2 / ((n - 2) * (n - 3))
+        kurt = np.where(count < 4, np.nan, np.where(denominator == 0, 0.0, kurt))
+    return var, skew, kurt
+
+
+def numeric_column_stats(X: np.ndarray) -> Dict[str, np.ndarray]:
+    """Vectorized statistics for every column of a 2-D float array (NaN = missing).
+
+    One sort per column gives min/max, quartiles and distinct counts; one
+    centered pass gives the moments. Skew and kurtosis use the same
+    bias-corrected estimators as pandas.
+    """
+    n_rows, n_cols = X.shape
+    nan = np.isnan(X)
+    count = n_rows - nan.sum(axis=0)
+    safe_count = np.maximum(count, 1)
+    total = np.nansum(X, axis=0)
+    mean = np.where(count > 0, total / safe_count, np.nan)
+
+    C = X - mean
+    C2 = C * C
+    m2 = np.nansum(C2, axis=0)
+    m3 = np.nansum(C2 * C, axis=0)
+    m4 = np.nansum(C2 * C2, axis=0)
+    del C, C2
+    var, skew, kurt = moment_stats(count, m2, m3, m4)
+
+    S = np.sort(X, axis=0)  # NaNs sort last
+    cols = np.arange(n_cols)
+    last = np.maximum(count - 1, 0)
+    vmin = np.where(count > 0, S[0, cols], np.nan) if n_rows else np.full(n_cols, np.nan)
+    vmax = np.where(count > 0, S[last, cols], np.nan) if n_rows else np.full(n_cols, np.nan)
+    q = _sorted_quantiles(S, count, QUANTILES) if n_rows else np.full((len(QUANTILES), n_cols), np.nan)
+    if n_rows > 1:
+        changes = (S[1:] != S[:-1]) & (np.arange(1, n_rows)[:, None] < count)
+        nunique = np.where(count > 0, changes.sum(axis=0) + 1, 0)
+    else:
+        nunique = count.copy()
+
+    return {
+        'count': count, 'nulls': n_rows - count, 'zeros': (X == 0).sum(axis=0),
+        'sum': total, 'mean': mean, 'std': np.sqrt(var), 'var': var,
+        'min': vmin, 'q25': q[0], 'q50': q[1], 'q75': q[2], 'max': vmax,
+        'skew': skew, 'kurtosis': kurt, 'nunique': nunique,
+    }
+
+
+def categorical_column_stats(s: pd.Series, top_k: int = 10) -> Dict[str, Any]:
+    """nunique, top-k counts, mode and entropy of one column from a single value_counts pass."""
+    vc = s.value_counts()
+    counts = vc.to_numpy()
+    if len(counts) == 0:
+        return {'nunique': 0, 'top': {}, 'mode': None, 'entropy': 0.0}
+    p = counts / counts.sum()
+    # pandas' mode() breaks ties by sort order, not by position
+    tied = vc.index[counts == counts[0]]
+    try:
+        mode = sorted(tied)[0]
+    except TypeError:
+        mode = tied[0]
+    return {
+        'nunique': int(len(vc)),
+        'top': vc.head(top_k),
+        'mode': mode,
+        'entropy': float(-(p * np.log(p)).sum()),
+    }
+
+
+def column_stats(df: pd.DataFrame, top_k: int = 10) -> Dict[str, Any]:
+    """Compute every per-column statistic the EDA needs in one pass over the data.
+
+    Numeric columns are processed together as one matrix, categorical columns
+    with one value_counts each. Every EDA section reads from this result
+    instead of re-scanning the frame.
+    """
+    numeric_cols = df.select_dtypes(include=['number']).columns
+    categorical_cols = df.select_dtypes(include=['object', 'category']).columns
+    nulls = df.isna().sum()
+
+    numeric = {}
+    if len(numeric_cols) > 0:
+        X = df[numeric_cols].to_numpy(dtype=np.float64, na_value=np.nan)
+        numeric = numeric_column_stats(X)
+
+    categorical = {col: categorical_column_stats(df[col], top_k) for col in categorical_cols}
+
+    nunique = {}
+    for col in df.columns:
+        if col in categorical:
+            nunique[col] = categorical[col]['nunique']
+        elif col not in numeric_cols:
+            nunique[col] = int(df[col].nunique())
+    for i, col in enumerate(numeric_cols):
+        nunique[col] = int(numeric['nunique'][i])
+
+    return {
+        'rows': len(df),
+        'duplicates': int(df.duplicated().sum()),
+        'memory_bytes': int(df.memory_usage(deep=True).sum()),
+        'nulls': nulls,
+        'nunique': {col: nunique[col] for col in df.columns},
+        'numeric_columns': numeric_cols,
+        'categorical_columns': categorical_cols,
+        'numeric': numeric,
+        'categorical': categorical,
+    }
+
+
+def iqr_outliers(X: np.ndarray, q1: np.ndarray, q3: np.ndarray, k: float = 1.5) -> Dict[str, np.ndarray]:
+    """Tukey fences for every column of ``X`` at once; NaNs never count as outliers."""
+    iqr = q3 - q1
+    lower, upper = q1 - k * iqr, q3 + k * iqr
+    with np.errstate(invalid='ignore'):
+        count = ((X < lower) | (X > upper)).sum(axis=0)
+    return {'count': count, 'lower': lower, 'upper': upper}
+
+
+def mad_outliers(X: np.ndarray, median: np.ndarray = None, threshold: float = 3.5) -> Dict[str, np.ndarray]:
+    """Modified z-score outliers (Iglewicz & Hoaglin): |x - median| / (1.4826 * MAD) > threshold.
+
+    Columns whose MAD is zero fall back to 1.2533 * mean absolute deviation,
+    so a column that is mostly one value doesn't flag every other value.
+    """
+    if median is None:
+        median = np.nanmedian(X, axis=0)
+    D = np.abs(X - median)
+    mad = np.nanmedian(D, axis=0)
+    scale = np.where(mad > 0, 1.4826 * mad, 1.2533 * np.nanmean(D, axis=0))
+    with np.errstate(invalid='ignore'):
+        count = np.where(scale > 0, (D > threshold * scale).sum(axis=0), 0)
+    return {'count': count, 'median': median, 'mad': mad, 'threshold': threshold}
+
+
+def correlation_matrix(X: np.ndarray, method: str = 'pearson', block_cols: int = 1000,
+                       block_size: int = 256) -> Tuple[np.ndarray, np.ndarray]:
+    """Pairwise-complete correlation matrix and the number of rows behind each entry.
+
+    Every pair uses exactly the rows where both columns are present (like
+    DataFrame.corr), computed with matrix products instead of a per-pair
+    loop. Frames with ``block_cols`` or more columns are processed in float32,
+    ``block_size`` by ``block_size`` columns at a time: the centered copies and
+    masks the products need exist only for the two blocks in hand, so temporary
+    memory beyond the output is bounded by the block size. For
+    ``method='spearman'`` each column is ranked once over its own non-missing
+    values; with missing data this differs slightly from pandas, which re-ranks
+    each pair.
+    """
+    if method == 'spearman':
+        X = pd.DataFrame(X).rank().to_numpy()
+    wide = X.shape[1] >= block_cols
+    dtype = np.float32 if wide else np.float64
+    k = X.shape[1]
+    step = block_size if wide else max(k, 1)
+    blocks = [slice(start, min(start + step, k)) for start in range(0, k, step)]
+    # nanmean copies its input, so take it a block at a time too
+    means = np.concatenate([np.nanmean(X[:, b], axis=0) for b in blocks]) if X.shape[0] and k else np.zeros(k)
+
+    def prepared(block):
+        # Centering first keeps the one-pass sums numerically stable
+        X0 = X[:, block].astype(dtype)
+        X0 -= means[block].astype(dtype)
+        present = ~np.isnan(X0)
+        X0[~present] = 0.0
+        return X0, present.astype(dtype), X0 * X0
+
+    r = np.empty((k, k), dtype=dtype)
+    n = np.empty((k, k), dtype=np.int64)
+    for bi in blocks:
+        X0i, Mi, X0sqi = prepared(bi)
+        for bj in blocks:
+            X0j, Mj, X0sqj = (X0i, Mi, X0sqi) if bj == bi else prepared(bj)
+            nb = Mi.T @ Mj
+            sx = X0i.T @ Mj          # sum of x_i over rows where x_j is present
+            sy = Mi.T @ X0j          # sum of x_j over rows where x_i is present
+            sxx = X0sqi.T @ Mj
+            syy = Mi.T @ X0sqj
+            sxy = X0i.T @ X0j
+            with np.errstate(divide='ignore', invalid='ignore'):
+                cov = sxy - sx * sy / nb
+                var_x = sxx - sx * sx / nb
+                var_y = syy - sy * sy / nb
+                r[bi, bj] = cov / np.sqrt(var_x * var_y)
+            n[bi, bj] = np.rint(nb).astype(np.int64)
+    r = np.clip(r, -1.0, 1.0)
+    np.fill_diagonal(r, np.where(np.isnan(np.diag(r)), np.nan, 1.0))
+    r[n < 2] = np.nan
+    return r.astype(np.float64), n
+
+
+def correlation_pvalues(r: np.ndarray, n: np.ndarray) -> np.ndarray:
+    """Two-sided p-values of H0: rho = 0 from the t statistic r * sqrt((n-2) / (1-r^2))."""
+    df = n - 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.abs(r) * np.sqrt(df / (1.0 - r * r))
+        p = 2 * stats.t.sf(t, df)
+    p = np.where(np.abs(r) >= 1.0, 0.0, p)
+    return np.where(df > 0, p, np.nan)
+
+
+def top_correlated_pairs(r: np.ndarray, n: np.ndarray, columns, threshold: float = 0.8,
+                         top_k: int = 50) -> List[Dict[str, Any]]:
+    """The ``top_k`` strongest pairs with |r| > threshold, strongest first."""
+    i, j = np.triu_indices(r.shape[0], k=1)
+    strength = np.nan_to_num(np.abs(r[i, j]), nan=-1.0)
+    candidates = np.flatnonzero(strength > threshold)
+    if len(candidates) > top_k:
+        candidates = candidates[np.argpartition(-strength[candidates], top_k - 1)[:top_k]]
+    candidates = candidates[np.argsort(-strength[candidates], kind='stable')]
+    ii, jj = i[candidates], j[candidates]
+    p = correlation_pvalues(r[ii, jj], n[ii, jj])
+    return [
+        {
+            'feature1': columns[a],
+            'feature2': columns[b],
+            'correlation': float(round(r[a, b], 3)),
+            'p_value': float(pv),
+            'n': int(n[a, b]),
+        }
+        for a, b, pv in zip(ii, jj, p)
+    ]
+
+
+def grouped_anova(codes: np.ndarray, n_groups: int, X: np.ndarray) -> Dict[str, np.ndarray]:
+    """One-way ANOVA of every column of ``X`` across the groups in ``codes``.
+
+    ``codes`` are group ids from pd.factorize (-1 = missing). Per-group counts,
+    sums and sums of squares for all columns come from three bincounts, and F
+    follows from those sums. Arrays are indexed [group, column] or [column].
+    """
+    n_cols = X.shape[1]
+    present = ~np.isnan(X) & (codes >= 0)[:, None]
+    # Center each column so the sums-of-squares identity doesn't lose precision
+    with np.errstate(invalid='ignore'):
+        col_mean = np.nanmean(np.where(present, X, np.nan), axis=0)
+    centered = np.where(present, X - col_mean, 0.0)
+    flat = (np.where(codes >= 0, codes, 0)[:, None] * n_cols + np.arange(n_cols)).ravel()
+    size = n_groups * n_cols
+    counts = np.bincount(flat, weights=present.ravel(), minlength=size).reshape(n_groups, n_cols)
+    sums = np.bincount(flat, weights=centered.ravel(), minlength=size).reshape(n_groups, n_cols)
+    sumsq = np.bincount(flat, weights=(centered * centered).ravel(), minlength=size).reshape(n_groups, n_cols)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        N = counts.sum(axis=0)
+        k = (counts > 0).sum(axis=0)
+        between_terms = np.where(counts > 0, sums * sums / counts, 0.0).sum(axis=0)
+        ssb = between_terms - sums.sum(axis=0) ** 2 / N
+        ssw = sumsq.sum(axis=0) - between_terms
+        f = (ssb / (k - 1)) / (ssw / (N - k))
+        p = stats.f.sf(f, k - 1, N - k)
+        means = sums / counts + col_mean
+    return {'f': f, 'p': p, 'counts': counts, 'means': means}
@@ -0,0 +1,217 @@
+import asyncio
+import io
+import os
+import hashlib
+import logging
+from typing import Dict, Iterator, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.database import release_connection
+
+logger = logging.getLogger("analytiq")
+
+ARROW_FORMAT = "arrow"
+CSV_FORMAT = "csv"
+
+# Parsed DataFrames for this worker process, keyed by (dataset id, content digest)
+frame_cache = LRUCache(
+    max_bytes=settings.FRAME_CACHE_MAX_BYTES,
+    sizeof=lambda df: df.memory_usage(deep=True).sum(),
+)
+
+
+def _to_arrow_table(df: pd.DataFrame) -> pa.Table:
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Mixed-type object columns (common in Excel) can't be typed; store them as strings
+        df = df.copy()
+        for col in df.select_dtypes(include=["object"]).columns:
+            try:
+                pa.array(df[col], from_pandas=True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                df[col] = df[col].map(lambda v: v if pd.isna(v) else str(v))
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def frame_schema(df: pd.DataFrame) -> Dict[str, str]:
+    return {str(col): str(dtype) for col, dtype in df.dtypes.items()}
+
+
+def serialize_frame(df: pd.DataFrame) -> Tuple[bytes, Dict[str, str]]:
+    """Encode a DataFrame as an Arrow IPC file. Returns (payload, schema)."""
+    table = _to_arrow_table(df)
+    compression = settings.DATASET_IPC_COMPRESSION or None
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, table.schema, options=pa.ipc.IpcWriteOptions(compression=compression)) as writer:
+        writer.write_table(table, max_chunksize=settings.DATASET_IPC_BATCH_ROWS)
+    return sink.getvalue().to_pybytes(), frame_schema(df)
+
+
+def deserialize_frame(payload: bytes) -> pd.DataFrame:
+    # Reads straight out of the payload buffer; uncompressed numeric columns are not copied by Arrow
+    table = pa.ipc.open_file(pa.py_buffer(payload)).read_all()
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def payload_layout(payload: bytes) -> Tuple[pa.Schema, Dict[str, int], int]:
+    """Schema, per-column null counts and row count of an Arrow IPC payload, from batch metadata only."""
+    reader = pa.ipc.open_file(pa.py_buffer(payload))
+    nulls = dict.fromkeys(reader.schema.names, 0)
+    rows = 0
+    for i in range(reader.num_record_batches):
+        batch = reader.get_batch(i)
+        rows += batch.num_rows
+        for name, column in zip(batch.schema.names, batch.columns):
+            nulls[name] += column.null_count
+    return reader.schema, nulls, rows
+
+
+def iter_frame_batches(payload: bytes) -> Iterator[pd.DataFrame]:
+    """Yield an Arrow IPC payload one record batch at a time, so only one batch is ever a DataFrame."""
+    reader = pa.ipc.open_file(pa.py_buffer(payload))
+    for i in range(reader.num_record_batches):
+        yield reader.get_batch(i).to_pandas()
+
+
+def content_digest(payload: bytes) -> str:
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+def dataset_digest(dataset) -> str:
+    if dataset.content_hash:
+        return dataset.content_hash
+    # Legacy rows were stored before digests existed
+    return content_digest((dataset.file_content or "").encode("utf-8"))
+
+
+async def fetch_dataframe(db: AsyncSession, dataset) -> pd.DataFrame:
+    """Return a dataset's DataFrame, fetching and parsing its stored file only when it isn't already cached.
+
+    The cached frame is shared between requests, so callers must not modify it in place.
+    On a miss the session's transaction is committed once the file is loaded, so
+    no pooled connection is held while it is parsed.
+    """
+    if dataset.content_hash:
+        df = frame_cache.get((str(dataset.id), dataset.content_hash))
+        if df is not None:
+            return df
+    await load_content(db, dataset)
+    await release_connection(db)
+    df = await asyncio.to_thread(_read_dataset, dataset)
+    frame_cache.put((str(dataset.id), dataset_digest(dataset)), df)
+    return df
+
+
+async def load_content(db: AsyncSession, dataset) -> None:
+    """Load the deferred file_data and file_content of a Dataset row."""
+    await db.refresh(dataset, attribute_names=["file_data", "file_content"])
+
+
+def evict_dataset(dataset_id) -> None:
+    dataset_id = str(dataset_id)
+    frame_cache.discard(lambda key: key[0] == dataset_id)
+
+
+def _read_dataset(dataset) -> pd.DataFrame:
+    if dataset.file_data is not None and dataset.storage_format == ARROW_FORMAT:
+        return deserialize_frame(dataset.file_data)
+    if dataset.file_content is not None:
+        return pd.read_csv(io.StringIO(dataset.file_content))
+    raise ValueError(f"Dataset {dataset.id} has no stored content")
+
+
+class _MemoryProbe:
+    """Tracks peak resident memory above a baseline while an upload is ingested."""
+
+    def __init__(self):
+        self.baseline = self.peak = _rss_bytes()
+
+    def sample(self):
+        self.peak = max(self.peak, _rss_bytes())
+
+    @property
+    def peak_delta(self) -> int:
+        return max(self.peak - self.baseline, 0)
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _open_csv_stream(path: str):
+    read_opts = pa_csv.ReadOptions(block_size=settings.INGEST_CSV_BLOCK_BYTES)
+    reader = pa_csv.open_csv(path, read_options=read_opts)
+    # Match pd.read_csv typing: dates stay strings, all-empty columns become float NaN
+    overrides = {}
+    for field in reader.schema:
+        if pa.types.is_temporal(field.type):
+            overrides[field.name] = pa.string()
+        elif pa.types.is_null(field.type):
+            overrides[field.name] = pa.float64()
+    if not overrides:
+        return reader
+    reader.close()
+    return pa_csv.open_csv(path, read_options=read_opts, convert_options=pa_csv.ConvertOptions(column_types=overrides))
+
+
+def _stream_csv_to_ipc(path: str, probe: _MemoryProbe) -> Tuple[pa.Buffer, pa.Schema, int]:
+    reader = _open_csv_stream(path)
+    compression = settings.DATASET_IPC_COMPRESSION or None
+    sink = pa.BufferOutputStream()
+    rows = 0
+    with pa.ipc.new_file(sink, reader.schema, options=pa.ipc.IpcWriteOptions(compression=compression)) as writer:
+        for batch in reader:
+            writer.write_batch(batch)
+            rows += batch.num_rows
+            probe.sample()
+    return sink.getvalue(), reader.schema, rows
+
+
+def ingest_file(path: str, file_ext: str) -> dict:
+    """Encode an uploaded CSV/Excel file on disk for storage.
+
+    CSVs are streamed batch by batch from disk straight into the Arrow IPC
+    payload, so the upload never exists as bytes, str and DataFrame at once.
+    Files whose column types change after the first block fall back to
+    pd.read_csv, as do Excel workbooks.
+    """
+    probe = _MemoryProbe()
+    payload = None
+    if file_ext == ".csv":
+        try:
+            buf, arrow_schema, rows = _stream_csv_to_ipc(path, probe)
+            payload = buf.to_pybytes()
+            del buf
+            columns = arrow_schema.names
+            schema = frame_schema(arrow_schema.empty_table().to_pandas())
+        except pa.ArrowInvalid as e:
+            logger.info(f"Streaming CSV ingest fell back to pandas: {e}")
+    if payload is None:
+        df = pd.read_csv(path) if file_ext == ".csv" else pd.read_excel(path)
+        df.columns = [str(c) for c in df.columns]
+        probe.sample()
+        payload, schema = serialize_frame(df)
+        rows, columns = len(df), list(df.columns)
+        del df
+    probe.sample()
+    return {
+        "payload": payload,
+        "digest": content_digest(payload),
+        "schema": schema,
+        "rows": rows,
+        "cols": len(columns),
+        "columns": columns,
+        "peak_memory_bytes": probe.peak_delta,
+    }
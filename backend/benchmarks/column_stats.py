@@ -0,0 +1,71 @@
+"""Compare the fused column-statistics engine with the per-column pandas calls it replaced.
+
+Run from backend/:  python -m benchmarks.column_stats [rows] [numeric_cols] [categorical_cols]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from app.stats import column_stats
+
+
+def legacy_column_stats(df: pd.DataFrame):
+    """The statistics generate_eda used to compute, one pandas call per column and statistic."""
+    df.duplicated().sum()
+    df.duplicated().sum()
+    df.isnull().sum()
+    {col: df[col].isnull().sum() for col in df.columns}
+    df.isnull().sum().sum()
+    numeric_df = df.select_dtypes(include=['number'])
+    numeric_df.describe()
+    numeric_df.skew()
+    numeric_df.kurtosis()
+    {col: (numeric_df[col] == 0).sum() for col in numeric_df.columns}
+    for col in numeric_df.columns:
+        numeric_df[col].quantile(0.25)
+        numeric_df[col].quantile(0.75)
+    for col in df.select_dtypes(include=['object', 'category']).columns:
+        df[col].value_counts().head(10)
+        df[col].nunique()
+        df[col].mode().iloc[0] if not df[col].mode().empty else None
+        stats.entropy(df[col].value_counts(normalize=True))
+    {col: df[col].nunique() for col in df.columns if df[col].nunique() > 50 and df[col].nunique() < len(df) / 2}
+
+
+def make_frame(rows: int, numeric: int, categorical: int) -> pd.DataFrame:
+    rng = np.random.default_rng(42)
+    data = {f"num_{i}": rng.normal(size=rows) for i in range(numeric)}
+    for i in range(categorical):
+        data[f"cat_{i}"] = rng.choice([f"level_{k}" for k in range(8 + i % 30)], size=rows)
+    df = pd.DataFrame(data)
+    df.iloc[::13, ::3] = np.nan
+    return df
+
+
+def best_of(fn, df, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(df)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    numeric = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    categorical = int(sys.argv[3]) if len(sys.argv) > 3 else 40
+    df = make_frame(rows, numeric, categorical)
+    print(f"frame: {rows} rows x {numeric} numeric + {categorical} categorical columns")
+    legacy = best_of(legacy_column_stats, df)
+    fused = best_of(column_stats, df)
+    print(f"per-column pandas calls: {legacy:8.3f}s")
+    print(f"fused column_stats:      {fused:8.3f}s")
+    print(f"speedup:                 {legacy / fused:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
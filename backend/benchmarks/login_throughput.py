@@ -0,0 +1,101 @@
+"""Login throughput under concurrency, with bcrypt on the event loop (as login used to run it) and on the hashing threads.
+
+Run from backend/:  python -m benchmarks.login_throughput [logins] [concurrency] [users]
+
+Uses a throwaway SQLite database. While the logins run, a probe requests
+GET /health every 10ms; its latency is how long other requests wait behind them.
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# Configure before the app reads its settings: a scratch database and no rate limit on logins
+_db_path = os.path.join(tempfile.mkdtemp(), "login_bench.db")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_db_path}"
+os.environ["RATE_LIMIT_AUTH"] = "1000000/minute"
+os.environ.setdefault("COMPUTE_WORKERS", "0")
+
+import httpx  # noqa: E402
+
+from app.api import auth as auth_api  # noqa: E402
+from app.core.auth import pwd_context, verify_password  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.core.database import init_db, dispose_db  # noqa: E402
+from app.main import app  # noqa: E402
+
+PASSWORD = "Benchmark123"
+
+
+async def inline_verify_password(plain: str, hashed: str):
+    """verify_password as it was: bcrypt called directly in the request coroutine."""
+    return pwd_context.verify_and_update(plain, hashed)
+
+
+def percentile(values, q):
+    return statistics.quantiles(values, n=100)[q - 1] * 1000 if len(values) > 1 else float("nan")
+
+
+async def run(client: httpx.AsyncClient, logins: int, concurrency: int, users: int) -> dict:
+    gate = asyncio.Semaphore(concurrency)
+    login_times, probe_times, failures = [], [], []
+    done = asyncio.Event()
+
+    async def login(i: int):
+        async with gate:
+            start = time.perf_counter()
+            r = await client.post("/api/v1/auth/login", json={"email": f"user{i % users}@example.com", "password": PASSWORD})
+            if r.status_code != 200:
+                # e.g. SQLite giving up on a write lock whose holder can't get the event loop back to commit
+                failures.append(r.status_code)
+                return
+            login_times.append(time.perf_counter() - start)
+
+    async def probe():
+        while not done.is_set():
+            start = time.perf_counter()
+            await client.get("/api/v1/health")
+            probe_times.append(time.perf_counter() - start)
+            await asyncio.sleep(0.01)
+
+    prober = asyncio.create_task(probe())
+    start = time.perf_counter()
+    await asyncio.gather(*(login(i) for i in range(logins)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await prober
+    return {
+        "logins_per_s": len(login_times) / elapsed,
+        "failed": len(failures),
+        "login_p50": percentile(login_times, 50),
+        "login_p99": percentile(login_times, 99),
+        "probe_p50": percentile(probe_times, 50),
+        "probe_p99": percentile(probe_times, 99),
+    }
+
+
+async def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    users = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    await init_db()
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        for i in range(users):
+            r = await client.post("/api/v1/auth/signup", json={"name": "Bench User", "email": f"user{i}@example.com", "password": PASSWORD})
+            r.raise_for_status()
+        print(f"{logins} logins, {concurrency} concurrent, {users} users, bcrypt rounds {settings.BCRYPT_ROUNDS}, "
+              f"{settings.PASSWORD_HASH_THREADS} hashing threads")
+        print(f"{'':22}{'logins/s':>10}{'failed':>8}{'login p50':>11}{'login p99':>11}{'probe p50':>11}{'probe p99':>11}  (ms)")
+        for label, verify in (("bcrypt on event loop", inline_verify_password), ("bcrypt on threads", verify_password)):
+            auth_api.verify_password = verify
+            res = await run(client, logins, concurrency, users)
+            print(f"{label:22}{res['logins_per_s']:10.1f}{res['failed']:8d}{res['login_p50']:11.1f}{res['login_p99']:11.1f}"
+                  f"{res['probe_p50']:11.1f}{res['probe_p99']:11.1f}")
+    await dispose_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
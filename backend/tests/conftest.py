@@ -0,0 +1,8 @@
+import os
+import tempfile
+
+# Settings are read when app.core.config is imported: point the app at a scratch SQLite database first
+_scratch = tempfile.mkdtemp(prefix="analytiq-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{os.path.join(_scratch, 'test.db')}")
+os.environ.setdefault("FEATURE_CACHE_DIR", os.path.join(_scratch, "features"))
+os.environ.setdefault("COMPUTE_WORKERS", "0")
@@ -0,0 +1,51 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import ml
+from app.core.config import settings
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    path = str(tmp_path / "features")
+    monkeypatch.setattr(settings, "FEATURE_CACHE_DIR", path)
+    return path
+
+
+def _frame():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"x": rng.normal(size=200), "cat": rng.choice(["a", "b", ""], 200)})
+    df.loc[::7, "x"] = np.nan
+    return df
+
+
+def test_cached_matrix_matches_a_fresh_encode(cache_dir):
+    df = _frame()
+    matrix, columns, encoders, status = ml._feature_matrix(df, "digest")
+    assert status == "miss"
+    assert os.stat(cache_dir).st_mode & 0o777 == 0o700
+    cached, cached_columns, cached_encoders, status = ml._feature_matrix(df, "digest")
+    assert status == "hit"
+    assert cached_columns == columns
+    np.testing.assert_array_equal(cached, matrix)
+    assert list(cached_encoders["cat"].transform(["b", ""])) == list(encoders["cat"].transform(["b", ""]))
+    assert not [name for name in os.listdir(cache_dir) if not name.endswith((".npy", ".json"))]
+
+
+def test_directory_others_can_write_is_not_used(cache_dir):
+    os.makedirs(cache_dir)
+    os.chmod(cache_dir, 0o777)
+    *_, status = ml._feature_matrix(_frame(), "digest")
+    assert status is None
+    assert os.listdir(cache_dir) == []
+
+
+@pytest.mark.skipif(not hasattr(os, "getuid") or os.getuid() != 0, reason="needs root to chown")
+def test_directory_owned_by_another_user_is_not_used(cache_dir):
+    os.makedirs(cache_dir, mode=0o700)
+    os.chown(cache_dir, 65534, 65534)
+    *_, status = ml._feature_matrix(_frame(), "digest")
+    assert status is None
@@ -0,0 +1,47 @@
+import asyncio
+
+import pandas as pd
+
+from app.core.cache import LRUCache
+from app.inference import InferenceServer
+
+
+class DoublingPipeline:
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.calls = 0
+
+    def predict(self, frame: pd.DataFrame) -> pd.DataFrame:
+        self.calls += 1
+        if self.fail_on is not None and (frame["x"] == self.fail_on).any():
+            raise ValueError("bad row")
+        return pd.DataFrame({"prediction": frame["x"] * 2})
+
+
+def _server() -> InferenceServer:
+    return InferenceServer(cache=LRUCache(max_bytes=1, sizeof=lambda _: 1), window=0.05, max_batch_rows=1024)
+
+
+async def _batch_with_cancelled_first(pipeline):
+    """Three requests coalesced into one batch; the first is cancelled (its client went away) before it runs."""
+    server = _server()
+    requests = [asyncio.ensure_future(server.predict("p", pipeline, pd.DataFrame({"x": [x]}))) for x in (1, 2, 3)]
+    await asyncio.sleep(0)
+    requests[0].cancel()
+    return await asyncio.wait_for(asyncio.gather(*requests[1:], return_exceptions=True), timeout=5)
+
+
+def test_cancelled_request_does_not_stall_its_batch():
+    pipeline = DoublingPipeline()
+    second, third = asyncio.run(_batch_with_cancelled_first(pipeline))
+    assert second["prediction"].tolist() == [4]
+    assert third["prediction"].tolist() == [6]
+    assert pipeline.calls == 1
+
+
+def test_cancelled_request_does_not_stall_the_one_by_one_fallback():
+    # Row 3 fails the batched call, so the batch falls back to scoring each request alone
+    pipeline = DoublingPipeline(fail_on=3)
+    second, third = asyncio.run(_batch_with_cancelled_first(pipeline))
+    assert second["prediction"].tolist() == [4]
+    assert isinstance(third, ValueError)
@@ -0,0 +1,122 @@
+"""List endpoints must not fetch the heavy columns (stored files, EDA, plots, model results).
+
+Every statement a listing runs is captured and replayed on a plain sqlite3
+connection, to count the bytes its result set carries.
+"""
+import asyncio
+import re
+import sqlite3
+
+import pytest
+from fastapi import Response
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from app.api.analyses import list_analyses
+from app.api.datasets import list_datasets
+from app.api.predictions import list_predictions
+from app.core.auth import Principal
+from app.core.database import async_session, dispose_db, engine, init_db
+from app.core.pagination import Page
+from app.models.dataset import Analysis, AnalysisResult, Dataset, ModelArtifact, Prediction
+from app.models.user import User
+
+BLOB = 256 * 1024  # size of each heavy column in the fixture rows
+ROWS = 3
+HEAVY_COLUMNS = re.compile(r"\b(file_data|file_content|payload|eda|plots|results)\b")
+
+
+def _seed_rows(db, user):
+    big = "x" * BLOB
+    for i in range(ROWS):
+        dataset = Dataset(owner_id=user.id, filename=f"d{i}.csv", rows=10, cols=2, columns=["a", "b"],
+                          file_data=big.encode(), file_content=big, storage_format="arrow")
+        db.add(dataset)
+        result = AnalysisResult(dataset=dataset, cache_key=f"k{i}", eda={"blob": big}, plots=[{"blob": big}])
+        db.add(result)
+        db.add(Analysis(owner_id=user.id, dataset=dataset, prompt="trends?", result=result,
+                        eda={"blob": big}, plots=[{"blob": big}], insights={}))
+        prediction = Prediction(owner_id=user.id, dataset=dataset, target_column="b", task="regression",
+                                results={"best_model": "Ridge", "best_score": 0.9, "blob": big})
+        db.add(prediction)
+        db.add(ModelArtifact(prediction=prediction, payload=big.encode(), size_bytes=BLOB))
+
+
+def _value_bytes(value) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    return 8
+
+
+def _replay(statements):
+    """Bytes in the result sets of ``statements``, and the columns each one selected."""
+    connection = sqlite3.connect(make_url(str(engine.url)).database)
+    try:
+        total, selected = 0, []
+        for sql, params in statements:
+            cursor = connection.execute(sql, params)
+            selected.append(re.split(r"\sFROM\s", sql, maxsplit=1, flags=re.IGNORECASE)[0])
+            total += sum(_value_bytes(v) for row in cursor.fetchall() for v in row)
+        return total, selected
+    finally:
+        connection.close()
+
+
+async def _list_and_capture():
+    await init_db()
+    async with async_session() as db:
+        user = User(email="lists@example.com", name="Lists", hashed_password="x")
+        db.add(user)
+        await db.flush()
+        _seed_rows(db, user)
+        await db.commit()
+        principal = Principal(user)
+
+    captured = {}
+    for name, endpoint in (("datasets", list_datasets), ("analyses", list_analyses), ("predictions", list_predictions)):
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+
+        event.listen(engine.sync_engine, "before_cursor_execute", capture)
+        try:
+            async with async_session() as db:
+                rows = await endpoint(Response(), Page(cursor=None, limit=50), user=principal, db=db)
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", capture)
+        assert len(rows) == ROWS
+        captured[name] = (rows, statements)
+    await dispose_db()
+    return captured
+
+
+@pytest.fixture(scope="module")
+def listings():
+    return asyncio.run(_list_and_capture())
+
+
+@pytest.mark.parametrize("name", ["datasets", "analyses", "predictions"])
+def test_list_selects_no_heavy_columns(listings, name):
+    _, statements = listings[name]
+    _, selected = _replay(statements)
+    for columns in selected:
+        # predictions extract two small fields from results in SQL; the column itself is never returned
+        columns = re.sub(r"JSON_EXTRACT\([^)]*\)", "", columns, flags=re.IGNORECASE)
+        assert not HEAVY_COLUMNS.search(columns), columns
+
+
+@pytest.mark.parametrize("name", ["datasets", "analyses", "predictions"])
+def test_list_fetches_a_couple_hundred_bytes_per_row(listings, name):
+    _, statements = listings[name]
+    fetched, _ = _replay(statements)
+    # Each fixture row carries several 256KB blobs; a listing row is ids, names and timestamps
+    assert fetched <= 200 * ROWS, fetched
+
+
+def test_predictions_list_still_shows_best_model(listings):
+    rows, _ = listings["predictions"]
+    assert {(r["best_model"], r["best_score"]) for r in rows} == {("Ridge", 0.9)}
+
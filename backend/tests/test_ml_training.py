@@ -0,0 +1,110 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.base import BaseEstimator
+
+from app import ml
+
+
+class SleepyModel(BaseEstimator):
+    """Fits by sleeping; counts predictions so tests can see what was scored."""
+
+    def __init__(self, delay=0.0, n_estimators=1, n_jobs=None, warm_start=False):
+        self.delay = delay
+        self.n_estimators = n_estimators
+        self.n_jobs = n_jobs
+        self.warm_start = warm_start
+        self.predictions = 0
+
+    def fit(self, X, y):
+        time.sleep(self.delay)
+        return self
+
+    def predict(self, X):
+        self.predictions += 1
+        return np.zeros(len(X))
+
+
+def _data():
+    X = pd.DataFrame({"x": np.arange(20.0)})
+    return {False: (X, X), True: (X.to_numpy(), X.to_numpy())}, pd.Series(np.arange(20.0))
+
+
+def _training_threads():
+    return [t for t in threading.enumerate() if t.name.startswith("ml-train")]
+
+
+def test_models_past_the_deadline_are_skipped_and_joined():
+    data, y = _data()
+    models = {"fast": SleepyModel(), "slow": SleepyModel(delay=0.3)}
+    trained = ml._train_models(models, data, y, budget=0.05, threads=2)
+    assert trained["fast"][0] == "ok"
+    assert trained["slow"] == ("skipped", None)
+    assert not _training_threads()
+
+
+def test_ensemble_stopped_part_grown_is_not_reported(monkeypatch):
+    monkeypatch.setitem(ml._GROWABLE, SleepyModel, ("n_estimators", 1))
+    data, y = _data()
+    model = SleepyModel(delay=0.05, n_estimators=100)
+    trained = ml._train_models({"forest": model}, data, y, budget=0.12, threads=1)
+    assert trained["forest"] == ("skipped", None)
+    assert model.predictions == 0
+
+
+@pytest.mark.parametrize("threads, expected", [(4, 2), (1, 1)])
+def test_model_threads_are_capped_to_the_pool(threads, expected):
+    data, y = _data()
+    models = {"a": SleepyModel(n_jobs=-1), "b": SleepyModel(n_jobs=-1)}
+    ml._train_models(models, data, y, budget=5, threads=threads)
+    assert [m.n_jobs for m in models.values()] == [expected, expected]
+
+
+def _regression_frame(rows=2000):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(rows, 4))
+    df = pd.DataFrame(X, columns=["a", "b", "c", "d"])
+    df["y"] = X @ np.array([1.0, -2.0, 0.5, 0.0]) + rng.normal(size=rows) * 0.1
+    return df
+
+
+@pytest.fixture
+def halving(monkeypatch):
+    monkeypatch.setattr(ml.settings, "ML_SELECTION", "halving")
+    monkeypatch.setattr(ml.settings, "ML_HALVING_MIN_ROWS", 200)
+    monkeypatch.setattr(ml.settings, "ML_HALVING_FACTOR", 3)
+    monkeypatch.setattr(ml.settings, "ML_TIME_BUDGET", 60.0)
+
+
+def _skipping(monkeypatch, should_skip):
+    """Make _train_models report the models should_skip(name, rows) picks as still training at the deadline."""
+    real = ml._train_models
+
+    def train(models, data, y_train, budget, threads):
+        trained = real(models, data, y_train, budget, threads)
+        return {n: ("skipped", None) if should_skip(n, len(y_train)) else r for n, r in trained.items()}
+    monkeypatch.setattr(ml, "_train_models", train)
+
+
+def test_rung_cut_short_by_the_deadline_eliminates_nobody(halving, monkeypatch):
+    _skipping(monkeypatch, lambda name, rows: name == "Random Forest" and rows == 200)
+    result = ml.run_prediction(_regression_frame(), "y")
+    rung = result["training"]["rungs"][-1]
+    assert rung["cut_short"]
+    assert rung["kept"] == rung["candidates"]
+    assert not any(r.get("eliminated") for r in result["models"].values())
+    assert "error" not in result
+
+
+def test_final_fit_out_of_time_falls_back_to_the_best_screened_model(halving, monkeypatch):
+    # Every model finishes its screening rungs, none finishes on the full training set (1600 rows)
+    _skipping(monkeypatch, lambda name, rows: rows == 1600)
+    result = ml.run_prediction(_regression_frame(), "y")
+    assert "error" not in result
+    best = result["models"][result["best_model"]]
+    assert best["fallback"] and best["screened_rows"] < 1600
+    assert result["best_score"] > 0.9
+    assert ml.ScoringPipeline.loads(result["artifact"]).predict(_regression_frame(5)).shape[0] == 5
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+
+from app.ml import ScoringPipeline, run_prediction
+from app.scoring import open_scoring_csv
+from app.storage import deserialize_frame, ingest_file
+
+
+def _training_csv(path, rows=400):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "amount": rng.normal(size=rows),
+        "region": rng.choice(["north", "south", "NA", "null", ""], rows),
+        "tier": rng.choice(["a", "b", ""], rows),
+    })
+    df.loc[::13, "amount"] = np.nan
+    df["target"] = ((df["amount"].fillna(0) > 0) ^ (df["region"] == "")).astype(int)
+    df.to_csv(path, index=False)
+
+
+def test_scoring_the_training_csv_matches_the_stored_frame(tmp_path):
+    path = str(tmp_path / "train.csv")
+    _training_csv(path)
+    stored = deserialize_frame(ingest_file(path, ".csv")["payload"])
+    result = run_prediction(stored, "target")
+    pipeline = ScoringPipeline.loads(result["artifact"])
+
+    reader = open_scoring_csv(pipeline, path, batch_rows=64)
+    scored = pd.concat(list(reader), ignore_index=True)
+    reader.close()
+
+    # Blank cells and "NA"/"null" are labels in training, so they must not score as unseen (-1)
+    features = pipeline.transform(scored)
+    assert (features[list(pipeline.categories)] >= 0).all().all()
+    pd.testing.assert_frame_equal(features, pipeline.transform(stored))
+    pd.testing.assert_frame_equal(pipeline.predict(scored), pipeline.predict(stored))
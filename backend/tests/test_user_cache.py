@@ -0,0 +1,57 @@
+import asyncio
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from fastapi.security import HTTPAuthorizationCredentials
+
+from app.core.auth import create_access_token, get_current_user, invalidate_user, user_cache
+
+USER_ID = uuid.uuid4()
+
+
+def _row(name: str):
+    return SimpleNamespace(id=USER_ID, email="u@example.com", name=name, company="", plan="free",
+                           is_active=True, created_at=datetime.now(timezone.utc))
+
+
+class _Result:
+    def __init__(self, row):
+        self.row = row
+
+    def scalar_one_or_none(self):
+        return self.row
+
+
+class StaleReadSession:
+    """Hands back the row as it was when the read began, while an update commits and invalidates it meanwhile."""
+
+    def __init__(self, row):
+        self.row = row
+
+    async def execute(self, query):
+        invalidate_user(self.row.id)
+        return _Result(self.row)
+
+
+class FreshSession:
+    def __init__(self, row):
+        self.row = row
+
+    async def execute(self, query):
+        return _Result(self.row)
+
+
+def _authenticate(db):
+    token = create_access_token({"sub": str(USER_ID)})
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    return asyncio.run(get_current_user(credentials, db))
+
+
+def test_read_overtaken_by_an_invalidation_is_not_cached():
+    invalidate_user(USER_ID)
+    assert _authenticate(StaleReadSession(_row("Old name"))).name == "Old name"
+    assert user_cache.get(str(USER_ID)) is None
+
+    assert _authenticate(FreshSession(_row("New name"))).name == "New name"
+    assert user_cache.get(str(USER_ID)).name == "New name"
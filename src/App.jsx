@@ -21,6 +21,7 @@ import Footer from './components/Footer';
 import SplashScreen from './components/SplashScreen';
 import './styles.css';
 import api from './utils/api';
+import { waitForJob } from './utils/jobs';
 
 function ProtectedRoute({ children }) {
   const { user, loading } = useAuth();
@@ -36,6 +37,7 @@ function Dashboard() {
   const [analysisResult, setAnalysisResult] = useState(null);
   const [uploadResponse, setUploadResponse] = useState(null);
   const [loading, setLoading] = useState(false);
+  const [job, setJob] = useState(null);
   const [error, setError] = useState(null);
 
   const step = !datasetId ? 0 : !analysisResult ? 1 : 2;
@@ -53,9 +55,9 @@ function Dashboard() {
   const handleAnalyze = async () => {
     if (!prompt.trim()) { setError('Enter a prompt'); return; }
     setLoading(true); setError(null);
-    try { const r = await api.post('/analyses/', { dataset_id: datasetId, prompt }); setAnalysisResult(r.data); }
+    try { const r = await api.post('/analyses/', { dataset_id: datasetId, prompt }); setJob(r.data); setAnalysisResult(await waitForJob(r.data, { onProgress: setJob })); }
     catch (e) { setError(e.safeMessage || 'Analysis failed'); }
-    finally { setLoading(false); }
+    finally { setLoading(false); setJob(null); }
   };
   const resetAll = () => { setFile(null); setDatasetId(null); setPrompt(''); setAnalysisResult(null); setUploadResponse(null); setError(null); };
 
@@ -106,6 +108,11 @@ function Dashboard() {
               </Box>
             </Box>
             <PromptBox prompt={prompt} onPromptChange={setPrompt} onAnalyze={handleAnalyze} loading={loading} columns={uploadResponse?.columns || []} datasetId={datasetId} />
+            {loading && job && (
+              <Typography sx={{ color: '#6b7280', fontSize: '.78rem', fontWeight: 300, mt: 1.5 }}>
+                {job.status === 'queued' ? 'Queued…' : `${job.stage || 'Running'} · ${Math.round((job.progress || 0) * 100)}%`}
+              </Typography>
+            )}
           </>
         )}
 
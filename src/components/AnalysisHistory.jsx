@@ -8,8 +8,17 @@ const AnalysisHistory = () => {
   const [analyses, setAnalyses] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
+  const [cursor, setCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
-  useEffect(() => { api.get('/analyses/').then(r => setAnalyses(r.data)).catch(e => setError(e.safeMessage || 'Failed to load')).finally(() => setLoading(false)); }, []);
+  // Pages come newest first; X-Next-Cursor is set while older analyses remain
+  const loadPage = (after) => api.get('/analyses/', { params: after ? { cursor: after } : {} }).then(r => {
+    setAnalyses(prev => after ? [...prev, ...r.data] : r.data);
+    setCursor(r.headers['x-next-cursor'] || null);
+  }).catch(e => setError(e.safeMessage || 'Failed to load'));
+
+  useEffect(() => { loadPage(null).finally(() => setLoading(false)); }, []);
+  const loadMore = () => { setLoadingMore(true); loadPage(cursor).finally(() => setLoadingMore(false)); };
 
   if (loading) return <Box sx={{ display: 'flex', justifyContent: 'center', mt: 8 }}><CircularProgress sx={{ color: '#E50914' }} /></Box>;
 
@@ -19,7 +28,7 @@ const AnalysisHistory = () => {
         <Box sx={{ display: 'flex', justifyContent: 'space-between', alignItems: 'center', mb: 4, flexWrap: 'wrap', gap: 2 }}>
           <Box>
             <Typography sx={{ fontWeight: 500, fontSize: '1.3rem', mb: .25 }}>History</Typography>
-            <Typography sx={{ color: '#6b7280', fontSize: '.85rem', fontWeight: 300 }}>{analyses.length} analyses</Typography>
+            <Typography sx={{ color: '#6b7280', fontSize: '.85rem', fontWeight: 300 }}>{analyses.length}{cursor ? '+' : ''} analyses</Typography>
           </Box>
           <Button component={Link} to="/dashboard" endIcon={<ArrowForward sx={{ fontSize: 16 }} />} sx={{ background: '#E50914', color: '#fff', borderRadius: '10px', '&:hover': { background: '#ff1a25' } }}>New Analysis</Button>
         </Box>
@@ -48,6 +57,13 @@ const AnalysisHistory = () => {
             ))}
           </Grid>
         )}
+        {cursor && (
+          <Box sx={{ display: 'flex', justifyContent: 'center', mt: 3 }}>
+            <Button onClick={loadMore} disabled={loadingMore} sx={{ color: '#9ca3af', border: '1px solid rgba(255,255,255,.08)', borderRadius: '10px' }}>
+              {loadingMore ? <CircularProgress size={16} sx={{ color: '#E50914' }} /> : 'Load more'}
+            </Button>
+          </Box>
+        )}
       </Container>
     </Box>
   );
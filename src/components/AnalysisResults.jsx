@@ -1,6 +1,7 @@
 import React, { useState } from 'react';
 import { Card, CardContent, Typography, Grid, Table, TableBody, TableCell, TableRow, TableHead, Paper, Chip, Divider, Stack, Box, Tabs, Tab, Tooltip, IconButton } from '@mui/material';
 import { Assessment, TableChart, BarChart, BubbleChart, Category, Science, AutoAwesome, Lightbulb, TrendingUp, DataObject, WarningAmber, CheckCircle, ContentCopy } from '@mui/icons-material';
+import PlotlyChart, { PLOTLY_MIME } from './PlotlyChart';
 
 /* ── Helpers ── */
 const fmt = v => (typeof v === 'number' ? (Number.isInteger(v) ? v.toLocaleString() : v.toFixed(3)) : v ?? '—');
@@ -42,6 +43,7 @@ const AnalysisResults = ({ analysisResult, datasetId }) => {
   if (!analysisResult) return null;
   const { eda, plots, insights, llm } = analysisResult;
   const info = eda?.dataset_info;
+  const dupAccuracy = eda?.statistics_accuracy?.statistics?.duplicate_rows;
 
   /* ── Tab panels ── */
   const hasAI = llm?.executive_summary || llm?.key_findings;
@@ -85,7 +87,7 @@ const AnalysisResults = ({ analysisResult, datasetId }) => {
             <Grid container spacing={2} sx={{ mb: 3 }}>
               <Grid item xs={6} sm={3}><MetricCard label="Rows" value={info.rows?.toLocaleString()} /></Grid>
               <Grid item xs={6} sm={3}><MetricCard label="Columns" value={info.columns} color="#a855f7" /></Grid>
-              <Grid item xs={6} sm={3}><MetricCard label="Duplicates" value={`${info.duplicate_percentage}%`} sub={`${info.duplicate_rows} rows`} color={info.duplicate_percentage > 5 ? '#f59e0b' : '#16a34a'} /></Grid>
+              <Grid item xs={6} sm={3}><MetricCard label="Duplicates" value={`${info.duplicate_percentage}%`} sub={dupAccuracy?.kind === 'approximate' ? `≈${info.duplicate_rows} rows (±${dupAccuracy.error_bound})` : `${info.duplicate_rows} rows`} color={info.duplicate_percentage > 5 ? '#f59e0b' : '#16a34a'} /></Grid>
               <Grid item xs={6} sm={3}><MetricCard label="Memory" value={`${(info.total_memory_bytes / 1024 / 1024).toFixed(1)} MB`} color="#64748b" /></Grid>
             </Grid>
           )}
@@ -328,18 +330,14 @@ const AnalysisResults = ({ analysisResult, datasetId }) => {
       {tabs[tab]?.label === 'Visualizations' && (
         <Grid container spacing={2.5}>
           {plots.map((p, i) => (
-            <Grid item xs={12} md={6} key={i}>
+            <Grid item xs={12} md={6} key={p.name || i}>
               <Card sx={{ border: '1px solid #f1f5f9', overflow: 'hidden' }}>
                 <Box sx={{ px: 2, py: 1.5, borderBottom: '1px solid #f1f5f9', display: 'flex', alignItems: 'center', justifyContent: 'space-between' }}>
                   <Typography variant="caption" sx={{ fontWeight: 700, color: '#64748b', textTransform: 'capitalize' }}>{p.name.replace(/_/g, ' ')}</Typography>
-                  <Chip label={p.mime === 'text/html' ? 'Interactive' : 'Static'} size="small" sx={{ fontSize: '.65rem', height: 20, fontWeight: 600 }} />
+                  <Chip label={!p.mime || p.mime === PLOTLY_MIME || p.mime === 'text/html' ? 'Interactive' : 'Static'} size="small" sx={{ fontSize: '.65rem', height: 20, fontWeight: 600 }} />
                 </Box>
                 <Box sx={{ p: 1 }}>
-                  {p.mime === 'text/html' ? (
-                    <iframe srcDoc={atob(p.b64)} title={p.name} style={{ width: '100%', height: 420, border: 'none', borderRadius: 8 }} sandbox="allow-scripts allow-same-origin" />
-                  ) : (
-                    <img src={`data:${p.mime};base64,${p.b64}`} alt={p.name} style={{ width: '100%', borderRadius: 8, display: 'block' }} />
-                  )}
+                  <PlotlyChart plot={p} analysisId={analysisResult.id} />
                 </Box>
               </Card>
             </Grid>
@@ -0,0 +1,103 @@
+import React, { useEffect, useMemo, useRef, useState } from 'react';
+import { Box, CircularProgress, Typography } from '@mui/material';
+import api from '../utils/api';
+
+export const PLOTLY_MIME = 'application/vnd.plotly.v1+json';
+// Typed-array ({ dtype, bdata }) plot specs need plotly.js >= 2.28
+const PLOTLY_JS = 'https://cdn.plot.ly/plotly-2.35.2.min.js';
+
+// Templates are the same for every plot, so each is fetched once per page load
+const templates = {};
+const loadTemplate = (name) => {
+  if (!name) return Promise.resolve(null);
+  if (!templates[name]) {
+    templates[name] = api.get(`/analyses/plot-templates/${encodeURIComponent(name)}`)
+      .then(res => res.data)
+      .catch(() => { delete templates[name]; return null; });
+  }
+  return templates[name];
+};
+
+// JSON inside a <script> tag must not be able to close it
+const scriptJson = (value) => JSON.stringify(value).replace(/</g, '\\u003c');
+
+const plotDocument = (spec, template) => `<!DOCTYPE html><html><head><meta charset="utf-8">
+<script src="${PLOTLY_JS}"></script>
+<style>html,body,#plot{margin:0;width:100%;height:100%}</style></head>
+<body><div id="plot"></div><script>
+const spec = ${scriptJson(spec)};
+const template = ${scriptJson(template)};
+const layout = Object.assign({}, spec.layout, template ? { template } : {}, { autosize: true });
+Plotly.newPlot('plot', spec.data, layout, { responsive: true, displaylogo: false });
+</script></body></html>`;
+
+const frameStyle = { width: '100%', height: 420, border: 'none', borderRadius: 8 };
+const placeholderSx = { height: 420, display: 'flex', alignItems: 'center', justifyContent: 'center' };
+
+const hasBody = (plot) => 'spec' in plot || 'b64' in plot;
+
+// Manifest entries carry no body: fetch (and so render) the plot once it scrolls into view
+const useLazyPlot = (entry, analysisId) => {
+  const ref = useRef(null);
+  const [plot, setPlot] = useState(hasBody(entry) ? entry : null);
+  const [error, setError] = useState(null);
+
+  useEffect(() => {
+    if (hasBody(entry)) { setPlot(entry); return undefined; }
+    setPlot(null);
+    let active = true;
+    const load = () => api.get(`/analyses/${analysisId}/plots/${encodeURIComponent(entry.name)}`)
+      .then(res => { if (active) setPlot(res.data); })
+      .catch(err => { if (active) setError(err.safeMessage || 'Could not load plot'); });
+    if (typeof IntersectionObserver === 'undefined' || !ref.current) { load(); return () => { active = false; }; }
+    const observer = new IntersectionObserver((entries) => {
+      if (entries.some(e => e.isIntersecting)) { observer.disconnect(); load(); }
+    }, { rootMargin: '200px' });
+    observer.observe(ref.current);
+    return () => { active = false; observer.disconnect(); };
+  }, [entry, analysisId]);
+
+  return { ref, plot, error };
+};
+
+const PlotlyChart = ({ plot: entry, analysisId }) => {
+  const { ref, plot, error } = useLazyPlot(entry, analysisId);
+  if (!plot) {
+    return (
+      <Box ref={ref} sx={placeholderSx}>
+        {error ? <Typography variant="caption" color="error">{error}</Typography> : <CircularProgress size={24} />}
+      </Box>
+    );
+  }
+  return <PlotBody plot={plot} />;
+};
+
+const PlotBody = ({ plot }) => {
+  const [template, setTemplate] = useState(undefined);
+
+  useEffect(() => {
+    let active = true;
+    if (plot.mime === PLOTLY_MIME) {
+      loadTemplate(plot.template).then(t => { if (active) setTemplate(t); });
+    }
+    return () => { active = false; };
+  }, [plot.mime, plot.template]);
+
+  const srcDoc = useMemo(
+    () => (plot.mime === PLOTLY_MIME && template !== undefined ? plotDocument(plot.spec, template) : null),
+    [plot, template]
+  );
+
+  if (plot.mime === PLOTLY_MIME) {
+    if (!srcDoc) {
+      return <Box sx={placeholderSx}><CircularProgress size={24} /></Box>;
+    }
+    return <iframe srcDoc={srcDoc} title={plot.name} style={frameStyle} sandbox="allow-scripts" />;
+  }
+  if (plot.mime === 'text/html') {
+    return <iframe srcDoc={atob(plot.b64)} title={plot.name} style={frameStyle} sandbox="allow-scripts allow-same-origin" />;
+  }
+  return <img src={`data:${plot.mime};base64,${plot.b64}`} alt={plot.name} style={{ width: '100%', borderRadius: 8, display: 'block' }} />;
+};
+
+export default PlotlyChart;
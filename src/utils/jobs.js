@@ -0,0 +1,23 @@
+import api from './api';
+
+const FINISHED = ['succeeded', 'failed', 'cancelled'];
+const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+
+// Poll a queued job (the 202 body of POST /analyses/ or /predictions/) until it finishes,
+// then fetch what it created. onProgress gets every job update.
+export async function waitForJob(job, { onProgress } = {}) {
+  let delay = 500;
+  while (!FINISHED.includes(job.status)) {
+    await sleep(delay);
+    delay = Math.min(delay * 1.5, 3000);
+    job = (await api.get(`/jobs/${job.id}`)).data;
+    onProgress?.(job);
+  }
+  if (job.status !== 'succeeded') {
+    const err = new Error(job.error || `Job ${job.status}`);
+    err.safeMessage = job.status === 'cancelled' ? 'Cancelled' : (job.error || 'Something went wrong. Please try again.');
+    throw err;
+  }
+  const res = await api.get(job.result_url.replace(/^\/api\/v1/, ''));
+  return res.data;
+}